@@ -1,150 +1,281 @@
 # experiments/bench_experiments.py
-import os
+"""
+Parametric benchmark suite.
+
+Sweeps N, anchor delay, suppression rate, deadline and batch sizes; for every
+combination it measures throughput and p50/p95/p99 latency of the decide, execute,
+anchor and watcher stages plus detection outcomes. Anchor delays and deadlines run
+on a virtual clock, so latencies are pure CPU/SQLite cost.
+
+Each run writes one JSON file (results/bench-<timestamp>.json, with a -2, -3, ... suffix
+when that name is taken) and one per-transaction CSV. --save-baseline stores the run as the baseline; --baseline compares against it and
+exits non-zero on regressions beyond --tolerance.
+
+    python -m experiments.bench_experiments --n 100 1000 --suppression 0 0.3
+"""
+import argparse
 import csv
+import itertools
+import json
+import math
+import os
+import sys
 import time
 from pathlib import Path
+from typing import Any, Dict, List, Sequence
 
+from src.tbed.clock import EventScheduler, VirtualClock
 from src.tbed.storage import Store
 from src.tbed.services import DecisionService, ExecutionService
 from src.tbed.anchor import AnchorWorker, AnchorConfig
 from src.tbed.watcher import Watcher, WatcherConfig
 
 RESULTS_DIR = Path("results")
-RESULTS_DIR.mkdir(exist_ok=True)
-
-CSV_PATH = RESULTS_DIR / "results.csv"
-DB_PATH = RESULTS_DIR / "bench_N10.sqlite"
-
-
-def write_csv_row(row: dict):
-    new_file = not CSV_PATH.exists()
-    with open(CSV_PATH, "a", newline="", encoding="utf-8") as f:
-        w = csv.DictWriter(
-            f,
-            fieldnames=[
-                "tx_id",
-                "commit_hash",
-                "executed_at",
-                "anchored_at",
-                "status",
-                "outcome",
-                "anchor_delay_s",
-                "suppression_prob",
-                "deadline_s",
-            ],
-        )
-        if new_file:
-            w.writeheader()
-        w.writerow(row)
-
-
-def main():
-    print("Bench N=10 starting...")
-
-    # --- knobs (we’ll sweep later) ---
-    N = 100
-    anchor_delay_s = 1.0
-    suppression_prob = 0.3
-    deadline_s = 2.0
-
-    # fresh DB each run
-    if os.path.exists(DB_PATH):
-        os.remove(DB_PATH)
-
-    store = Store(db_path=str(DB_PATH))
-    ds = DecisionService(policy_version="v0.1")
-    es = ExecutionService(store=store, decision_service=ds)
+BASELINE_PATH = RESULTS_DIR / "baseline.json"
+
+STAGES = ("decide", "execute", "anchor", "watcher")
+PARAMS = ("n", "anchor_delay_s", "suppression_prob", "deadline_s", "anchor_batch", "exec_batch")
+CSV_FIELDS = [
+    "tx_id",
+    "commit_hash",
+    "executed_at",
+    "anchored_at",
+    "status",
+    "outcome",
+    *PARAMS,
+]
+
+
+def percentile(sorted_samples: Sequence[float], q: float) -> float:
+    """
+    Nearest-rank percentile of already sorted samples.
+    """
+    if not sorted_samples:
+        return 0.0
+    k = max(0, math.ceil(q / 100.0 * len(sorted_samples)) - 1)
+    return sorted_samples[k]
+
 
+def summarize(samples: List[float]) -> Dict[str, float]:
+    s = sorted(samples)
+    return {
+        "count": len(s),
+        "p50_ms": percentile(s, 50) * 1e3,
+        "p95_ms": percentile(s, 95) * 1e3,
+        "p99_ms": percentile(s, 99) * 1e3,
+        "max_ms": (s[-1] if s else 0.0) * 1e3,
+    }
+
+
+def _remove_db(db_path: Path) -> None:
+    for suffix in ("", "-wal", "-shm"):
+        if os.path.exists(f"{db_path}{suffix}"):
+            os.remove(f"{db_path}{suffix}")
+
+
+def run_one(params: Dict[str, Any], seed: int, csv_writer, db_path: Path) -> Dict[str, Any]:
+    _remove_db(db_path)
+
+    n = params["n"]
+    deadline_s = params["deadline_s"]
+    anchor_delay_s = params["anchor_delay_s"]
+
+    clock = VirtualClock()
+    sched = EventScheduler(clock)
+    store = Store(db_path=str(db_path))
+    ds = DecisionService(policy_version="v0.1", clock=clock)
+    es = ExecutionService(store=store, decision_service=ds)
     anchor_worker = AnchorWorker(
         store=store,
-        cfg=AnchorConfig(anchor_delay_seconds=anchor_delay_s, failure_rate=suppression_prob),
+        cfg=AnchorConfig(
+            anchor_delay_seconds=anchor_delay_s,
+            failure_rate=params["suppression_prob"],
+            batch_size=params["anchor_batch"],
+            seed=seed,
+        ),
+        clock=clock,
     )
-    watcher = Watcher(store=store, cfg=WatcherConfig(anchor_deadline_seconds=deadline_s))
+    watcher = Watcher(store=store, cfg=WatcherConfig(anchor_deadline_seconds=deadline_s), clock=clock)
+    lat: Dict[str, List[float]] = {stage: [] for stage in STAGES}
 
     # 1) Decide + execute N txs
-    commits = []
-    for i in range(N):
-        tx_id = f"bench-{i:04d}"
+    t_start = time.perf_counter()
+    batch = []
+    for i in range(n):
         payload = {"bench_index": i}
-        r = ds.decide(tx_id=tx_id, payload=payload, decision="APPROVE")
-        es.execute(receipt=r, payload=payload)
-        commits.append((tx_id, r.commit))
+        t = time.perf_counter()
+        r = ds.decide(tx_id=f"bench-{i:06d}", payload=payload, decision="APPROVE")
+        lat["decide"].append(time.perf_counter() - t)
+        batch.append((r, payload))
+        if len(batch) >= params["exec_batch"] or i == n - 1:
+            t = time.perf_counter()
+            if params["exec_batch"] > 1:
+                es.execute_batch(batch)
+            else:
+                es.execute(receipt=batch[0][0], payload=batch[0][1])
+            # amortised per transaction
+            lat["execute"].extend([(time.perf_counter() - t) / len(batch)] * len(batch))
+            batch = []
+    decide_execute_s = time.perf_counter() - t_start
 
-    print(f"Executed {N} txs. Running anchor worker loop...")
+    # 2) Anchor rounds every 0.1 virtual seconds, then one watcher pass after the deadline
+    def timed(stage, fn):
+        def run():
+            t = time.perf_counter()
+            out = fn()
+            lat[stage].append(time.perf_counter() - t)
+            return out
+        return run
 
-    # 2) Run anchor worker enough times to allow delayed anchoring
-    #    (some will be suppressed by failure_rate)
     rounds = int((deadline_s + anchor_delay_s) * 5)
-    for _ in range(max(1, rounds)):
-        anchor_worker.run_once()
-        time.sleep(0.1)
-
-    # --- DEBUG SUMMARY (inserted here) ---
-    ex = list(store.dump_executions())
-    an = list(store.dump_anchors())
-    print(f"Anchoring summary: executions={len(ex)} anchors={len(an)} missing_now={len(ex)-len(an)}")
-    print(f"Config: delay={anchor_delay_s} suppression={suppression_prob} deadline={deadline_s}")
-    # ------------------------------------
-
-    # 3) Wait until deadline passes, then run watcher once
-    time.sleep(deadline_s + 0.2)
-    findings = watcher.find_missing_anchors()
-
-    # Build quick lookup sets
-    missing = set()
-    for f in findings:
-        try:
-            d = dict(f)
-        except Exception:
-            d = f
-        ch = d.get("commit_hash") or d.get("commit")
-        if ch:
-            missing.add(ch)
-
-    # 4) Dump DB state and write CSV rows
-    exec_rows = [dict(r) for r in store.dump_executions()]
-    anchor_rows = [dict(r) for r in store.dump_anchors()]
-    anchor_map = {a["commit_hash"]: a["anchored_at"] for a in anchor_rows}
-
-    # Only first attempt per tx is what we care about in bench
-    seen_tx = set()
-    for e in exec_rows:
-        tx = e["tx_id"]
-        if tx in seen_tx:
-            continue
-        seen_tx.add(tx)
+    for i in range(max(1, rounds)):
+        sched.call_later(0.1 * i, timed("anchor", anchor_worker.run_once))
+    sched.run()
 
-        ch = e.get("commit_hash")
-        anchored_at = anchor_map.get(ch, "")
-        status = e.get("status")
-        executed_at = e.get("executed_at")
+    findings: List[Dict[str, Any]] = []
+    sched.call_later(deadline_s + 0.2, timed("watcher", lambda: findings.extend(watcher.find_missing_anchors())))
+    sched.run()
 
+    # 3) Per-transaction outcomes (first attempt per tx)
+    missing = {f["commit_hash"] for f in findings}
+    outcomes = {"ANCHORED": 0, "MISSING_ANCHOR_AFTER_DEADLINE": 0, "UNANCHORED_NOT_FLAGGED": 0}
+    # streamed in (tx_id, attempt) order, so a tx's first attempt is the one with attempt == 1
+    for e in store.iter_dump_executions():
+        if e["attempt"] != 1:
+            continue
+        tx = e["tx_id"]
+        ch = e["commit_hash"]
         if ch in missing:
             outcome = "MISSING_ANCHOR_AFTER_DEADLINE"
-        elif anchored_at != "":
+        elif store.is_anchored(ch):
             outcome = "ANCHORED"
         else:
             outcome = "UNANCHORED_NOT_FLAGGED"
+        outcomes[outcome] += 1
+        csv_writer.writerow({
+            "tx_id": tx,
+            "commit_hash": ch,
+            "executed_at": e["executed_at"],
+            "anchored_at": store.anchored_at(ch) or "",
+            "status": e["status"],
+            "outcome": outcome,
+            **params,
+        })
+
+    store.close()
+    return {
+        "params": params,
+        "throughput_tx_s": n / decide_execute_s if decide_execute_s > 0 else 0.0,
+        "latency": {stage: summarize(lat[stage]) for stage in STAGES},
+        "outcomes": outcomes,
+        "findings": len(findings),
+    }
+
+
+def params_key(params: Dict[str, Any]) -> str:
+    return json.dumps({k: params[k] for k in PARAMS}, sort_keys=True)
+
+
+def compare(results: List[Dict[str, Any]], baseline: Dict[str, Any], tolerance: float) -> List[str]:
+    """
+    Regressions vs. the baseline run: throughput down, or a stage's p95 up, by more than tolerance.
+    """
+    base = {params_key(r["params"]): r for r in baseline["results"]}
+    regressions = []
+    for r in results:
+        b = base.get(params_key(r["params"]))
+        if b is None:
+            continue
+        if r["throughput_tx_s"] < b["throughput_tx_s"] * (1 - tolerance):
+            regressions.append(
+                f"{params_key(r['params'])}: throughput {r['throughput_tx_s']:.0f} < baseline {b['throughput_tx_s']:.0f} tx/s"
+            )
+        for stage in STAGES:
+            cur, old = r["latency"][stage]["p95_ms"], b["latency"][stage]["p95_ms"]
+            if old > 0 and cur > old * (1 + tolerance):
+                regressions.append(
+                    f"{params_key(r['params'])}: {stage} p95 {cur:.3f}ms > baseline {old:.3f}ms"
+                )
+    return regressions
+
+
+def reserve_run_path(stamp: str, prefix: str = "bench") -> Path:
+    """
+    Creates results/<prefix>-<stamp>[-k].json exclusively, so runs started in the same
+    second (or in parallel) never overwrite each other's results.
+    """
+    path, k = RESULTS_DIR / f"{prefix}-{stamp}.json", 1
+    while True:
+        try:
+            path.open("x").close()
+            return path
+        except FileExistsError:
+            k += 1
+            path = RESULTS_DIR / f"{prefix}-{stamp}-{k}.json"
+
+
+def main(argv=None) -> int:
+    ap = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    ap.add_argument("--n", type=int, nargs="+", default=[100])
+    ap.add_argument("--anchor-delay", type=float, nargs="+", default=[1.0])
+    ap.add_argument("--suppression", type=float, nargs="+", default=[0.3])
+    ap.add_argument("--deadline", type=float, nargs="+", default=[2.0])
+    ap.add_argument("--anchor-batch", type=int, nargs="+", default=[0], help="Merkle batch size (0 = per commit)")
+    ap.add_argument("--exec-batch", type=int, nargs="+", default=[1], help="receipts per execute_batch call")
+    ap.add_argument("--seed", type=int, default=1234)
+    ap.add_argument("--baseline", type=Path, default=None, help="compare against this run file")
+    ap.add_argument("--save-baseline", action="store_true", help=f"also write this run to {BASELINE_PATH}")
+    ap.add_argument("--tolerance", type=float, default=0.2, help="allowed relative slowdown vs. baseline")
+    args = ap.parse_args(argv)
+
+    RESULTS_DIR.mkdir(exist_ok=True)
+    stamp = time.strftime("%Y%m%d-%H%M%S")
+    run_path = reserve_run_path(stamp)
+    csv_path = run_path.with_suffix(".csv")
+    # scratch database, per run so parallel runs do not share it
+    db_path = run_path.with_suffix(".sqlite")
+
+    grid = list(itertools.product(
+        args.n, args.anchor_delay, args.suppression, args.deadline, args.anchor_batch, args.exec_batch
+    ))
+    results = []
+    with open(csv_path, "w", newline="", encoding="utf-8") as f:
+        w = csv.DictWriter(f, fieldnames=CSV_FIELDS)
+        w.writeheader()
+        for values in grid:
+            params = dict(zip(PARAMS, values))
+            r = run_one(params, args.seed, w, db_path)
+            results.append(r)
+            lat = r["latency"]
+            print(
+                f"{params_key(params)} -> {r['throughput_tx_s']:.0f} tx/s, "
+                f"execute p50/p99 {lat['execute']['p50_ms']:.3f}/{lat['execute']['p99_ms']:.3f} ms, "
+                f"anchor p95 {lat['anchor']['p95_ms']:.3f} ms, watcher p95 {lat['watcher']['p95_ms']:.3f} ms, "
+                f"outcomes {r['outcomes']}"
+            )
+    _remove_db(db_path)
+
+    run = {
+        "meta": {"started": stamp, "seed": args.seed, "python": sys.version.split()[0]},
+        "results": results,
+    }
+    run_path.write_text(json.dumps(run, indent=2, sort_keys=True), encoding="utf-8")
+    print("RUN:", run_path)
+    print("CSV:", csv_path)
+
+    if args.save_baseline:
+        BASELINE_PATH.write_text(json.dumps(run, indent=2, sort_keys=True), encoding="utf-8")
+        print("BASELINE:", BASELINE_PATH)
 
-        write_csv_row(
-            {
-                "tx_id": tx,
-                "commit_hash": ch,
-                "executed_at": executed_at,
-                "anchored_at": anchored_at,
-                "status": status,
-                "outcome": outcome,
-                "anchor_delay_s": anchor_delay_s,
-                "suppression_prob": suppression_prob,
-                "deadline_s": deadline_s,
-            }
-        )
-
-    print("DONE.")
-    print("DB:", DB_PATH)
-    print("CSV:", CSV_PATH)
-    print("Watcher findings count:", len(findings))
+    if args.baseline is not None:
+        regressions = compare(results, json.loads(args.baseline.read_text(encoding="utf-8")), args.tolerance)
+        for line in regressions:
+            print("REGRESSION:", line)
+        if regressions:
+            return 1
+        print("No regressions vs.", args.baseline)
+    return 0
 
 
 if __name__ == "__main__":
-    main()
+    sys.exit(main())
@@ -0,0 +1,300 @@
+# experiments/loadgen.py
+"""
+Open-loop load generator.
+
+Requests arrive on a schedule fixed in advance (Poisson, or bursty: Poisson arrivals
+squeezed into the "on" part of every period) at the offered rate, whatever the system
+is doing. Each request runs DecisionService.decide -> ExecutionService.execute on a pool
+of worker threads. A traffic mix adds replays, TOCTOU-modified payloads, policy rejects
+and forged MACs to the normal approvals.
+
+Latency is measured from the request's scheduled arrival, not from when a worker got to
+it. A stalled system is therefore charged for every request that queued behind the stall
+(coordinated-omission correction). Queueing delay (arrival -> start) and service time
+(start -> done) are reported separately, per traffic type. A replay scheduled before
+anything has executed runs as a first execution instead and is reported on its own, as
+replay_fallback; any other OK on replay traffic counts as an unexpected outcome.
+
+With several --rate values the rates are swept in order. The saturation point is the
+highest rate that still completes at least 95% of the offered rate with p99 queueing
+delay under --max-queue-ms.
+
+    python -m experiments.loadgen --rate 200 400 800 --duration 10 --mix normal=0.8,replay=0.05,toctou=0.05,reject=0.05,forged=0.05
+"""
+import argparse
+import dataclasses
+import json
+import random
+import sys
+import threading
+import time
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+from src.tbed.storage import Store
+from src.tbed.services import (
+    DecisionService,
+    ExecutionService,
+    REASON_INVALID_RECEIPT,
+    REASON_OK,
+    REASON_REJECT,
+    REASON_REPLAY,
+    REASON_TOCTOU,
+)
+from experiments.bench_experiments import RESULTS_DIR, _remove_db, reserve_run_path, summarize
+
+TRAFFIC = ("normal", "replay", "toctou", "reject", "forged")
+# a replay with nothing executed yet to replay, run as a first execution instead
+REPLAY_FALLBACK = "replay_fallback"
+OUTCOMES = TRAFFIC + (REPLAY_FALLBACK,)
+EXPECTED_REASON = {
+    "normal": REASON_OK,
+    "replay": REASON_REPLAY,
+    "toctou": REASON_TOCTOU,
+    "reject": REASON_REJECT,
+    "forged": REASON_INVALID_RECEIPT,
+    REPLAY_FALLBACK: REASON_OK,
+}
+DEFAULT_MIX = "normal=0.8,replay=0.05,toctou=0.05,reject=0.05,forged=0.05"
+# receipts kept around for replay traffic
+REPLAY_POOL = 1024
+
+
+def parse_mix(spec: str) -> Dict[str, float]:
+    mix: Dict[str, float] = {}
+    for part in spec.split(","):
+        name, _, weight = part.partition("=")
+        name = name.strip()
+        if name not in TRAFFIC:
+            raise argparse.ArgumentTypeError(f"unknown traffic type {name!r}; expected one of {TRAFFIC}")
+        mix[name] = float(weight)
+    if sum(mix.values()) <= 0:
+        raise argparse.ArgumentTypeError("mix weights must sum to > 0")
+    return mix
+
+
+def arrival_times(
+    rate: float,
+    duration: float,
+    rng: random.Random,
+    burst_duty: float = 1.0,
+    burst_period: float = 1.0,
+) -> List[float]:
+    """
+    Offsets (seconds from start) of the scheduled arrivals, mean rate `rate`. burst_duty < 1
+    packs the arrivals into the first burst_duty of every burst_period at rate / burst_duty.
+    """
+    on = burst_duty * burst_period
+    out: List[float] = []
+    t = 0.0
+    while True:
+        t += rng.expovariate(rate / burst_duty)
+        wall = t if burst_duty >= 1.0 else (t // on) * burst_period + t % on
+        if wall >= duration:
+            return out
+        out.append(wall)
+
+
+class LoadRun:
+    """
+    One open-loop run at a fixed offered rate.
+    """
+    def __init__(self, es: ExecutionService, ds: DecisionService, schedule: Sequence[Tuple[float, str]], workers: int, seed: int):
+        self.es = es
+        self.ds = ds
+        self.schedule = schedule
+        self.workers = workers
+        self._rng = random.Random(seed)
+        self._next = 0
+        self._lock = threading.Lock()
+        self._pool: List[Tuple[Any, Dict[str, Any]]] = []
+        # outcome type (traffic type or REPLAY_FALLBACK) -> [(latency, queueing, service)]
+        self.samples: Dict[str, List[Tuple[float, float, float]]] = {k: [] for k in OUTCOMES}
+        self.unexpected: Dict[str, int] = {k: 0 for k in OUTCOMES}
+        self.errors = 0
+
+    def _take(self) -> Optional[Tuple[int, float, str]]:
+        with self._lock:
+            i = self._next
+            if i >= len(self.schedule):
+                return None
+            self._next += 1
+        return (i, *self.schedule[i])
+
+    def _request(self, i: int, kind: str) -> Tuple[str, str]:
+        """
+        Runs one request; returns (outcome type, reason).
+        """
+        outcome = kind
+        if kind == "replay":
+            with self._lock:
+                prior = self._rng.choice(self._pool) if self._pool else None
+            if prior is not None:
+                return kind, self.es.execute(receipt=prior[0], payload=prior[1]).reason
+            outcome, kind = REPLAY_FALLBACK, "normal"  # nothing executed yet to replay
+
+        payload = {"load_index": i, "amount": i % 1000}
+        decision = "REJECT" if kind == "reject" else "APPROVE"
+        r = self.ds.decide(tx_id=f"load-{i:08d}", payload=payload, decision=decision)
+        if kind == "toctou":
+            out = self.es.execute(receipt=r, payload={**payload, "amount": payload["amount"] + 1})
+        elif kind == "forged":
+            mac = ("0" if r.receipt_mac[0] != "0" else "1") + r.receipt_mac[1:]
+            out = self.es.execute(receipt=dataclasses.replace(r, receipt_mac=mac), payload=payload)
+        else:
+            out = self.es.execute(receipt=r, payload=payload)
+        if out.status == "EXECUTED":
+            with self._lock:
+                if len(self._pool) < REPLAY_POOL:
+                    self._pool.append((r, payload))
+                else:
+                    self._pool[self._rng.randrange(REPLAY_POOL)] = (r, payload)
+        return outcome, out.reason
+
+    def _worker(self, t0: float) -> None:
+        while True:
+            item = self._take()
+            if item is None:
+                return
+            i, offset, kind = item
+            due = t0 + offset
+            delay = due - time.perf_counter()
+            if delay > 0:
+                time.sleep(delay)
+            start = time.perf_counter()
+            try:
+                outcome, reason = self._request(i, kind)
+            except Exception:
+                with self._lock:
+                    self.errors += 1
+                continue
+            done = time.perf_counter()
+            with self._lock:
+                # latency counts from the scheduled arrival, so queueing behind a stall is not omitted
+                self.samples[outcome].append((done - due, max(0.0, start - due), done - start))
+                if reason != EXPECTED_REASON[outcome]:
+                    self.unexpected[outcome] += 1
+
+    def run(self) -> float:
+        t0 = time.perf_counter() + 0.05
+        threads = [threading.Thread(target=self._worker, args=(t0,), daemon=True) for _ in range(self.workers)]
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+        return time.perf_counter() - t0
+
+
+def run_rate(args, rate: float, db_path: Path) -> Dict[str, Any]:
+    _remove_db(db_path)
+
+    rng = random.Random(args.seed)
+    offsets = arrival_times(rate, args.duration, rng, args.burst_duty, args.burst_period)
+    kinds, weights = zip(*args.mix.items())
+    schedule = list(zip(offsets, rng.choices(kinds, weights=weights, k=len(offsets))))
+
+    store = Store(db_path=str(db_path), synchronous=args.synchronous, group_commit_rows=args.group_commit_rows)
+    ds = DecisionService(policy_version="load-v1")
+    es = ExecutionService(store=store, decision_service=ds)
+    run = LoadRun(es, ds, schedule, args.workers, args.seed)
+    elapsed = run.run()
+    store.close()
+    # arrivals span the whole duration even when a bursty schedule ends early; a backlog stretches it
+    span = max(args.duration, elapsed)
+
+    completed = sum(len(s) for s in run.samples.values())
+    queueing_all = [q for s in run.samples.values() for _, q, _ in s]
+    per_type = {}
+    for kind in OUTCOMES:
+        s = run.samples[kind]
+        if not s and kind not in args.mix:
+            continue
+        per_type[kind] = {
+            "completed": len(s),
+            "throughput_tx_s": len(s) / span,
+            "latency": summarize([x[0] for x in s]),
+            "queueing": summarize([x[1] for x in s]),
+            "service": summarize([x[2] for x in s]),
+            "unexpected_outcomes": run.unexpected[kind],
+        }
+    throughput = completed / span
+    queueing = summarize(queueing_all)
+    return {
+        "offered_rate_tx_s": rate,
+        "scheduled": len(schedule),
+        "completed": completed,
+        "errors": run.errors,
+        "elapsed_s": elapsed,
+        "throughput_tx_s": throughput,
+        "queueing": queueing,
+        "saturated": throughput < 0.95 * len(schedule) / args.duration or queueing["p99_ms"] > args.max_queue_ms,
+        "per_type": per_type,
+    }
+
+
+def main(argv=None) -> int:
+    ap = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    ap.add_argument("--rate", type=float, nargs="+", default=[200.0], help="offered arrivals per second (swept in order)")
+    ap.add_argument("--duration", type=float, default=10.0, help="seconds of arrivals per rate")
+    ap.add_argument("--mix", type=parse_mix, default=parse_mix(DEFAULT_MIX), help=f"traffic weights (default {DEFAULT_MIX})")
+    ap.add_argument("--workers", type=int, default=8, help="threads serving requests")
+    ap.add_argument("--burst-duty", type=float, default=1.0, help="fraction of each period that receives arrivals (1 = Poisson)")
+    ap.add_argument("--burst-period", type=float, default=1.0, help="seconds per on/off cycle when bursty")
+    ap.add_argument("--max-queue-ms", type=float, default=100.0, help="p99 queueing delay that counts as saturated")
+    ap.add_argument("--synchronous", default="FULL", help="Store synchronous mode")
+    ap.add_argument("--group-commit-rows", type=int, default=0, help="Store group commit (0 = off)")
+    ap.add_argument("--seed", type=int, default=1234)
+    args = ap.parse_args(argv)
+    if not 0 < args.burst_duty <= 1:
+        ap.error("--burst-duty must be in (0, 1]")
+
+    RESULTS_DIR.mkdir(exist_ok=True)
+    stamp = time.strftime("%Y%m%d-%H%M%S")
+    run_path = reserve_run_path(stamp, prefix="loadgen")
+    # private to this run, so concurrent runs never share (or delete) each other's database
+    db_path = run_path.with_suffix(".sqlite")
+
+    results = []
+    saturation: Optional[float] = None
+    for rate in args.rate:
+        r = run_rate(args, rate, db_path)
+        results.append(r)
+        if not r["saturated"]:
+            saturation = rate if saturation is None else max(saturation, rate)
+        print(
+            f"rate {rate:.0f}/s -> {r['throughput_tx_s']:.0f} tx/s, queueing p50/p99 "
+            f"{r['queueing']['p50_ms']:.2f}/{r['queueing']['p99_ms']:.2f} ms"
+            + (" SATURATED" if r["saturated"] else "")
+        )
+        for kind, t in r["per_type"].items():
+            print(
+                f"  {kind:15s} n={t['completed']:6d} latency p50/p99 {t['latency']['p50_ms']:.2f}/"
+                f"{t['latency']['p99_ms']:.2f} ms, service p50 {t['service']['p50_ms']:.2f} ms"
+                + (f", {t['unexpected_outcomes']} unexpected outcomes" if t["unexpected_outcomes"] else "")
+            )
+    _remove_db(db_path)
+
+    run = {
+        "meta": {
+            "started": stamp,
+            "seed": args.seed,
+            "python": sys.version.split()[0],
+            "duration_s": args.duration,
+            "mix": args.mix,
+            "workers": args.workers,
+            "burst_duty": args.burst_duty,
+            "burst_period_s": args.burst_period,
+            "synchronous": args.synchronous,
+            "group_commit_rows": args.group_commit_rows,
+        },
+        "saturation_rate_tx_s": saturation,
+        "results": results,
+    }
+    run_path.write_text(json.dumps(run, indent=2, sort_keys=True), encoding="utf-8")
+    print("SATURATION:", "every rate saturated" if saturation is None else f"{saturation:.0f} tx/s")
+    print("RUN:", run_path)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,8 +1,15 @@
+import os
 import random
-import time
+import threading
+from collections import deque
+from concurrent.futures import FIRST_COMPLETED, Future, ThreadPoolExecutor, wait
 from dataclasses import dataclass
-from typing import List, Set
+from typing import Deque, Dict, Iterable, List, Optional, Set, Tuple
 
+from .backends import AnchorBackend, SqliteAnchorBackend
+from .clock import Clock, SYSTEM_CLOCK
+from .metrics import METRICS, Metrics, timed
+from .merkle import build_proofs, encode_proof
 from .storage import Store
 
 
@@ -10,38 +17,278 @@ from .storage import Store
 class AnchorConfig:
     anchor_delay_seconds: int = 2
     failure_rate: float = 0.0
+    # label for the default SqliteAnchorBackend; other backends carry their own name
     backend: str = "local_log"
+    # concurrency: >1 anchors that many commits in parallel from a thread pool
+    max_in_flight: int = 1
+    # per-commit timeout; a timed-out call is abandoned for this round (never double-submitted)
+    anchor_timeout_seconds: Optional[float] = None
+    # retries for backend calls that raise
+    max_retries: int = 0
+    retry_backoff_seconds: float = 0.0
+    # >0: anchor one Merkle root per window of this many commits and store inclusion proofs
+    batch_size: int = 0
+    # seeds the suppression RNG so runs are reproducible
+    seed: Optional[int] = None
+    # how long a claimed commit stays with this worker before others may take it over;
+    # a round claims what fits in half a lease at the observed call time and renews its
+    # leases as it goes
+    lease_seconds: float = 60.0
 
 
 class AnchorWorker:
-    def __init__(self, store: Store, cfg: AnchorConfig):
+    """
+    Anchors the commits in the Store's anchor queue. A round claims queued commits in
+    chunks sized so a chunk's calls fit in half a lease, and renews the leases of the
+    commits it still holds when a chunk runs long, so workers in other threads or
+    processes sharing the database do not anchor the same commit twice. The anchor write
+    removes a commit from the queue; a failed call, and a timed-out one once it returns,
+    hand their commits back; a worker that stalls past its lease loses its commits to the
+    next claimant, and the Store then skips whatever the slower one anchors again. A
+    round therefore costs O(pending commits), not O(history).
+
+    Suppression is durable: a suppressed commit is dropped from the queue, so no later
+    round or worker anchors it, and only the Watcher's deadline can surface it.
+    """
+    def __init__(
+        self,
+        store: Store,
+        cfg: AnchorConfig,
+        clock: Optional[Clock] = None,
+        metrics: Optional[Metrics] = None,
+        backend: Optional[AnchorBackend] = None,
+    ):
         self.store = store
         self.cfg = cfg
-        # NEW: commits that were "suppressed" stay suppressed for this run
-        self._suppressed: Set[str] = set()
+        # the Store mirrors every anchor so pending work is known locally
+        self.backend = backend if backend is not None else SqliteAnchorBackend(store, name=cfg.backend)
+        self.clock = clock or SYSTEM_CLOCK
+        self.metrics = metrics or METRICS
+        self._rng = random.Random(cfg.seed)
+        self.owner = f"{os.getpid()}-{id(self):x}"
+        # commits with a backend call still running (possibly from an earlier, timed-out round)
+        self._in_flight: Set[str] = set()
+        self._busy = 0  # pool calls not yet returned, including abandoned ones
+        # timed-out calls still running; their commits go back to the queue when they return
+        self._abandoned: Dict[Future, Tuple[str, ...]] = {}
+        self._lock = threading.Lock()
+        self._pool: Optional[ThreadPoolExecutor] = None
+        # moving average of one backend call on self.clock, for sizing claims
+        self._call_seconds = float(cfg.anchor_delay_seconds)
+        self._lease_until = 0.0
+
+    def _anchor_one(self, unit: Tuple[str, ...]) -> bool:
+        """
+        One backend call for a unit (a single commit, or one Merkle batch).
+        Returns True if the unit was anchored.
+        """
+        self.clock.sleep(self.cfg.anchor_delay_seconds)
+
+        # NEW: sticky suppression (models operator dropping anchoring permanently)
+        if self._rng.random() < self.cfg.failure_rate:
+            self.store.ack_anchor_work(unit)
+            self.metrics.inc("tbed_anchor_suppressed_commits_total", len(unit))
+            return False
+
+        anchored_at = int(self.clock.time())
+        if self.cfg.batch_size > 0:
+            root, proofs = build_proofs(unit)
+            self.backend.append([(root, anchored_at)])
+            self.store.insert_anchor_batch(
+                root_hash=root,
+                anchored_at=anchored_at,
+                backend=self.backend.name,
+                proofs=[(c, i, encode_proof(p)) for i, (c, p) in enumerate(zip(unit, proofs))],
+            )
+            return True
+
+        self.backend.append([(unit[0], anchored_at)])
+        self.store.insert_anchor(
+            commit_hash=unit[0],
+            anchored_at=anchored_at,
+            backend=self.backend.name
+        )
+        return True
 
+    def _anchor_with_retries(self, unit: Tuple[str, ...]) -> bool:
+        try:
+            for attempt in range(self.cfg.max_retries + 1):
+                try:
+                    started = self.clock.time()
+                    with self.metrics.timer("tbed_anchor_call_seconds"):
+                        ok = self._anchor_one(unit)
+                    with self._lock:
+                        self._call_seconds = 0.8 * self._call_seconds + 0.2 * (self.clock.time() - started)
+                    if ok:
+                        self.metrics.inc("tbed_anchored_commits_total", len(unit))
+                    return ok
+                except Exception:
+                    self.metrics.inc("tbed_anchor_errors_total")
+                    if attempt == self.cfg.max_retries:
+                        # back to the queue for the next round
+                        self.store.release_anchor_work(self.owner, unit)
+                        raise
+                    self.clock.sleep(self.cfg.retry_backoff_seconds * (2 ** attempt))
+            return False
+        finally:
+            with self._lock:
+                self._in_flight.difference_update(unit)
+
+    def _claim_limit(self) -> int:
+        """
+        Commits whose calls fit in half a lease at the observed call time.
+        """
+        with self._lock:
+            per_call = max(self._call_seconds, 1e-3)
+        calls = max(1, int(self.cfg.lease_seconds / 2 / per_call)) * max(1, self.cfg.max_in_flight)
+        return calls * max(1, self.cfg.batch_size)
+
+    def _claim(self, after_id: int) -> Tuple[List[Tuple[str, ...]], int, bool]:
+        """
+        Claims the next chunk after queue id after_id. Returns (units, last id, more to claim).
+        """
+        limit = self._claim_limit()
+        now = self.clock.time()
+        claimed = self.store.claim_anchor_work(self.owner, now, self.cfg.lease_seconds, limit, after_id)
+        self._lease_until = now + self.cfg.lease_seconds
+        if not claimed:
+            return [], after_id, False
+        # a call abandoned after a timeout may still be running: it hands the commit back when done
+        with self._lock:
+            pending = [c for _, c in claimed if c not in self._in_flight]
+        if self.cfg.batch_size <= 0:
+            units = [(c,) for c in pending]
+        else:
+            n = self.cfg.batch_size
+            units = [tuple(pending[i:i + n]) for i in range(0, len(pending), n)]
+        return units, claimed[-1][0], len(claimed) == limit
+
+    def _renew(self, held: Iterable[Tuple[str, ...]]) -> None:
+        """
+        Extends the leases on held once half of the current lease has gone.
+        """
+        now = self.clock.time()
+        if now < self._lease_until - self.cfg.lease_seconds / 2:
+            return
+        commits = [c for u in held for c in u]
+        if commits:
+            self.store.renew_anchor_leases(self.owner, commits, now + self.cfg.lease_seconds)
+            self.metrics.inc("tbed_anchor_lease_renewals_total")
+        self._lease_until = now + self.cfg.lease_seconds
+
+    @timed("tbed_stage_seconds", stage="anchor_run_once")
     def run_once(self) -> List[str]:
+        """
+        Anchors what is queued, chunk by chunk. A backend error that survives the retries is
+        raised (in both modes) after the round's unstarted commits are handed back.
+        """
+        # anchors written by other processes, so is_anchored() callers see them without fresh=True
+        self.store.refresh_anchor_index()
         anchored_now: List[str] = []
-        commits = self.store.list_executed_commit_hashes()
+        after_id, more = 0, True
+        while more:
+            units, after_id, more = self._claim(after_id)
+            if self.cfg.max_in_flight > 1 or self.cfg.anchor_timeout_seconds is not None:
+                anchored_now.extend(self._run_concurrent(units))
+            else:
+                anchored_now.extend(self._run_sequential(units))
+        return anchored_now
 
-        for c in commits:
-            if self.store.is_anchored(c):
-                continue
-            if c in self._suppressed:
-                continue
+    def _run_sequential(self, units: List[Tuple[str, ...]]) -> List[str]:
+        anchored_now: List[str] = []
+        for k, unit in enumerate(units):
+            self._renew(units[k:])
+            with self._lock:
+                self._in_flight.update(unit)
+            try:
+                ok = self._anchor_with_retries(unit)
+            except Exception:
+                self.store.release_anchor_work(self.owner, [c for u in units[k + 1:] for c in u])
+                raise
+            if ok:
+                anchored_now.extend(unit)
+        return anchored_now
+
+    def _run_concurrent(self, units: List[Tuple[str, ...]]) -> List[str]:
+        if self._pool is None:
+            self._pool = ThreadPoolExecutor(
+                max_workers=max(1, self.cfg.max_in_flight), thread_name_prefix="anchor"
+            )
+        timeout = self.cfg.anchor_timeout_seconds
 
-            time.sleep(self.cfg.anchor_delay_seconds)
+        queue: Deque[Tuple[str, ...]] = deque(units)
+        running: Dict[Future, Tuple[Tuple[str, ...], float]] = {}
+        anchored_now: List[str] = []
+        error: Optional[BaseException] = None
 
-            # NEW: sticky suppression (models operator dropping anchoring permanently)
-            if random.random() < self.cfg.failure_rate:
-                self._suppressed.add(c)
-                continue
+        while queue or running:
+            self._renew(list(queue) + [u for u, _ in running.values()])
+            with self._lock:
+                busy = self._busy
+            # abandoned (timed-out) calls still occupy a pool thread, so they count against the limit
+            while queue and busy < self.cfg.max_in_flight:
+                unit = queue.popleft()
+                with self._lock:
+                    self._in_flight.update(unit)
+                    self._busy += 1
+                f = self._pool.submit(self._anchor_with_retries, unit)
+                f.add_done_callback(self._release)
+                running[f] = (unit, self.clock.time())
+                busy += 1
+            if not running:
+                # everything left is blocked behind abandoned calls; pick it up next round
+                self.store.release_anchor_work(self.owner, [c for u in queue for c in u])
+                break
 
-            self.store.insert_anchor(
-                commit_hash=c,
-                anchored_at=int(time.time()),
-                backend=self.cfg.backend
-            )
-            anchored_now.append(c)
+            wait_for = None
+            if timeout is not None:
+                oldest = min(started for _, started in running.values())
+                wait_for = max(0.0, oldest + timeout - self.clock.time())
+            done, _ = wait(running, timeout=wait_for, return_when=FIRST_COMPLETED)
+
+            for f in done:
+                unit, _ = running.pop(f)
+                if f.exception() is not None:
+                    # same as the sequential path: stop starting calls, report once the rest settle
+                    if error is None:
+                        error = f.exception()
+                        self.store.release_anchor_work(self.owner, [c for u in queue for c in u])
+                        queue.clear()
+                elif f.result():
+                    anchored_now.extend(unit)
 
+            if timeout is not None:
+                now = self.clock.time()
+                for f, (unit, started) in list(running.items()):
+                    if now - started >= timeout:
+                        del running[f]
+                        self._abandon(f, unit)
+
+        if error is not None:
+            raise error
         return anchored_now
+
+    def _abandon(self, f: Future, unit: Tuple[str, ...]) -> None:
+        self.metrics.inc("tbed_anchor_timeouts_total")
+        with self._lock:
+            self._abandoned[f] = unit
+        if f.done():
+            # finished before it was registered, so _release did not see it
+            self._requeue(f)
+
+    def _requeue(self, f: Future) -> None:
+        with self._lock:
+            unit = self._abandoned.pop(f, None)
+        if unit is not None:
+            # whatever was anchored or suppressed has already left the queue
+            self.store.release_anchor_work(self.owner, unit)
+
+    def _release(self, f: Future) -> None:
+        with self._lock:
+            self._busy -= 1
+        self._requeue(f)
+
+    def close(self) -> None:
+        if self._pool is not None:
+            self._pool.shutdown(wait=True)
+            self._pool = None
@@ -0,0 +1,116 @@
+"""
+In-memory anchored-commit index kept by Store in front of is_anchored().
+
+By default the index is an exact set of 32-byte keys, which answers both ways with one
+hash lookup. With max_exact set, the exact part becomes a bounded LRU fronted by a Bloom
+filter: the filter answers the common "not anchored" case, and a Bloom "maybe" that
+misses the LRU is reported as unknown, so the caller falls back to the database. The
+filter must keep every key ever added, so instead of being rebuilt it grows: once a layer
+is full a new one with twice the capacity and half the error rate is started, which keeps
+the combined false-positive rate under twice the configured one.
+"""
+import hashlib
+import math
+import threading
+from collections import OrderedDict
+from typing import Iterable, List, Optional, Union
+
+Key = Union[bytes, str]
+
+
+def _digest(key: Key) -> bytes:
+    # commit hashes are already uniform 32-byte digests; anything else is hashed first
+    if isinstance(key, bytes) and len(key) == 32:
+        return key
+    if isinstance(key, str):
+        key = key.encode("utf-8")
+    return hashlib.sha256(key).digest()
+
+
+class BloomFilter:
+    def __init__(self, capacity: int, error_rate: float = 0.01):
+        capacity = max(1, capacity)
+        self.capacity = capacity
+        self.error_rate = error_rate
+        self.num_bits = max(64, int(-capacity * math.log(error_rate) / (math.log(2) ** 2)))
+        self.num_hashes = max(1, round(self.num_bits / capacity * math.log(2)))
+        self._bits = bytearray((self.num_bits + 7) // 8)
+        self.count = 0
+
+    def _positions(self, key: Key):
+        # Kirsch-Mitzenmacher double hashing over two 64-bit slices of the digest
+        d = _digest(key)
+        h1 = int.from_bytes(d[:8], "little")
+        h2 = int.from_bytes(d[8:16], "little") | 1
+        m = self.num_bits
+        return [(h1 + i * h2) % m for i in range(self.num_hashes)]
+
+    def add(self, key: Key) -> None:
+        bits = self._bits
+        for p in self._positions(key):
+            bits[p >> 3] |= 1 << (p & 7)
+        self.count += 1
+
+    def __contains__(self, key: Key) -> bool:
+        bits = self._bits
+        for p in self._positions(key):
+            if not bits[p >> 3] & (1 << (p & 7)):
+                return False
+        return True
+
+
+class AnchoredIndex:
+    def __init__(self, expected: int = 1 << 16, error_rate: float = 0.01, max_exact: Optional[int] = None):
+        self.error_rate = error_rate
+        self.max_exact = max_exact
+        # only a bounded exact set needs the filter in front of it; newest layer last
+        self._blooms: List[BloomFilter] = [BloomFilter(expected, error_rate)] if max_exact is not None else []
+        self._exact: "OrderedDict[bytes, None]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def __len__(self) -> int:
+        # distinct keys held exactly: all of them unbounded, the LRU residents otherwise
+        return len(self._exact)
+
+    def _in_bloom(self, d: bytes) -> bool:
+        return any(d in b for b in self._blooms)
+
+    def _bloom_add(self, d: bytes) -> None:
+        # an evicted key coming back is already in the filter and must not fill it again
+        if self._in_bloom(d):
+            return
+        last = self._blooms[-1]
+        last.add(d)
+        if last.count >= last.capacity:
+            self._blooms.append(BloomFilter(2 * last.capacity, last.error_rate / 2))
+
+    def add_many(self, keys: Iterable[Key]) -> None:
+        with self._lock:
+            for k in keys:
+                d = _digest(k)
+                if d in self._exact:
+                    continue
+                self._exact[d] = None
+                if self.max_exact is not None:
+                    self._bloom_add(d)
+                    if len(self._exact) > self.max_exact:
+                        self._exact.popitem(last=False)
+
+    def add(self, key: Key) -> None:
+        self.add_many((key,))
+
+    def lookup(self, key: Key) -> Optional[bool]:
+        """
+        True/False when the index knows; None when the caller must ask the database.
+        """
+        d = _digest(key)
+        if self.max_exact is None:
+            return d in self._exact
+        if not self._in_bloom(d):
+            return False
+        if d in self._exact:
+            with self._lock:
+                if d in self._exact:
+                    self._exact.move_to_end(d)
+            return True
+        return None
@@ -0,0 +1,386 @@
+"""
+Compaction of reconciled history into a cold archive.
+
+The live database keeps only what the hot path still needs. compact() moves every
+transaction whose attempts are all past the cutoff, whose EXECUTED commit is anchored
+(directly or by a batch root), and which has no open watcher finding into a read-only
+SQLite segment next to the database:
+
+    tbed.sqlite.archive/<UTC day>-<first execution id>.sqlite
+
+A segment has the live schema and holds the moved executions, their anchors, inclusion
+proofs and batch roots, a snapshot of their tx_state rows and the lookup tables. It is
+written and sealed (rollback journal, chmod 0444) under a .tmp name before the rows leave
+the live database, registered in the live archive_segments table with segment_digest() in
+the same transaction that deletes them, and renamed into place after that commits. Each
+compaction first finishes the renames a crash interrupted and deletes the files no
+segment is registered for, once they are older than SWEEP_GRACE_SECONDS: a younger file
+may belong to a compaction still running in another process.
+
+tx_state stays live, so replays of archived transactions are still blocked; its
+archived_upto column records which attempts moved. Roots that still cover live commits
+are copied rather than moved.
+
+    python -m src.tbed.archive tbed.sqlite --older-than 86400     # compact
+    python -m src.tbed.archive tbed.sqlite --verify               # check segment digests
+"""
+import argparse
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+from pathlib import Path
+from typing import Any, Dict, Iterator, List, Optional, Sequence, Tuple
+
+from .storage import SCHEMA, STATUS_CODES, Store
+
+_EXECUTED = STATUS_CODES["EXECUTED"]
+
+# a segment is written here, then renamed to its registered name once the live delete commits
+TMP_SUFFIX = ".tmp"
+
+# the sweep leaves files modified this recently alone; they may be another compactor's
+SWEEP_GRACE_SECONDS = 3600
+
+# tables a segment holds, with the order segment_digest() walks them in
+SEGMENT_TABLES = (
+    ("executions", "id"),
+    ("anchors", "id"),
+    ("anchor_proofs", "commit_hash"),
+    ("tx_state", "tx_id"),
+)
+
+EXECUTION_COLUMNS = (
+    "id, tx_id, attempt, commit_hash, payload_hash, decided_at, executed_at, status, reason, decision, policy, nonce"
+)
+
+# transactions whose history is fully reconciled before the cutoff, with the segment day
+ELIGIBLE_SQL = f"""
+INSERT INTO temp.compact_tx (tx_id, day, upto)
+SELECT e.tx_id, date(max(e.executed_at), 'unixepoch'), max(e.attempt)
+FROM executions e
+LEFT JOIN anchors a ON a.commit_hash = e.commit_hash
+LEFT JOIN anchor_proofs p ON p.commit_hash = e.commit_hash
+LEFT JOIN anchors ra ON ra.commit_hash = p.root_hash
+LEFT JOIN watcher_findings f ON f.commit_hash = e.commit_hash AND f.resolved_at IS NULL
+GROUP BY e.tx_id
+HAVING max(e.executed_at) < ?
+   AND sum(e.status = {_EXECUTED} AND a.id IS NULL AND ra.id IS NULL) = 0
+   AND count(f.id) = 0
+"""
+
+
+def default_archive_dir(db_path: str) -> str:
+    return db_path + ".archive"
+
+
+def _open_segment(path: str) -> sqlite3.Connection:
+    # sealed segments never change: immutable=1 skips locking and change detection
+    conn = sqlite3.connect(Path(path).resolve().as_uri() + "?mode=ro&immutable=1", uri=True)
+    conn.row_factory = sqlite3.Row
+    return conn
+
+
+def segment_digest(conn: sqlite3.Connection) -> str:
+    """
+    sha256 over every row of SEGMENT_TABLES in key order, one JSON array per row with
+    BLOBs as hex.
+    """
+    h = hashlib.sha256()
+    for table, key in SEGMENT_TABLES:
+        for row in conn.execute(f"SELECT * FROM {table} ORDER BY {key}"):
+            vals = [table] + [v.hex() if isinstance(v, bytes) else v for v in row]
+            h.update(json.dumps(vals, separators=(",", ":")).encode("utf-8"))
+            h.update(b"\n")
+    return h.hexdigest()
+
+
+def _write_segment(conn: sqlite3.Connection, path: str, day: str) -> Dict[str, int]:
+    """
+    Copies the day's transactions (temp.compact_ids) into a new segment file at path.
+    """
+    for p in (path, path + "-journal"):
+        if os.path.exists(p):
+            os.chmod(p, 0o644)
+            os.remove(p)
+    seg = sqlite3.connect(path)
+    seg.executescript(SCHEMA)
+    seg.execute("PRAGMA journal_mode=DELETE")
+    seg.close()
+
+    conn.execute("ATTACH DATABASE ? AS seg", (path,))
+    try:
+        with conn:
+            for table in ("statuses", "reasons", "policies"):
+                conn.execute(f"INSERT OR IGNORE INTO seg.{table} SELECT * FROM main.{table}")
+            conn.execute(
+                f"""
+                INSERT INTO seg.executions ({EXECUTION_COLUMNS})
+                SELECT {EXECUTION_COLUMNS} FROM main.executions WHERE id IN (SELECT id FROM temp.compact_ids)
+                """
+            )
+            conn.execute(
+                f"""
+                INSERT INTO seg.anchor_proofs (commit_hash, root_hash, leaf_index, proof)
+                SELECT commit_hash, root_hash, leaf_index, proof FROM main.anchor_proofs
+                WHERE commit_hash IN (SELECT commit_hash FROM seg.executions WHERE status = {_EXECUTED})
+                """
+            )
+            conn.execute(
+                f"""
+                INSERT INTO seg.anchors (id, commit_hash, anchored_at, backend)
+                SELECT id, commit_hash, anchored_at, backend FROM main.anchors
+                WHERE commit_hash IN (SELECT commit_hash FROM seg.executions WHERE status = {_EXECUTED})
+                   OR commit_hash IN (SELECT root_hash FROM seg.anchor_proofs)
+                """
+            )
+            conn.execute(
+                """
+                INSERT INTO seg.tx_state (tx_id, last_attempt, executed, commit_hash, archived_upto)
+                SELECT tx_id, last_attempt, executed, commit_hash, archived_upto FROM main.tx_state
+                WHERE tx_id IN (SELECT tx_id FROM temp.compact_tx WHERE day = ?)
+                """,
+                (day,),
+            )
+        counts = {
+            "executions": conn.execute("SELECT count(*) FROM seg.executions").fetchone()[0],
+            "anchors": conn.execute("SELECT count(*) FROM seg.anchors").fetchone()[0],
+        }
+    finally:
+        conn.execute("DETACH DATABASE seg")
+    return counts
+
+
+def _archive_day(store: Store, conn: sqlite3.Connection, archive_dir: str, day: str, now: int) -> Dict[str, Any]:
+    conn.execute("DROP TABLE IF EXISTS temp.compact_ids")
+    conn.execute(
+        """
+        CREATE TEMP TABLE compact_ids AS
+        SELECT e.id FROM executions e JOIN temp.compact_tx c ON c.tx_id = e.tx_id
+        WHERE c.day = ? AND e.attempt <= c.upto
+        """,
+        (day,),
+    )
+    lo, hi = conn.execute("SELECT min(id), max(id) FROM temp.compact_ids").fetchone()
+    name = f"{day}-{lo:012d}.sqlite"
+    path = os.path.join(archive_dir, name)
+
+    tmp = path + TMP_SUFFIX
+    counts = _write_segment(conn, tmp, day)
+    check = sqlite3.connect(tmp)
+    try:
+        digest = segment_digest(check)
+    finally:
+        check.close()
+    os.chmod(tmp, 0o444)
+
+    # the segment is durable; now drop the rows from the live database in one transaction
+    conn.execute("CREATE TEMP TABLE IF NOT EXISTS compact_commits (commit_hash BLOB PRIMARY KEY)")
+    with conn:
+        conn.execute("BEGIN IMMEDIATE")
+        conn.execute("DELETE FROM temp.compact_commits")
+        conn.execute(
+            f"""
+            INSERT OR IGNORE INTO temp.compact_commits
+            SELECT commit_hash FROM executions WHERE status = {_EXECUTED} AND id IN (SELECT id FROM temp.compact_ids)
+            """
+        )
+        roots = [
+            r[0] for r in conn.execute(
+                "SELECT DISTINCT root_hash FROM anchor_proofs WHERE commit_hash IN (SELECT commit_hash FROM temp.compact_commits)"
+            )
+        ]
+        conn.execute("DELETE FROM anchor_proofs WHERE commit_hash IN (SELECT commit_hash FROM temp.compact_commits)")
+        conn.execute("DELETE FROM anchors WHERE commit_hash IN (SELECT commit_hash FROM temp.compact_commits)")
+        # a root moves once no live commit relies on it
+        conn.executemany(
+            "DELETE FROM anchors WHERE commit_hash = ? AND NOT EXISTS (SELECT 1 FROM anchor_proofs WHERE root_hash = ?)",
+            [(r, r) for r in roots],
+        )
+        conn.execute("DELETE FROM executions WHERE id IN (SELECT id FROM temp.compact_ids)")
+        conn.execute(
+            """
+            UPDATE tx_state SET archived_upto = (SELECT upto FROM temp.compact_tx c WHERE c.tx_id = tx_state.tx_id)
+            WHERE tx_id IN (SELECT tx_id FROM temp.compact_tx WHERE day = ?)
+            """,
+            (day,),
+        )
+        conn.execute(
+            """
+            INSERT INTO archive_segments
+              (day, path, executions, anchors, min_execution_id, max_execution_id, digest, created_at)
+            VALUES (?, ?, ?, ?, ?, ?, ?, ?)
+            """,
+            (day, name, counts["executions"], counts["anchors"], lo, hi, digest, now),
+        )
+    os.replace(tmp, path)
+    store.metrics.inc("tbed_archived_executions_total", counts["executions"])
+    return {"day": day, "path": name, "digest": digest, **counts}
+
+
+def _remove(path: str) -> None:
+    os.chmod(path, 0o644)
+    os.remove(path)
+
+
+def _sweep(conn: sqlite3.Connection, archive_dir: str, before: float) -> None:
+    """
+    Finishes renames interrupted after their live delete committed, and deletes segment
+    files (sealed or half-written) that no registered segment refers to. Only files last
+    modified before `before` are touched.
+    """
+    registered = {r[0] for r in conn.execute("SELECT path FROM archive_segments")}
+    for entry in os.listdir(archive_dir):
+        path = os.path.join(archive_dir, entry)
+        try:
+            if os.stat(path).st_mtime >= before:
+                continue
+        except FileNotFoundError:
+            continue  # renamed or removed by the compactor that owns it
+        if entry.endswith(TMP_SUFFIX):
+            final = entry[: -len(TMP_SUFFIX)]
+            if final in registered and not os.path.exists(os.path.join(archive_dir, final)):
+                os.replace(path, os.path.join(archive_dir, final))
+            else:
+                _remove(path)
+        elif entry.endswith(".sqlite") and entry not in registered:
+            _remove(path)
+        elif entry.endswith("-journal"):
+            _remove(path)
+
+
+def compact(
+    store: Store,
+    older_than: int,
+    archive_dir: Optional[str] = None,
+    sweep_grace_seconds: float = SWEEP_GRACE_SECONDS,
+) -> List[Dict[str, Any]]:
+    """
+    Moves reconciled transactions whose newest attempt has executed_at < older_than
+    (usually now minus the anchor deadline) into one new segment per UTC day.
+    Leftovers of earlier runs are swept only once sweep_grace_seconds old.
+    Returns the new segments.
+    """
+    archive_dir = archive_dir or default_archive_dir(store.db_path)
+    os.makedirs(archive_dir, exist_ok=True)
+    now = int(time.time())
+    store.flush()
+    # own connection: ATTACH and temp tables stay off the pooled ones
+    conn = store._connect()
+    try:
+        _sweep(conn, archive_dir, time.time() - sweep_grace_seconds)
+        conn.execute("CREATE TEMP TABLE compact_tx (tx_id TEXT PRIMARY KEY, day TEXT NOT NULL, upto INTEGER NOT NULL)")
+        with conn:
+            conn.execute(ELIGIBLE_SQL, (older_than,))
+        days = [r[0] for r in conn.execute("SELECT DISTINCT day FROM temp.compact_tx ORDER BY day")]
+        with store.metrics.timer("tbed_store_query_seconds", op="compact"):
+            return [_archive_day(store, conn, archive_dir, day, now) for day in days]
+    finally:
+        conn.close()
+
+
+def list_segments(store: Store) -> List[sqlite3.Row]:
+    with store._conn() as conn:
+        return conn.execute("SELECT * FROM archive_segments ORDER BY id").fetchall()
+
+
+def segment_paths(store: Store, archive_dir: Optional[str] = None) -> List[str]:
+    archive_dir = archive_dir or default_archive_dir(store.db_path)
+    return [os.path.join(archive_dir, s["path"]) for s in list_segments(store)]
+
+
+def iter_archive(
+    store: Store, sql: str, params: Sequence = (), archive_dir: Optional[str] = None
+) -> Iterator[sqlite3.Row]:
+    """
+    Runs sql against every segment, oldest first, and yields the rows. Segments carry the
+    live schema including the executions_v / anchors_v views, e.g.
+
+        iter_archive(store, "SELECT * FROM executions_v WHERE tx_id = ?", (tx_id,))
+    """
+    for path in segment_paths(store, archive_dir):
+        conn = _open_segment(path)
+        try:
+            yield from conn.execute(sql, params)
+        finally:
+            conn.close()
+
+
+# sealed segments never change, so each one's anchor hashes are read once per process
+_segment_anchors: Dict[Tuple[str, str], Tuple[str, ...]] = {}
+_segment_anchors_lock = threading.Lock()
+
+
+def archived_anchor_hashes(store: Store, archive_dir: Optional[str] = None) -> Iterator[str]:
+    """
+    commit_hash (hex) of every anchor in the registered segments, oldest segment first.
+    Cached per segment path and digest.
+    """
+    archive_dir = archive_dir or default_archive_dir(store.db_path)
+    for s in list_segments(store):
+        path = os.path.abspath(os.path.join(archive_dir, s["path"]))
+        key = (path, s["digest"])
+        with _segment_anchors_lock:
+            hashes = _segment_anchors.get(key)
+        if hashes is None:
+            conn = _open_segment(path)
+            try:
+                hashes = tuple(r["commit_hash"] for r in conn.execute("SELECT commit_hash FROM anchors_v"))
+            finally:
+                conn.close()
+            with _segment_anchors_lock:
+                _segment_anchors[key] = hashes
+        yield from hashes
+
+
+def verify_segments(store: Store, archive_dir: Optional[str] = None) -> List[Dict[str, Any]]:
+    """
+    Recomputes every registered segment's digest. Returns the segments that are missing
+    or no longer match.
+    """
+    archive_dir = archive_dir or default_archive_dir(store.db_path)
+    bad = []
+    for s in list_segments(store):
+        path = os.path.join(archive_dir, s["path"])
+        if not os.path.exists(path):
+            bad.append({"path": s["path"], "problem": "missing"})
+            continue
+        conn = _open_segment(path)
+        try:
+            digest = segment_digest(conn)
+        finally:
+            conn.close()
+        if digest != s["digest"]:
+            bad.append({"path": s["path"], "problem": "digest mismatch", "expected": s["digest"], "actual": digest})
+    return bad
+
+
+def main():
+    ap = argparse.ArgumentParser(description="Compact reconciled tbed history into read-only archive segments")
+    ap.add_argument("db", help="live sqlite file")
+    ap.add_argument("--older-than", type=int, default=86400,
+                    help="archive transactions whose newest attempt is at least this many seconds old")
+    ap.add_argument("--archive-dir", default=None, help="default: <db>.archive")
+    ap.add_argument("--verify", action="store_true", help="only check the digests of existing segments")
+    args = ap.parse_args()
+
+    store = Store(db_path=args.db)
+    try:
+        if args.verify:
+            bad = verify_segments(store, args.archive_dir)
+            for b in bad:
+                print(json.dumps(b, sort_keys=True))
+            print(f"{len(list_segments(store))} segments, {len(bad)} bad")
+            if bad:
+                raise SystemExit(1)
+            return
+        for seg in compact(store, int(time.time()) - args.older_than, args.archive_dir):
+            print(f"{seg['path']}: {seg['executions']} executions, {seg['anchors']} anchors, digest {seg['digest']}")
+    finally:
+        store.close()
+
+
+if __name__ == "__main__":
+    main()
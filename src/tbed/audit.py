@@ -0,0 +1,434 @@
+"""
+Offline audit: replays a whole tbed.sqlite execution log and checks its invariants.
+
+    python -m src.tbed.audit tbed.sqlite --out audit-out --workers 4
+
+The log is split into executions.id ranges that a process pool checks in parallel over
+read-only connections. Each range checks, per attempt:
+- the recorded receipt fields reproduce commit_hash (EXECUTED / POLICY_REJECT rows; rows
+  written before schema v4 have no receipt fields and are counted as unverifiable)
+- at most one EXECUTED per tx_id, and REPLAY exactly for attempts after it
+- status, reason and decision agree with each other
+- attempts are gap-free and tx_state matches the log
+- Merkle proofs verify against an anchored root
+
+One more task checks for anchors of commits that never executed, and tx_state entries
+claiming an execution the log does not have.
+
+Attempts moved to the cold archive (archive.py) are accounted for through
+tx_state.archived_upto. With --archive every registered segment is audited as well, one
+task per segment, and its digest checked against the manifest.
+
+Progress goes to OUT/checkpoint.json after every finished range, so an interrupted audit
+resumes where it stopped; violations go to OUT/violations.jsonl and the summary to
+OUT/report.json.
+"""
+import argparse
+import hashlib
+import json
+import os
+import sqlite3
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Tuple
+
+from .archive import default_archive_dir, segment_digest
+from .merkle import decode_proof, verify_proof
+from .services import REASON_INVALID_RECEIPT, REASON_OK, REASON_REJECT, REASON_REPLAY, REASON_TOCTOU
+from .storage import DECISION_CODES, STATUS_CODES
+
+CHUNK = 50_000
+CHECKPOINT_VERSION = 1
+
+KNOWN_REASONS = {REASON_OK, REASON_REPLAY, REASON_INVALID_RECEIPT, REASON_TOCTOU, REASON_REJECT}
+_EXECUTED = STATUS_CODES["EXECUTED"]
+_DECISIONS = {code: name for name, code in DECISION_CODES.items()}
+
+# (counts, violations) produced by one task
+Result = Tuple[Dict[str, int], List[Dict[str, Any]]]
+
+EXECUTIONS_SQL = f"""
+SELECT e.id, e.tx_id, e.attempt, e.commit_hash, e.payload_hash, e.decided_at, e.status,
+       r.text AS reason, e.decision, pol.version AS policy_version, e.nonce,
+       (SELECT min(x.attempt) FROM executions x
+         WHERE x.tx_id = e.tx_id AND x.status = {_EXECUTED}) AS first_executed,
+       (e.attempt - 1 <= coalesce(t.archived_upto, 0) OR EXISTS (SELECT 1 FROM executions x
+         WHERE x.tx_id = e.tx_id AND x.attempt = e.attempt - 1)) AS has_previous,
+       t.last_attempt, t.executed AS tx_executed, t.commit_hash AS tx_commit,
+       coalesce(t.archived_upto, 0) AS archived_upto,
+       a.id AS anchor_id, p.root_hash, p.proof, ra.id AS root_anchor_id
+FROM executions e
+JOIN reasons r ON r.code = e.reason
+LEFT JOIN policies pol ON pol.code = e.policy
+LEFT JOIN tx_state t ON t.tx_id = e.tx_id
+LEFT JOIN anchors a ON e.status = {_EXECUTED} AND a.commit_hash = e.commit_hash
+LEFT JOIN anchor_proofs p ON e.status = {_EXECUTED} AND p.commit_hash = e.commit_hash
+LEFT JOIN anchors ra ON ra.commit_hash = p.root_hash
+WHERE e.id BETWEEN ? AND ?
+ORDER BY e.id
+"""
+
+
+def _connect_ro(db_path: str) -> sqlite3.Connection:
+    conn = sqlite3.connect(Path(db_path).resolve().as_uri() + "?mode=ro", uri=True)
+    conn.row_factory = sqlite3.Row
+    return conn
+
+
+def _hex(v) -> Optional[str]:
+    return v.hex() if isinstance(v, bytes) else v
+
+
+def _js(v) -> str:
+    """
+    JSON string literal as canonical_json writes it; hex BLOBs skip the encoder.
+    """
+    return '"' + v.hex() + '"' if isinstance(v, bytes) else json.dumps(v)
+
+
+def recompute_commits(rows: List[sqlite3.Row]) -> List[Optional[str]]:
+    """
+    services.compute_commit for a batch of rows, straight from the stored columns.
+    Byte-identical to canonical_json of the binding: keys in sorted order, no whitespace,
+    strings escaped by json.dumps. None where the row has no receipt fields.
+    """
+    policies: Dict[str, str] = {}
+    decisions = {code: json.dumps(name) for code, name in _DECISIONS.items()}
+    bindings: List[Optional[bytes]] = []
+    for r in rows:
+        decision = decisions.get(r["decision"])
+        if decision is None or r["policy_version"] is None or r["nonce"] is None:
+            bindings.append(None)
+            continue
+        pv = r["policy_version"]
+        policy = policies.get(pv)
+        if policy is None:
+            policy = policies[pv] = json.dumps(pv)
+        bindings.append((
+            '{"decided_at":%d,"decision":%s,"nonce":%s,"payload_hash":%s,"policy_version":%s,"tx_id":%s}'
+            % (r["decided_at"], decision, _js(r["nonce"]), _js(r["payload_hash"]), policy, json.dumps(r["tx_id"]))
+        ).encode("utf-8"))
+    sha256 = hashlib.sha256
+    return [None if b is None else sha256(b).hexdigest() for b in bindings]
+
+
+def _violation(check: str, r: sqlite3.Row, detail: str = "") -> Dict[str, Any]:
+    return {
+        "check": check,
+        "execution_id": r["id"],
+        "tx_id": r["tx_id"],
+        "attempt": r["attempt"],
+        "commit_hash": _hex(r["commit_hash"]),
+        "detail": detail,
+    }
+
+
+def _check_row(r: sqlite3.Row, recomputed: Optional[str], counts: Dict[str, int], out: List[Dict[str, Any]]) -> None:
+    executed = r["status"] == _EXECUTED
+    reason = r["reason"]
+    commit = _hex(r["commit_hash"])
+    first = r["first_executed"]
+    if first is None and r["tx_executed"] and r["archived_upto"]:
+        # executed in an attempt that has since moved to the archive
+        first = 0
+    decision = _DECISIONS.get(r["decision"])
+
+    counts["rows"] += 1
+    counts["executed" if executed else "blocked"] += 1
+
+    # status / reason / decision consistency
+    if reason not in KNOWN_REASONS:
+        out.append(_violation("unknown_reason", r, reason))
+    elif executed != (reason == REASON_OK):
+        out.append(_violation("reason_status_mismatch", r, reason))
+    if executed and decision is not None and decision != "APPROVE":
+        out.append(_violation("decision_mismatch", r, f"EXECUTED with decision={decision}"))
+    if reason == REASON_REJECT and decision is not None and decision != "REJECT":
+        out.append(_violation("decision_mismatch", r, f"{reason} with decision={decision}"))
+
+    # the commit must bind what was recorded, except where the row itself says it does not
+    if recomputed is None:
+        counts["unverifiable"] += 1
+    elif executed or reason == REASON_REJECT:
+        if recomputed == commit:
+            counts["verified"] += 1
+        else:
+            out.append(_violation("commit_mismatch", r, f"recomputed {recomputed}"))
+    elif reason == REASON_TOCTOU and recomputed == commit:
+        out.append(_violation("toctou_payload_matches", r, "recorded payload reproduces the commit"))
+
+    # replay resistance: one EXECUTED per tx_id, every later attempt blocked as a replay
+    if executed and first is not None and first < r["attempt"]:
+        out.append(_violation("duplicate_executed", r, f"already executed at attempt {first}"))
+    if reason == REASON_REPLAY and (first is None or first > r["attempt"]):
+        out.append(_violation("replay_without_execution", r))
+    if not executed and reason != REASON_REPLAY and first is not None and first < r["attempt"]:
+        out.append(_violation("missed_replay", r, f"{reason} after execution at attempt {first}"))
+
+    # attempt allocation
+    if not r["has_previous"]:
+        out.append(_violation("attempt_gap", r, f"attempt {r['attempt'] - 1} missing"))
+    if r["last_attempt"] is None or r["attempt"] > r["last_attempt"]:
+        out.append(_violation("tx_state_behind", r, f"last_attempt={r['last_attempt']}"))
+    elif executed and first == r["attempt"] and (not r["tx_executed"] or _hex(r["tx_commit"]) != commit):
+        out.append(_violation("tx_state_mismatch", r, f"tx_state commit={_hex(r['tx_commit'])}"))
+
+    # anchoring
+    if not executed:
+        return
+    if r["anchor_id"] is not None:
+        counts["anchored"] += 1
+    elif r["proof"] is not None:
+        root = _hex(r["root_hash"])
+        if not verify_proof(commit, decode_proof(r["proof"]), root):
+            out.append(_violation("bad_proof", r, f"root {root}"))
+        elif r["root_anchor_id"] is None:
+            out.append(_violation("proof_root_unanchored", r, f"root {root}"))
+        else:
+            counts["anchored"] += 1
+    else:
+        # not an invariant violation by itself: the watcher decides when it is overdue
+        counts["unanchored"] += 1
+
+
+def audit_executions(db_path: str, lo: int, hi: int) -> Result:
+    """
+    Checks executions with lo <= id <= hi.
+    """
+    counts = dict.fromkeys(("rows", "executed", "blocked", "verified", "unverifiable", "anchored", "unanchored"), 0)
+    out: List[Dict[str, Any]] = []
+    conn = _connect_ro(db_path)
+    try:
+        cur = conn.execute(EXECUTIONS_SQL, (lo, hi))
+        while True:
+            rows = cur.fetchmany(4096)
+            if not rows:
+                break
+            for r, recomputed in zip(rows, recompute_commits(rows)):
+                _check_row(r, recomputed, counts, out)
+    finally:
+        conn.close()
+    return counts, out
+
+
+def audit_global(db_path: str, max_anchor_id: int) -> Result:
+    """
+    Checks that are not per execution row: orphan anchors and tx_state without a log entry.
+    """
+    out: List[Dict[str, Any]] = []
+    conn = _connect_ro(db_path)
+    try:
+        # a direct anchor must be an executed commit; a batch anchor must be a root with proofs
+        for r in conn.execute(
+            f"""
+            SELECT a.id, a.commit_hash FROM anchors a
+            WHERE a.id <= ?
+              AND a.commit_hash NOT IN (SELECT commit_hash FROM executions WHERE status = {_EXECUTED})
+              AND NOT EXISTS (SELECT 1 FROM anchor_proofs p WHERE p.root_hash = a.commit_hash)
+            ORDER BY a.id
+            """,
+            (max_anchor_id,),
+        ):
+            out.append({"check": "orphan_anchor", "anchor_id": r["id"], "commit_hash": _hex(r["commit_hash"])})
+
+        for r in conn.execute(
+            f"""
+            SELECT t.tx_id, t.commit_hash FROM tx_state t
+            WHERE t.executed = 1 AND t.archived_upto = 0
+              AND NOT EXISTS (SELECT 1 FROM executions e WHERE e.tx_id = t.tx_id AND e.status = {_EXECUTED})
+            """
+        ):
+            out.append({"check": "tx_state_without_execution", "tx_id": r["tx_id"], "commit_hash": _hex(r["commit_hash"])})
+    finally:
+        conn.close()
+    return {}, out
+
+
+def audit_segment(path: str, digest: str) -> Result:
+    """
+    One archive segment: the same checks as for the live database, plus its digest.
+    """
+    name = os.path.basename(path)
+    if not os.path.exists(path):
+        return {}, [{"check": "segment_missing", "segment": name}]
+    counts, out = audit_executions(path, 1, 2 ** 62)
+    out.extend(audit_global(path, 2 ** 62)[1])
+    conn = _connect_ro(path)
+    try:
+        actual = segment_digest(conn)
+    finally:
+        conn.close()
+    if actual != digest:
+        out.append({"check": "segment_digest_mismatch", "expected": digest, "actual": actual})
+    for v in out:
+        v["segment"] = name
+    return {f"archived_{k}": n for k, n in counts.items()}, out
+
+
+class Checkpoint:
+    """
+    OUT/checkpoint.json, rewritten atomically after every finished task. violations_offset
+    is the size of violations.jsonl at that point, so a crash between appending violations
+    and saving the checkpoint cannot duplicate them on resume.
+    """
+    def __init__(self, out_dir: str):
+        self.path = os.path.join(out_dir, "checkpoint.json")
+        self.state: Dict[str, Any] = {}
+        if os.path.exists(self.path):
+            with open(self.path, "r", encoding="utf-8") as f:
+                self.state = json.load(f)
+
+    def save(self) -> None:
+        tmp = self.path + ".tmp"
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump(self.state, f, sort_keys=True)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp, self.path)
+
+
+def _ranges(max_id: int, chunk: int) -> List[Tuple[int, int]]:
+    return [(lo, min(lo + chunk - 1, max_id)) for lo in range(1, max_id + 1, chunk)]
+
+
+def _segments(conn: sqlite3.Connection, archive_dir: str) -> List[List[str]]:
+    try:
+        rows = conn.execute("SELECT path, digest FROM archive_segments ORDER BY id").fetchall()
+    except sqlite3.OperationalError:  # written before archive segments existed
+        return []
+    return [[os.path.join(archive_dir, r["path"]), r["digest"]] for r in rows]
+
+
+def run_audit(
+    db_path: str,
+    out_dir: str,
+    workers: Optional[int] = None,
+    chunk: int = CHUNK,
+    archive: bool = False,
+    archive_dir: Optional[str] = None,
+) -> Dict[str, Any]:
+    """
+    Audits db_path into out_dir, resuming from out_dir's checkpoint if there is one.
+    The audited prefix (max execution / anchor id, and the archive segments) is fixed when
+    the audit starts, so a live database can keep growing meanwhile. Returns the report
+    (also written to report.json).
+    """
+    os.makedirs(out_dir, exist_ok=True)
+    db_path = os.path.abspath(db_path)
+    cp = Checkpoint(out_dir)
+    if cp.state:
+        if cp.state.get("version") != CHECKPOINT_VERSION or cp.state.get("db") != db_path:
+            raise ValueError(f"{cp.path} belongs to another audit ({cp.state.get('db')}); use a fresh --out")
+        chunk = cp.state["chunk"]
+    else:
+        conn = _connect_ro(db_path)
+        try:
+            # anchors first: every anchor in the prefix then refers to an execution in it
+            max_anchor_id = conn.execute("SELECT coalesce(max(id), 0) FROM anchors").fetchone()[0]
+            max_id = conn.execute("SELECT coalesce(max(id), 0) FROM executions").fetchone()[0]
+            segments = _segments(conn, archive_dir or default_archive_dir(db_path)) if archive else []
+        finally:
+            conn.close()
+        cp.state = {
+            "version": CHECKPOINT_VERSION,
+            "db": db_path,
+            "chunk": chunk,
+            "max_execution_id": max_id,
+            "max_anchor_id": max_anchor_id,
+            "done": [],
+            "global_done": False,
+            "segments": segments,
+            "segments_done": [],
+            "counts": {},
+            "violations": {},
+            "violations_offset": 0,
+            "seconds": 0.0,
+        }
+        cp.save()
+
+    state = cp.state
+    violations_path = os.path.join(out_dir, "violations.jsonl")
+    with open(violations_path, "ab") as f:
+        f.truncate(state["violations_offset"])
+
+    done = set(state["done"])
+    todo = [(lo, hi) for lo, hi in _ranges(state["max_execution_id"], chunk) if lo not in done]
+    segments_todo = [(p, d) for p, d in state["segments"] if p not in set(state["segments_done"])]
+    t = time.perf_counter()
+
+    def record(key, result: Result, vf) -> None:
+        counts, violations = result
+        for k, n in counts.items():
+            state["counts"][k] = state["counts"].get(k, 0) + n
+        for v in violations:
+            vf.write(json.dumps(v, sort_keys=True) + "\n")
+            state["violations"][v["check"]] = state["violations"].get(v["check"], 0) + 1
+        vf.flush()
+        os.fsync(vf.fileno())
+        if key is None:
+            state["global_done"] = True
+        elif isinstance(key, str):
+            state["segments_done"].append(key)
+        else:
+            state["done"].append(key)
+        state["violations_offset"] = vf.tell()
+        cp.save()
+
+    with open(violations_path, "a", encoding="utf-8") as vf:
+        if workers is not None and workers <= 1:
+            for lo, hi in todo:
+                record(lo, audit_executions(db_path, lo, hi), vf)
+            if not state["global_done"]:
+                record(None, audit_global(db_path, state["max_anchor_id"]), vf)
+            for path, digest in segments_todo:
+                record(path, audit_segment(path, digest), vf)
+        else:
+            with ProcessPoolExecutor(max_workers=workers) as pool:
+                futures = {pool.submit(audit_executions, db_path, lo, hi): lo for lo, hi in todo}
+                if not state["global_done"]:
+                    futures[pool.submit(audit_global, db_path, state["max_anchor_id"])] = None
+                for path, digest in segments_todo:
+                    futures[pool.submit(audit_segment, path, digest)] = path
+                for fut in as_completed(futures):
+                    record(futures[fut], fut.result(), vf)
+
+    state["seconds"] += time.perf_counter() - t
+    cp.save()
+
+    report = {
+        "db": db_path,
+        "max_execution_id": state["max_execution_id"],
+        "max_anchor_id": state["max_anchor_id"],
+        "archive_segments": len(state["segments"]),
+        "counts": state["counts"],
+        "violations": state["violations"],
+        "ok": not state["violations"],
+        "seconds": round(state["seconds"], 3),
+    }
+    with open(os.path.join(out_dir, "report.json"), "w", encoding="utf-8") as f:
+        json.dump(report, f, indent=2, sort_keys=True)
+    return report
+
+
+def main():
+    ap = argparse.ArgumentParser(description="Offline audit of a tbed SQLite execution log")
+    ap.add_argument("db", help="sqlite file to audit (opened read-only)")
+    ap.add_argument("--out", default="audit-out", help="directory for checkpoint, violations and report")
+    ap.add_argument("--workers", type=int, default=None, help="worker processes (default: CPU count; 1 = in-process)")
+    ap.add_argument("--chunk", type=int, default=CHUNK, help="executions per task")
+    ap.add_argument("--archive", action="store_true", help="also audit the archive segments")
+    ap.add_argument("--archive-dir", default=None, help="default: <db>.archive")
+    args = ap.parse_args()
+
+    report = run_audit(
+        args.db, args.out, workers=args.workers, chunk=args.chunk, archive=args.archive, archive_dir=args.archive_dir
+    )
+    print(json.dumps(report, indent=2, sort_keys=True))
+    if not report["ok"]:
+        print(f"Violations written to {os.path.join(os.path.abspath(args.out), 'violations.jsonl')}")
+        raise SystemExit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,420 @@
+"""
+Anchor backends: where AnchorWorker publishes anchored hashes (single commits or Merkle
+roots) so they live outside the execution database.
+
+- SqliteAnchorBackend: the original behaviour, anchors live in the Store's own anchors table.
+- SegmentLogBackend: local append-only log of length-prefixed, CRC-checked records in
+  rotating segment files, with batched fsync, mmap reads and a sparse offset index.
+- HttpAnchorBackend: client for the stand-in transparency log in tlog_server.py, over a
+  pool of keep-alive connections.
+
+AnchorWorker still mirrors every anchor (and inclusion proofs) into the Store so it knows
+what is left to do; Watcher(backend=...) reconciles against the backend itself, so a row
+in the local anchors table alone no longer counts as anchored.
+"""
+import bisect
+import http.client
+import json
+import mmap
+import os
+import queue
+import struct
+import threading
+import zlib
+from typing import Dict, Iterable, Iterator, List, Optional, Sequence, Set, Tuple
+from urllib.parse import urlsplit
+
+from .storage import Store, hash_to_db
+
+# (hash_hex, anchored_at)
+Entry = Tuple[str, int]
+
+
+class AnchorBackend:
+    name: str = "backend"
+    # range_summaries/range_keys implemented, so Watcher can reconcile by range digests
+    supports_ranges: bool = False
+
+    def append(self, entries: Sequence[Entry]) -> None:
+        """
+        Durably records the entries before returning.
+        """
+        raise NotImplementedError
+
+    def contains(self, hash_hex: str) -> bool:
+        raise NotImplementedError
+
+    def contains_many(self, hashes: Iterable[str]) -> Set[str]:
+        return {h for h in hashes if self.contains(h)}
+
+    def range_summaries(self, prefixes: Sequence[str]) -> Dict[str, Tuple[int, str]]:
+        """
+        (count, digest) per hex-prefix range of the held hashes; see reconcile.py.
+        """
+        raise NotImplementedError
+
+    def range_keys(self, prefixes: Sequence[str]) -> Dict[str, List[str]]:
+        raise NotImplementedError
+
+    def close(self) -> None:
+        pass
+
+
+class SqliteAnchorBackend(AnchorBackend):
+    """
+    Anchors are the rows AnchorWorker writes into the Store's anchors table, so append()
+    has nothing extra to do.
+    """
+    def __init__(self, store: Store, name: str = "local_log"):
+        self.store = store
+        self.name = name
+
+    def append(self, entries: Sequence[Entry]) -> None:
+        pass
+
+    def contains(self, hash_hex: str) -> bool:
+        return self.store.is_anchored(hash_hex, fresh=True)
+
+
+# ---- segment-file log ----
+
+# record: u32 payload length, u32 crc32(payload), payload = u64 seq, i64 anchored_at, key bytes
+_HEADER = struct.Struct(">II")
+_FIXED = struct.Struct(">Qq")
+
+
+def key_bytes(hash_hex: str) -> bytes:
+    k = hash_to_db(hash_hex)
+    return k if isinstance(k, bytes) else k.encode("utf-8")
+
+
+def key_hex(b: bytes) -> str:
+    return b.hex() if len(b) == 32 else b.decode("utf-8")
+
+
+class _Segment:
+    def __init__(self, path: str, base_seq: int):
+        self.path = path
+        self.base_seq = base_seq
+        self.next_seq = base_seq
+        self.size = 0
+        # sparse index: every index_interval-th record as parallel (seq, offset) lists
+        self.index_seqs: List[int] = []
+        self.index_offsets: List[int] = []
+        self._mmap: Optional[mmap.mmap] = None
+        self._mapped_size = 0
+
+    def view(self) -> Optional[mmap.mmap]:
+        # the active segment grows, so remap when it has been appended to since the last map
+        if self._mmap is not None and self._mapped_size == self.size:
+            return self._mmap
+        if self._mmap is not None:
+            self._mmap.close()
+            self._mmap = None
+        if self.size == 0:
+            return None
+        with open(self.path, "rb") as f:
+            self._mmap = mmap.mmap(f.fileno(), self.size, access=mmap.ACCESS_READ)
+        self._mapped_size = self.size
+        return self._mmap
+
+    def close(self) -> None:
+        if self._mmap is not None:
+            self._mmap.close()
+            self._mmap = None
+
+
+def _parse(buf, offset: int, end: int) -> Optional[Tuple[int, int, int, bytes]]:
+    """
+    Returns (next_offset, seq, anchored_at, key) or None at a torn/corrupt tail.
+    """
+    if offset + _HEADER.size > end:
+        return None
+    length, crc = _HEADER.unpack_from(buf, offset)
+    start = offset + _HEADER.size
+    if length < _FIXED.size or start + length > end:
+        return None
+    payload = bytes(buf[start:start + length])
+    if zlib.crc32(payload) != crc:
+        return None
+    seq, anchored_at = _FIXED.unpack_from(payload)
+    return start + length, seq, anchored_at, payload[_FIXED.size:]
+
+
+class SegmentLogBackend(AnchorBackend):
+    """
+    Append-only log in directory `path`: files <base_seq>.log, rolled over at
+    segment_bytes. append() writes all entries of a call and fsyncs once; with
+    sync_every=N only every N-th append (and flush/close) fsyncs.
+
+    On open every segment is scanned through mmap to rebuild the sparse index and the
+    in-memory key set used by contains(); a torn record at the tail of the last segment
+    (crash mid-write) is truncated away.
+    """
+    supports_ranges = True
+
+    def __init__(
+        self,
+        path: str,
+        name: str = "segment_log",
+        segment_bytes: int = 64 << 20,
+        index_interval: int = 64,
+        sync_every: int = 1,
+    ):
+        self.path = path
+        self.name = name
+        self.segment_bytes = segment_bytes
+        self.index_interval = max(1, index_interval)
+        self.sync_every = sync_every
+        self._lock = threading.Lock()
+        self._keys: Set[bytes] = set()
+        self._key_set = None  # (log size, reconcile.KeySet), rebuilt after appends
+        self._segments: List[_Segment] = []
+        self._unsynced = 0
+        os.makedirs(path, exist_ok=True)
+
+        names = sorted(n for n in os.listdir(path) if n.endswith(".log"))
+        for n in names:
+            self._segments.append(self._load(os.path.join(path, n), int(n[:-4])))
+        if not self._segments:
+            self._segments.append(_Segment(self._segment_path(0), 0))
+        self._file = open(self._segments[-1].path, "ab")
+
+    def _segment_path(self, base_seq: int) -> str:
+        return os.path.join(self.path, f"{base_seq:020d}.log")
+
+    def _load(self, path: str, base_seq: int) -> _Segment:
+        seg = _Segment(path, base_seq)
+        seg.size = os.path.getsize(path)
+        buf = seg.view()
+        offset, count = 0, 0
+        while buf is not None:
+            rec = _parse(buf, offset, seg.size)
+            if rec is None:
+                break
+            if count % self.index_interval == 0:
+                seg.index_seqs.append(rec[1])
+                seg.index_offsets.append(offset)
+            offset, seq, _, key = rec
+            self._keys.add(key)
+            seg.next_seq = seq + 1
+            count += 1
+        if offset < seg.size:
+            seg.close()
+            with open(path, "r+b") as f:
+                f.truncate(offset)
+            seg.size = offset
+        return seg
+
+    def __len__(self) -> int:
+        return self._segments[-1].next_seq
+
+    # ---- writes ----
+    def append(self, entries: Sequence[Entry]) -> None:
+        with self._lock:
+            seg = self._segments[-1]
+            chunks = []
+            for hash_hex, anchored_at in entries:
+                if seg.size >= self.segment_bytes:
+                    self._write(chunks)
+                    chunks = []
+                    seg = self._roll()
+                key = key_bytes(hash_hex)
+                payload = _FIXED.pack(seg.next_seq, anchored_at) + key
+                if (seg.next_seq - seg.base_seq) % self.index_interval == 0:
+                    seg.index_seqs.append(seg.next_seq)
+                    seg.index_offsets.append(seg.size)
+                chunks.append(_HEADER.pack(len(payload), zlib.crc32(payload)) + payload)
+                seg.size += _HEADER.size + len(payload)
+                seg.next_seq += 1
+                self._keys.add(key)
+            self._write(chunks)
+            self._unsynced += 1
+            if self.sync_every > 0 and self._unsynced >= self.sync_every:
+                self._sync()
+
+    def _write(self, chunks: List[bytes]) -> None:
+        if chunks:
+            self._file.write(b"".join(chunks))
+        self._file.flush()
+
+    def _sync(self) -> None:
+        os.fsync(self._file.fileno())
+        self._unsynced = 0
+
+    def _roll(self) -> _Segment:
+        self._sync()
+        self._file.close()
+        seg = _Segment(self._segment_path(self._segments[-1].next_seq), self._segments[-1].next_seq)
+        self._segments.append(seg)
+        self._file = open(seg.path, "ab")
+        return seg
+
+    def flush(self) -> None:
+        with self._lock:
+            self._file.flush()
+            self._sync()
+
+    def close(self) -> None:
+        with self._lock:
+            if self._file.closed:
+                return
+            self._file.flush()
+            self._sync()
+            self._file.close()
+            for seg in self._segments:
+                seg.close()
+
+    # ---- reads ----
+    def contains(self, hash_hex: str) -> bool:
+        return key_bytes(hash_hex) in self._keys
+
+    def key_set(self):
+        """
+        The log's hashes as a reconcile.KeySet, rebuilt only when the log has grown.
+        """
+        from .reconcile import KeySet  # reconcile imports this module
+
+        with self._lock:
+            size = len(self)
+            cached = self._key_set
+            if cached is not None and cached[0] == size:
+                return cached[1]
+            keys = list(self._keys)
+        ks = KeySet(keys)
+        self._key_set = (size, ks)
+        return ks
+
+    def range_summaries(self, prefixes: Sequence[str]) -> Dict[str, Tuple[int, str]]:
+        return self.key_set().range_summaries(prefixes)
+
+    def range_keys(self, prefixes: Sequence[str]) -> Dict[str, List[str]]:
+        return self.key_set().range_keys(prefixes)
+
+    def read(self, seq: int) -> Tuple[str, int]:
+        """
+        (hash_hex, anchored_at) of record seq: bisect to the segment, then to the nearest
+        sparse-index entry, then scan forward at most index_interval records.
+        """
+        with self._lock:
+            i = bisect.bisect_right([s.base_seq for s in self._segments], seq) - 1
+            if i < 0 or seq >= self._segments[i].next_seq:
+                raise KeyError(seq)
+            seg = self._segments[i]
+            j = bisect.bisect_right(seg.index_seqs, seq) - 1
+            offset = seg.index_offsets[j]
+            buf = seg.view()
+            while True:
+                offset, s, anchored_at, key = _parse(buf, offset, seg.size)
+                if s == seq:
+                    return key_hex(key), anchored_at
+
+    def iter_records(self, start_seq: int = 0) -> Iterator[Tuple[int, str, int]]:
+        """
+        (seq, hash_hex, anchored_at) from start_seq to the current end of the log.
+        """
+        with self._lock:
+            self._file.flush()
+            segments = [(s, s.size) for s in self._segments if s.next_seq > start_seq and s.size]
+        for seg, end in segments:
+            # private map: the shared one is replaced whenever the active segment grows
+            with open(seg.path, "rb") as f:
+                buf = mmap.mmap(f.fileno(), end, access=mmap.ACCESS_READ)
+            try:
+                j = max(0, bisect.bisect_right(seg.index_seqs, start_seq) - 1)
+                offset = seg.index_offsets[j] if seg.index_offsets else 0
+                while offset < end:
+                    rec = _parse(buf, offset, end)
+                    if rec is None:
+                        break
+                    offset, seq, anchored_at, key = rec
+                    if seq >= start_seq:
+                        yield seq, key_hex(key), anchored_at
+            finally:
+                buf.close()
+
+
+# ---- HTTP transparency log client ----
+
+class HttpAnchorBackend(AnchorBackend):
+    """
+    Client for tlog_server.py. Keeps up to pool_size persistent HTTP/1.1 connections; a
+    connection the server has dropped is replaced and the request retried once. That is
+    safe for POST /entries too: the server skips hashes it already holds.
+    """
+    supports_ranges = True
+
+    def __init__(self, url: str, name: str = "http_tlog", pool_size: int = 4, timeout: float = 10.0):
+        u = urlsplit(url)
+        self.name = name
+        self.host = u.hostname or "127.0.0.1"
+        self.port = u.port or 80
+        self.prefix = u.path.rstrip("/")
+        self.timeout = timeout
+        self._pool: "queue.LifoQueue[http.client.HTTPConnection]" = queue.LifoQueue()
+        self._sem = threading.BoundedSemaphore(pool_size)
+
+    def _request(self, method: str, path: str, body: Optional[dict] = None) -> Tuple[int, dict]:
+        data = None if body is None else json.dumps(body).encode("utf-8")
+        headers = {"Content-Type": "application/json"} if data is not None else {}
+        with self._sem:
+            try:
+                conn = self._pool.get_nowait()
+            except queue.Empty:
+                conn = http.client.HTTPConnection(self.host, self.port, timeout=self.timeout)
+            for attempt in (0, 1):
+                try:
+                    conn.request(method, self.prefix + path, body=data, headers=headers)
+                    resp = conn.getresponse()
+                    payload = resp.read()
+                    break
+                except (http.client.RemoteDisconnected, ConnectionResetError, BrokenPipeError):
+                    conn.close()
+                    if attempt:
+                        raise
+                    conn = http.client.HTTPConnection(self.host, self.port, timeout=self.timeout)
+                except Exception:
+                    conn.close()
+                    raise
+            if resp.will_close:
+                conn.close()
+            else:
+                self._pool.put(conn)
+        out = json.loads(payload) if payload else {}
+        if resp.status >= 500 or resp.status == 400:
+            raise RuntimeError(f"tlog {method} {path}: HTTP {resp.status} {out}")
+        return resp.status, out
+
+    def append(self, entries: Sequence[Entry]) -> None:
+        status, out = self._request("POST", "/entries", {"entries": [[h, ts] for h, ts in entries]})
+        if not 200 <= status < 300:
+            raise RuntimeError(f"tlog POST /entries: HTTP {status} {out}")
+
+    def contains(self, hash_hex: str) -> bool:
+        status, _ = self._request("GET", f"/entries/{hash_hex}")
+        return status == 200
+
+    def contains_many(self, hashes: Iterable[str]) -> Set[str]:
+        hashes = list(hashes)
+        if not hashes:
+            return set()
+        _, out = self._request("POST", "/contains", {"hashes": hashes})
+        return set(out["present"])
+
+    def range_summaries(self, prefixes: Sequence[str]) -> Dict[str, Tuple[int, str]]:
+        _, out = self._request("POST", "/ranges", {"prefixes": list(prefixes)})
+        return {p: (int(n), d) for p, (n, d) in out["summaries"].items()}
+
+    def range_keys(self, prefixes: Sequence[str]) -> Dict[str, List[str]]:
+        _, out = self._request("POST", "/ranges/keys", {"prefixes": list(prefixes)})
+        return out["keys"]
+
+    def size(self) -> int:
+        return int(self._request("GET", "/size")[1]["size"])
+
+    def close(self) -> None:
+        while True:
+            try:
+                self._pool.get_nowait().close()
+            except queue.Empty:
+                return
@@ -0,0 +1,122 @@
+"""
+Pluggable time source.
+
+Services read time and sleep through a Clock so the same code runs against wall time
+(SystemClock) or simulated time (VirtualClock driven by an EventScheduler). Under a
+VirtualClock, anchor delays, deadlines and polling cost no wall time, so large runs
+finish in seconds and, with seeded randomness, produce identical outcomes.
+"""
+import heapq
+import itertools
+import threading
+import time
+from typing import Any, Callable, List, Optional, Set, Tuple
+
+
+class Clock:
+    def time(self) -> float:
+        raise NotImplementedError
+
+    def sleep(self, seconds: float) -> None:
+        raise NotImplementedError
+
+
+class SystemClock(Clock):
+    def time(self) -> float:
+        return time.time()
+
+    def sleep(self, seconds: float) -> None:
+        time.sleep(seconds)
+
+
+SYSTEM_CLOCK = SystemClock()
+
+
+class VirtualClock(Clock):
+    """
+    Simulated time that only moves when advanced. sleep() advances it immediately.
+    Meant for single-threaded or scheduler-driven runs: concurrent sleepers each advance
+    the shared clock.
+    """
+    def __init__(self, start: Optional[float] = None):
+        self._now = time.time() if start is None else float(start)
+        self._lock = threading.Lock()
+
+    def time(self) -> float:
+        return self._now
+
+    def sleep(self, seconds: float) -> None:
+        self.advance(seconds)
+
+    def advance(self, seconds: float) -> None:
+        if seconds < 0:
+            raise ValueError("cannot move a clock backwards")
+        with self._lock:
+            self._now += seconds
+
+    def advance_to(self, when: float) -> None:
+        with self._lock:
+            self._now = max(self._now, when)
+
+
+class EventScheduler:
+    """
+    Discrete-event loop over a VirtualClock: a priority queue of (due, seq, callback).
+    Running an event advances the clock to its due time. Callbacks may schedule more
+    events, and may themselves advance the clock via clock.sleep(); an event that is
+    overdue by then runs at the current time, so time never moves backwards.
+    """
+    def __init__(self, clock: VirtualClock):
+        self.clock = clock
+        self._queue: List[Tuple[float, int, Callable[..., Any], tuple]] = []
+        self._seq = itertools.count()
+        self._pending: Set[int] = set()  # handles still queued and not cancelled
+        self._cancelled: Set[int] = set()  # cancelled handles still in the heap
+
+    def call_at(self, when: float, fn: Callable[..., Any], *args: Any) -> int:
+        seq = next(self._seq)
+        heapq.heappush(self._queue, (when, seq, fn, args))
+        self._pending.add(seq)
+        return seq
+
+    def call_later(self, delay: float, fn: Callable[..., Any], *args: Any) -> int:
+        return self.call_at(self.clock.time() + delay, fn, *args)
+
+    def cancel(self, handle: int) -> None:
+        """
+        Drops a queued event. Cancelling one that already ran or was cancelled does nothing.
+        """
+        if handle in self._pending:
+            self._pending.discard(handle)
+            self._cancelled.add(handle)
+
+    def __len__(self) -> int:
+        return len(self._pending)
+
+    def step(self) -> bool:
+        """
+        Runs the next event. Returns False when nothing is left.
+        """
+        while self._queue:
+            when, seq, fn, args = heapq.heappop(self._queue)
+            if seq in self._cancelled:
+                self._cancelled.discard(seq)
+                continue
+            self._pending.discard(seq)
+            self.clock.advance_to(when)
+            fn(*args)
+            return True
+        return False
+
+    def run(self, until: Optional[float] = None) -> None:
+        """
+        Runs events in time order until the queue is empty or the next one is after `until`
+        (the clock is then left at `until`).
+        """
+        while self._queue:
+            if until is not None and self._queue[0][0] > until:
+                break
+            if not self.step():
+                break
+        if until is not None:
+            self.clock.advance_to(until)
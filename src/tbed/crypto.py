@@ -31,5 +31,18 @@ def hmac_sha256_hex(key: bytes, msg: bytes) -> str:
     return hmac.new(key, msg, hashlib.sha256).hexdigest()
 
 
+class HmacSha256:
+    """
+    Keyed HMAC-SHA256 whose key schedule is computed once; each MAC copies that state.
+    """
+    def __init__(self, key: bytes):
+        self._base = hmac.new(key, digestmod=hashlib.sha256)
+
+    def hexdigest(self, msg: bytes) -> str:
+        h = self._base.copy()
+        h.update(msg)
+        return h.hexdigest()
+
+
 def random_nonce_hex(nbytes: int = 16) -> str:
     return secrets.token_hex(nbytes)
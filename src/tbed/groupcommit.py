@@ -0,0 +1,143 @@
+"""
+Group commit for Store writes: operations queue up and a flusher thread applies them
+in one transaction once max_rows rows are pending or the oldest has waited max_delay_ms,
+so many writers share one fsync. A write that finds no other write queued behind it is
+committed at once, so a lone writer never waits out max_delay_ms; writes that arrive
+while a group commits form the next group.
+
+A group is first applied as one plain transaction. If any write fails (e.g. a duplicate
+anchor) the group is rolled back and replayed with one SAVEPOINT per operation, so only
+the failing write's future fails.
+"""
+import queue
+import threading
+import time
+from concurrent.futures import Future
+from typing import Any, Callable, List, Optional, Tuple
+
+from .metrics import Metrics
+
+# op(conn, *args) -> (result, after); after() runs once the group has committed. Ops may
+# run twice (see _commit), so side effects such as metrics belong in after()
+Op = Callable[..., Tuple[Any, Optional[Callable[[], None]]]]
+
+_STOP = object()
+
+
+class GroupCommitter:
+    def __init__(
+        self,
+        connect: Callable,
+        max_rows: int,
+        max_delay_ms: float,
+        metrics: Metrics,
+        on_rollback: Optional[Callable[[], None]] = None,
+    ):
+        self._connect = connect
+        self._on_rollback = on_rollback
+        self.max_rows = max(1, max_rows)
+        self.max_delay = max_delay_ms / 1000.0
+        self.metrics = metrics
+        self._q: "queue.Queue" = queue.Queue()
+        self._thread = threading.Thread(target=self._run, name="tbed-group-commit", daemon=True)
+        self._thread.start()
+
+    def submit(self, op: Op, args: tuple, rows: int = 1) -> Future:
+        fut: Future = Future()
+        self._q.put((op, args, max(1, rows), fut))
+        return fut
+
+    def flush(self) -> None:
+        """
+        Blocks until everything submitted so far is committed.
+        """
+        self.submit(lambda conn: (None, None), ()).result()
+
+    def close(self) -> None:
+        self._q.put(_STOP)
+        self._thread.join()
+
+    def _gather(self, first) -> Tuple[List[tuple], bool]:
+        group = [first]
+        rows = first[2]
+        deadline = time.monotonic() + self.max_delay
+        while rows < self.max_rows:
+            # only wait for company when other writers are already queued
+            timeout = deadline - time.monotonic() if len(group) > 1 else 0
+            try:
+                item = self._q.get(timeout=timeout) if timeout > 0 else self._q.get_nowait()
+            except queue.Empty:
+                break
+            if item is _STOP:
+                return group, True
+            group.append(item)
+            rows += item[2]
+        return group, False
+
+    def _run(self) -> None:
+        while True:
+            first = self._q.get()
+            if first is _STOP:
+                return
+            group, stop = self._gather(first)
+            self._commit(group)
+            if stop:
+                return
+
+    def _apply(self, group: List[tuple], isolate: bool):
+        done: List[Tuple[Future, Any, Optional[Callable[[], None]]]] = []
+        failed: List[Tuple[Future, BaseException]] = []
+        conn = self._connect()
+        with conn:
+            conn.execute("BEGIN IMMEDIATE")
+            for op, args, _, fut in group:
+                if not isolate:
+                    result, after = op(conn, *args)
+                    done.append((fut, result, after))
+                    continue
+                conn.execute("SAVEPOINT op")
+                try:
+                    result, after = op(conn, *args)
+                except Exception as e:
+                    conn.execute("ROLLBACK TO op")
+                    failed.append((fut, e))
+                    if self._on_rollback is not None:
+                        self._on_rollback()
+                else:
+                    done.append((fut, result, after))
+                conn.execute("RELEASE op")
+        return done, failed
+
+    def _commit(self, group: List[tuple]) -> None:
+        t = time.perf_counter()
+        try:
+            try:
+                done, failed = self._apply(group, isolate=False)
+            except Exception:
+                # some op failed and the group rolled back: redo it with one SAVEPOINT per
+                # op so only the failing ops fail. Ops only touch the connection, so a rerun is safe.
+                if self._on_rollback is not None:
+                    self._on_rollback()
+                done, failed = self._apply(group, isolate=True)
+        except Exception as e:
+            # the group's transaction itself failed: nothing was written
+            if self._on_rollback is not None:
+                self._on_rollback()
+            for _, _, _, fut in group:
+                fut.set_exception(e)
+            return
+
+        for fut, e in failed:
+            fut.set_exception(e)
+        for fut, result, after in done:
+            # listener errors reach the caller, as they do without group commit
+            try:
+                if after is not None:
+                    after()
+            except Exception as e:
+                fut.set_exception(e)
+            else:
+                fut.set_result(result)
+        self.metrics.inc("tbed_group_commit_flushes_total")
+        self.metrics.inc("tbed_group_commit_ops_total", len(group))
+        self.metrics.observe("tbed_group_commit_seconds", time.perf_counter() - t)
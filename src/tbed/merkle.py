@@ -0,0 +1,79 @@
+"""
+Merkle batching for anchors: one anchored root covers a window of commits,
+and each commit keeps an O(log n) inclusion proof.
+
+Leaves and inner nodes are domain-separated (0x00 / 0x01 prefixes, as in RFC 6962)
+so a leaf can never be passed off as an inner node. An odd node at the end of a
+level is promoted unchanged.
+"""
+import hashlib
+from typing import List, Sequence, Tuple
+
+# (side, sibling_hash_hex): side "L" means the sibling sits to the left
+Proof = List[Tuple[str, str]]
+
+
+def leaf_hash(commit_hex: str) -> bytes:
+    return hashlib.sha256(b"\x00" + bytes.fromhex(commit_hex)).digest()
+
+
+def node_hash(left: bytes, right: bytes) -> bytes:
+    return hashlib.sha256(b"\x01" + left + right).digest()
+
+
+def build_proofs(commits: Sequence[str]) -> Tuple[str, List[Proof]]:
+    """
+    Returns (root_hex, proofs) with proofs[i] proving commits[i].
+    """
+    if not commits:
+        raise ValueError("cannot build a Merkle tree over zero commits")
+
+    level = [leaf_hash(c) for c in commits]
+    proofs: List[Proof] = [[] for _ in commits]
+    # positions[i] = index of commit i's ancestor in the current level
+    positions = list(range(len(commits)))
+
+    while len(level) > 1:
+        nxt = []
+        for j in range(0, len(level) - 1, 2):
+            nxt.append(node_hash(level[j], level[j + 1]))
+        if len(level) % 2:
+            nxt.append(level[-1])
+
+        for i, pos in enumerate(positions):
+            sib = pos ^ 1
+            if sib < len(level):
+                proofs[i].append(("L" if sib < pos else "R", level[sib].hex()))
+            positions[i] = pos // 2
+        level = nxt
+
+    return level[0].hex(), proofs
+
+
+def merkle_root(commits: Sequence[str]) -> str:
+    return build_proofs(commits)[0]
+
+
+def verify_proof(commit_hex: str, proof: Proof, root_hex: str) -> bool:
+    try:
+        h = leaf_hash(commit_hex)
+        for side, sib_hex in proof:
+            sib = bytes.fromhex(sib_hex)
+            h = node_hash(sib, h) if side == "L" else node_hash(h, sib)
+    except ValueError:
+        return False
+    return h.hex() == root_hex
+
+
+def encode_proof(proof: Proof) -> bytes:
+    """
+    Compact storage form: per step, one side byte (0 = L, 1 = R) and the 32-byte sibling.
+    """
+    return b"".join((b"\x00" if side == "L" else b"\x01") + bytes.fromhex(h) for side, h in proof)
+
+
+def decode_proof(b: bytes) -> Proof:
+    return [
+        ("L" if b[i] == 0 else "R", b[i + 1:i + 33].hex())
+        for i in range(0, len(b), 33)
+    ]
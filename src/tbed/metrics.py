@@ -0,0 +1,213 @@
+"""
+Low-overhead instrumentation: counters and latency histograms for every stage and
+every Store query, exported as an in-process snapshot or Prometheus text format.
+
+Components default to the process-wide METRICS registry, which starts disabled; a
+disabled registry costs one attribute check per instrumented call.
+
+    from src.tbed.metrics import METRICS
+    METRICS.enabled = True
+    ...
+    METRICS.write_prometheus("tbed.prom")
+"""
+import functools
+import threading
+import time
+from bisect import bisect_left
+from typing import Any, Callable, Dict, List, Optional, Sequence, Tuple
+
+# seconds; chosen to resolve both in-memory hot paths and SQLite fsyncs
+DEFAULT_BUCKETS = (
+    0.00001, 0.000025, 0.00005, 0.0001, 0.00025, 0.0005,
+    0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0,
+)
+
+LabelKey = Tuple[Tuple[str, str], ...]
+
+
+class Histogram:
+    def __init__(self, buckets: Sequence[float] = DEFAULT_BUCKETS):
+        self.buckets = tuple(buckets)
+        self.counts = [0] * (len(self.buckets) + 1)  # last slot is +Inf
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value: float) -> None:
+        self.counts[bisect_left(self.buckets, value)] += 1
+        self.sum += value
+        self.count += 1
+
+    def quantile(self, q: float) -> float:
+        """
+        Upper bound of the bucket holding the q-quantile (0..1); +Inf past the last bucket.
+        """
+        if not self.count:
+            return 0.0
+        rank = q * self.count
+        seen = 0
+        for i, c in enumerate(self.counts):
+            seen += c
+            if seen >= rank:
+                return self.buckets[i] if i < len(self.buckets) else float("inf")
+        return float("inf")
+
+
+class _Timer:
+    __slots__ = ("metrics", "name", "labels", "start")
+
+    def __init__(self, metrics: "Metrics", name: str, labels: Dict[str, str]):
+        self.metrics = metrics
+        self.name = name
+        self.labels = labels
+
+    def __enter__(self) -> "_Timer":
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self.metrics.observe(self.name, time.perf_counter() - self.start, **self.labels)
+
+
+class _NullTimer:
+    __slots__ = ()
+
+    def __enter__(self) -> "_NullTimer":
+        return self
+
+    def __exit__(self, *exc) -> None:
+        pass
+
+
+_NULL_TIMER = _NullTimer()
+
+
+def _key(labels: Dict[str, Any]) -> LabelKey:
+    return tuple(sorted((k, str(v)) for k, v in labels.items()))
+
+
+class Metrics:
+    def __init__(self, enabled: bool = False, buckets: Sequence[float] = DEFAULT_BUCKETS):
+        self.enabled = enabled
+        self.buckets = tuple(buckets)
+        self._lock = threading.Lock()
+        self._counters: Dict[str, Dict[LabelKey, float]] = {}
+        self._histograms: Dict[str, Dict[LabelKey, Histogram]] = {}
+
+    def inc(self, name: str, value: float = 1, **labels: Any) -> None:
+        if not self.enabled:
+            return
+        key = _key(labels)
+        with self._lock:
+            series = self._counters.setdefault(name, {})
+            series[key] = series.get(key, 0) + value
+
+    def observe(self, name: str, seconds: float, **labels: Any) -> None:
+        if not self.enabled:
+            return
+        key = _key(labels)
+        with self._lock:
+            series = self._histograms.setdefault(name, {})
+            h = series.get(key)
+            if h is None:
+                h = series[key] = Histogram(self.buckets)
+            h.observe(seconds)
+
+    def timer(self, name: str, **labels: Any):
+        if not self.enabled:
+            return _NULL_TIMER
+        return _Timer(self, name, labels)
+
+    def reset(self) -> None:
+        with self._lock:
+            self._counters.clear()
+            self._histograms.clear()
+
+    # ---- export ----
+    def snapshot(self) -> Dict[str, Any]:
+        """
+        Plain-dict copy: counters as {name: [{labels, value}]}, histograms with
+        count/sum/mean and bucket-resolution p50/p95/p99.
+        """
+        with self._lock:
+            counters = {
+                name: [{"labels": dict(k), "value": v} for k, v in series.items()]
+                for name, series in self._counters.items()
+            }
+            histograms = {
+                name: [
+                    {
+                        "labels": dict(k),
+                        "count": h.count,
+                        "sum": h.sum,
+                        "mean": h.sum / h.count if h.count else 0.0,
+                        "p50": h.quantile(0.50),
+                        "p95": h.quantile(0.95),
+                        "p99": h.quantile(0.99),
+                    }
+                    for k, h in series.items()
+                ]
+                for name, series in self._histograms.items()
+            }
+        return {"counters": counters, "histograms": histograms}
+
+    def to_prometheus(self) -> str:
+        lines: List[str] = []
+        with self._lock:
+            for name in sorted(self._counters):
+                lines.append(f"# TYPE {name} counter")
+                for k, v in sorted(self._counters[name].items()):
+                    lines.append(f"{name}{_fmt_labels(k)} {_fmt_value(v)}")
+            for name in sorted(self._histograms):
+                lines.append(f"# TYPE {name} histogram")
+                for k, h in sorted(self._histograms[name].items()):
+                    cumulative = 0
+                    for le, c in zip(list(h.buckets) + [float("inf")], h.counts):
+                        cumulative += c
+                        lines.append(f"{name}_bucket{_fmt_labels(k + (('le', _fmt_value(le)),))} {cumulative}")
+                    lines.append(f"{name}_sum{_fmt_labels(k)} {_fmt_value(h.sum)}")
+                    lines.append(f"{name}_count{_fmt_labels(k)} {h.count}")
+        return "\n".join(lines) + "\n"
+
+    def write_prometheus(self, path: str) -> None:
+        with open(path, "w", encoding="utf-8") as f:
+            f.write(self.to_prometheus())
+
+
+def _fmt_labels(key: LabelKey) -> str:
+    if not key:
+        return ""
+    parts = []
+    for k, v in key:
+        v = v.replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+        parts.append(f'{k}="{v}"')
+    return "{" + ",".join(parts) + "}"
+
+
+def _fmt_value(v: float) -> str:
+    if v == float("inf"):
+        return "+Inf"
+    if float(v).is_integer():
+        return str(int(v))
+    return repr(float(v))
+
+
+METRICS = Metrics(enabled=False)
+
+
+def timed(name: str, **labels: Any) -> Callable:
+    """
+    Method decorator: observes the call's latency in self.metrics under `name`.
+    """
+    def deco(fn: Callable) -> Callable:
+        @functools.wraps(fn)
+        def wrapper(self, *args, **kwargs):
+            m: Optional[Metrics] = self.metrics
+            if not m.enabled:
+                return fn(self, *args, **kwargs)
+            start = time.perf_counter()
+            try:
+                return fn(self, *args, **kwargs)
+            finally:
+                m.observe(name, time.perf_counter() - start, **labels)
+        return wrapper
+    return deco
@@ -0,0 +1,145 @@
+"""
+Converts a tbed.sqlite written with the original hex/text schema to the compact schema
+(32-byte BLOB hashes, integer status/reason codes, binary Merkle proofs).
+
+    python -m src.tbed.migrate tbed.sqlite              # in place, keeps tbed.sqlite.bak
+    python -m src.tbed.migrate old.sqlite --out new.sqlite
+
+Row ids are preserved, so incremental-watcher watermarks stay valid.
+"""
+import argparse
+import json
+import os
+import shutil
+import sqlite3
+from typing import Iterator, List, Optional
+
+from .merkle import encode_proof
+from .storage import COMPACT_SCHEMA_VERSION, STATUS_CODES, Store, hash_to_db
+
+CHUNK = 10_000
+
+
+def _has_table(conn: sqlite3.Connection, name: str) -> bool:
+    return conn.execute(
+        "SELECT 1 FROM sqlite_master WHERE type='table' AND name=?", (name,)
+    ).fetchone() is not None
+
+
+def _chunks(cur: sqlite3.Cursor) -> Iterator[List[sqlite3.Row]]:
+    while True:
+        rows = cur.fetchmany(CHUNK)
+        if not rows:
+            return
+        yield rows
+
+
+def migrate(src_path: str, dst_path: Optional[str] = None) -> str:
+    """
+    Copies src_path into a compact database at dst_path (default: replace src_path,
+    keeping src_path + ".bak"). Returns the path of the compact database.
+    """
+    in_place = dst_path is None
+    if in_place:
+        dst_path = src_path + ".migrating"
+    if os.path.exists(dst_path):
+        raise FileExistsError(dst_path)
+
+    src = sqlite3.connect(src_path)
+    src.row_factory = sqlite3.Row
+    if src.execute("PRAGMA user_version").fetchone()[0] >= COMPACT_SCHEMA_VERSION:
+        src.close()
+        raise ValueError(f"{src_path} already uses the compact schema")
+
+    store = Store(dst_path)
+    with store._conn() as dst:
+        for rows in _chunks(src.execute("SELECT * FROM executions ORDER BY id")):
+            dst.executemany(
+                """
+                INSERT INTO executions (id, tx_id, attempt, commit_hash, payload_hash, decided_at, executed_at, status, reason)
+                VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)
+                """,
+                [
+                    (
+                        r["id"], r["tx_id"], r["attempt"],
+                        hash_to_db(r["commit_hash"]), hash_to_db(r["payload_hash"]),
+                        r["decided_at"], r["executed_at"],
+                        STATUS_CODES[r["status"]], store._reason_code(dst, r["reason"]),
+                    )
+                    for r in rows
+                ],
+            )
+        store._backfill_tx_state(dst)
+
+        for rows in _chunks(src.execute("SELECT * FROM anchors ORDER BY id")):
+            dst.executemany(
+                "INSERT INTO anchors (id, commit_hash, anchored_at, backend) VALUES (?, ?, ?, ?)",
+                [(r["id"], hash_to_db(r["commit_hash"]), r["anchored_at"], r["backend"]) for r in rows],
+            )
+
+        if _has_table(src, "watcher_state"):
+            dst.executemany(
+                "INSERT INTO watcher_state (name, last_execution_id, last_executed_at) VALUES (?, ?, ?)",
+                [tuple(r) for r in src.execute("SELECT name, last_execution_id, last_executed_at FROM watcher_state")],
+            )
+
+        if _has_table(src, "watcher_findings"):
+            for rows in _chunks(src.execute("SELECT * FROM watcher_findings ORDER BY id")):
+                dst.executemany(
+                    """
+                    INSERT INTO watcher_findings (id, commit_hash, tx_id, executed_at, detected_at, resolved_at)
+                    VALUES (?, ?, ?, ?, ?, ?)
+                    """,
+                    [
+                        (r["id"], hash_to_db(r["commit_hash"]), r["tx_id"], r["executed_at"],
+                         r["detected_at"], r["resolved_at"])
+                        for r in rows
+                    ],
+                )
+
+        if _has_table(src, "anchor_proofs"):
+            for rows in _chunks(src.execute("SELECT * FROM anchor_proofs")):
+                dst.executemany(
+                    "INSERT INTO anchor_proofs (commit_hash, root_hash, leaf_index, proof) VALUES (?, ?, ?, ?)",
+                    [
+                        (hash_to_db(r["commit_hash"]), hash_to_db(r["root_hash"]), r["leaf_index"],
+                         encode_proof([(side, h) for side, h in json.loads(r["proof"])]))
+                        for r in rows
+                    ],
+                )
+        store._backfill_anchor_queue(dst)
+    src.execute("PRAGMA wal_checkpoint(TRUNCATE)")
+    src.close()
+
+    conn = store._conn()
+    conn.execute("VACUUM")
+    conn.execute("PRAGMA wal_checkpoint(TRUNCATE)")
+    store.close()
+
+    if in_place:
+        shutil.move(src_path, src_path + ".bak")
+        for suffix in ("-wal", "-shm"):
+            if os.path.exists(src_path + suffix):
+                os.remove(src_path + suffix)
+        os.replace(dst_path, src_path)
+        for suffix in ("-wal", "-shm"):
+            if os.path.exists(dst_path + suffix):
+                os.remove(dst_path + suffix)
+        return src_path
+    return dst_path
+
+
+def main():
+    ap = argparse.ArgumentParser(description="Convert a tbed SQLite file to the compact schema")
+    ap.add_argument("db", help="sqlite file written with the hex/text schema")
+    ap.add_argument("--out", default=None, help="write here instead of converting in place")
+    args = ap.parse_args()
+
+    before = os.path.getsize(args.db)
+    path = migrate(args.db, args.out)
+    after = os.path.getsize(path)
+    print(f"Migrated {args.db} -> {path}: {before} -> {after} bytes")
+
+
+if __name__ == "__main__":
+    main()
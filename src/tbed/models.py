@@ -1,6 +1,9 @@
 from dataclasses import dataclass
+from functools import cached_property
 from typing import Literal, Dict, Any
 
+from .crypto import canonical_json
+
 
 Decision = Literal["APPROVE", "REJECT"]
 
@@ -29,3 +32,36 @@ class DecisionReceipt:
             "commit": self.commit,
             "receipt_mac": self.receipt_mac,
         }
+
+    # Canonical encodings are computed at most once per receipt object.
+    # cached_property writes straight into __dict__, so it works on a frozen dataclass.
+    @cached_property
+    def binding_bytes(self) -> bytes:
+        """
+        What the commit hashes (see services.compute_commit).
+        """
+        return canonical_json({
+            "tx_id": self.tx_id,
+            "decision": self.decision,
+            "decided_at": self.decided_at,
+            "policy_version": self.policy_version,
+            "payload_hash": self.payload_hash,
+            "nonce": self.nonce,
+        })
+
+    @cached_property
+    def body_bytes(self) -> bytes:
+        """
+        What the receipt MAC covers: every field except receipt_mac.
+        """
+        body = self.to_dict()
+        del body["receipt_mac"]
+        return canonical_json(body)
+
+
+@dataclass(frozen=True)
+class ExecutionOutcome:
+    tx_id: str
+    attempt: int
+    status: str
+    reason: str
@@ -0,0 +1,220 @@
+"""
+asyncio pipeline: decide -> execute -> anchor -> watch.
+
+Each stage runs as its own task, connected by bounded queues, so a slow stage pushes
+back on submit() instead of growing memory. Blocking SQLite work (execute_batch,
+AnchorWorker.run_once, DeadlineWatcher.poll) is offloaded to threads, so the event loop
+keeps thousands of transactions in flight while anchoring runs slowly in the background.
+A failed anchor round is counted (anchor_errors, tbed_pipeline_anchor_errors_total) and
+retried on the next interval; its commits stay queued.
+
+    async with Pipeline(decision_svc, exec_svc, anchor_worker, deadline_watcher) as p:
+        fut = await p.submit("tx-1", payload, "APPROVE")
+        outcome = await fut
+        await p.drain()
+"""
+import argparse
+import asyncio
+import time
+from dataclasses import dataclass
+from typing import Any, Dict, List, Optional, Tuple
+
+from .anchor import AnchorConfig, AnchorWorker
+from .models import Decision, DecisionReceipt, ExecutionOutcome
+from .services import DecisionService, ExecutionService
+from .storage import Store
+from .watcher import DeadlineWatcher, WatcherConfig
+
+
+@dataclass
+class PipelineConfig:
+    queue_size: int = 1000
+    # receipts gathered into one execute_batch call (one transaction)
+    execute_batch_size: int = 256
+    anchor_interval_seconds: float = 0.5
+    # unread findings before the watch stage waits for a consumer
+    findings_queue_size: int = 10000
+
+
+class Pipeline:
+    def __init__(
+        self,
+        decision_service: DecisionService,
+        execution_service: ExecutionService,
+        anchor_worker: AnchorWorker,
+        deadline_watcher: Optional[DeadlineWatcher] = None,
+        cfg: Optional[PipelineConfig] = None,
+    ):
+        self.decision_service = decision_service
+        self.execution_service = execution_service
+        self.anchor_worker = anchor_worker
+        self.deadline_watcher = deadline_watcher
+        self.cfg = cfg or PipelineConfig()
+        # watcher output; consumers read from here
+        self.findings: "asyncio.Queue[Dict[str, Any]]" = asyncio.Queue(self.cfg.findings_queue_size)
+        self._decide_q: "asyncio.Queue[Tuple[str, Dict[str, Any], Decision, asyncio.Future]]" = asyncio.Queue(
+            self.cfg.queue_size
+        )
+        self._execute_q: "asyncio.Queue[Tuple[DecisionReceipt, Dict[str, Any], asyncio.Future]]" = asyncio.Queue(
+            self.cfg.queue_size
+        )
+        self._executed = asyncio.Event()
+        # one anchor round at a time, whether from the stage or drain()
+        self._anchor_lock = asyncio.Lock()
+        self.anchor_errors = 0
+        self.last_anchor_error: Optional[BaseException] = None
+        self._stop = asyncio.Event()
+        self._tasks: List[asyncio.Task] = []
+
+    async def start(self) -> None:
+        self._tasks = [
+            asyncio.create_task(self._decide_stage(), name="decide"),
+            asyncio.create_task(self._execute_stage(), name="execute"),
+            asyncio.create_task(self._anchor_stage(), name="anchor"),
+        ]
+        if self.deadline_watcher is not None:
+            self._tasks.append(asyncio.create_task(self._watch_stage(), name="watch"))
+
+    async def submit(self, tx_id: str, payload: Dict[str, Any], decision: Decision) -> "asyncio.Future[ExecutionOutcome]":
+        """
+        Waits only for queue space (backpressure); returns a future for the execution outcome.
+        """
+        fut = asyncio.get_running_loop().create_future()
+        await self._decide_q.put((tx_id, payload, decision, fut))
+        return fut
+
+    # ---- stages ----
+    async def _decide_stage(self) -> None:
+        while True:
+            tx_id, payload, decision, fut = await self._decide_q.get()
+            try:
+                # the caller may have cancelled while the request was queued
+                if fut.done():
+                    continue
+                receipt = self.decision_service.decide(tx_id=tx_id, payload=payload, decision=decision)
+            except Exception as e:
+                if not fut.done():
+                    fut.set_exception(e)
+            else:
+                await self._execute_q.put((receipt, payload, fut))
+            finally:
+                self._decide_q.task_done()
+
+    async def _execute_stage(self) -> None:
+        while True:
+            batch = [await self._execute_q.get()]
+            while len(batch) < self.cfg.execute_batch_size and not self._execute_q.empty():
+                batch.append(self._execute_q.get_nowait())
+            try:
+                outcomes = await asyncio.to_thread(
+                    self.execution_service.execute_batch, [(r, p) for r, p, _ in batch]
+                )
+            except Exception as e:
+                for _, _, fut in batch:
+                    if not fut.done():
+                        fut.set_exception(e)
+            else:
+                for (_, _, fut), outcome in zip(batch, outcomes):
+                    if not fut.done():
+                        fut.set_result(outcome)
+                self._executed.set()
+            finally:
+                for _ in batch:
+                    self._execute_q.task_done()
+
+    async def _anchor_round(self) -> None:
+        async with self._anchor_lock:
+            await asyncio.to_thread(self.anchor_worker.run_once)
+
+    async def _anchor_stage(self) -> None:
+        while True:
+            await self._executed.wait()
+            self._executed.clear()
+            try:
+                await self._anchor_round()
+            except Exception as e:
+                # the round's commits went back to the queue; try again next interval
+                self.anchor_errors += 1
+                self.last_anchor_error = e
+                self.anchor_worker.metrics.inc("tbed_pipeline_anchor_errors_total")
+                self._executed.set()
+            await asyncio.sleep(self.cfg.anchor_interval_seconds)
+
+    async def _watch_stage(self) -> None:
+        async for finding in self.deadline_watcher.astream(self._stop):
+            await self.findings.put(finding)
+
+    # ---- shutdown ----
+    async def drain(self) -> None:
+        """
+        Waits until every submitted transaction is executed, then runs a final anchor round
+        once any round in progress has finished. An error in that round is raised.
+        """
+        await self._decide_q.join()
+        await self._execute_q.join()
+        await self._anchor_round()
+
+    async def close(self) -> None:
+        self._stop.set()
+        for t in self._tasks:
+            t.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+
+    async def __aenter__(self) -> "Pipeline":
+        await self.start()
+        return self
+
+    async def __aexit__(self, *exc) -> None:
+        await self.drain()
+        await self.close()
+
+
+async def _demo(args) -> None:
+    store = Store(db_path=args.db)
+    decision_svc = DecisionService(policy_version="policy-2026-01-24")
+    exec_svc = ExecutionService(store=store, decision_service=decision_svc)
+    anchor_worker = AnchorWorker(
+        store=store,
+        cfg=AnchorConfig(
+            anchor_delay_seconds=args.anchor_delay,
+            failure_rate=args.suppression,
+            batch_size=args.batch_size,
+        ),
+    )
+    watcher = DeadlineWatcher(store=store, cfg=WatcherConfig(anchor_deadline_seconds=args.deadline))
+
+    t = time.perf_counter()
+    async with Pipeline(decision_svc, exec_svc, anchor_worker, watcher) as pipeline:
+        futs = [
+            await pipeline.submit(f"pipe-{i:06d}", {"pipe_index": i}, "APPROVE")
+            for i in range(args.n)
+        ]
+        outcomes = await asyncio.gather(*futs)
+        elapsed = time.perf_counter() - t
+        await asyncio.sleep(args.deadline + 1)
+    findings = []
+    while not pipeline.findings.empty():
+        findings.append(pipeline.findings.get_nowait())
+
+    watcher.close()
+    anchor_worker.close()
+    store.close()
+    executed = sum(1 for o in outcomes if o.status == "EXECUTED")
+    print(f"Executed {executed}/{args.n} in {elapsed:.2f}s ({args.n / elapsed:.0f} tx/s)")
+    print(f"Missing anchors after deadline: {len(findings)}")
+
+
+def main():
+    ap = argparse.ArgumentParser(description="Run N transactions through the asyncio pipeline")
+    ap.add_argument("--db", default="tbed.sqlite")
+    ap.add_argument("--n", type=int, default=1000)
+    ap.add_argument("--suppression", type=float, default=0.0)
+    ap.add_argument("--anchor-delay", type=float, default=0.0)
+    ap.add_argument("--batch-size", type=int, default=64)
+    ap.add_argument("--deadline", type=int, default=2)
+    asyncio.run(_demo(ap.parse_args()))
+
+
+if __name__ == "__main__":
+    main()
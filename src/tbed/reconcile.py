@@ -0,0 +1,215 @@
+"""
+Range-digest set reconciliation: find the keys two parties disagree on without shipping
+every key across the boundary.
+
+Keys (commit hashes, or the Merkle roots a batch anchor publishes) are compared as sorted
+byte strings. A range is a hex prefix ("" is everything, "3f" all keys starting 0x3f) and
+its summary is (count, sha256 over the range's length-prefixed keys in order). Both sides
+start at the root and only descend into the 16 children of ranges whose summaries differ;
+a differing range is settled by exchanging its keys once it holds at most leaf_size keys
+on each side, or as soon as one side has none. When the sets mostly agree this costs
+O(differences * log N) summaries and keys instead of O(N), in one round trip per level.
+
+A range source is anything with range_summaries(prefixes) and range_keys(prefixes): a
+KeySet built locally from a Store, SegmentLogBackend, or HttpAnchorBackend (served by
+tlog_server.py).
+
+    python -m src.tbed.reconcile tbed.sqlite --peer-db anchors.sqlite
+    python -m src.tbed.reconcile tbed.sqlite --tlog http://127.0.0.1:8787
+"""
+import argparse
+import bisect
+import hashlib
+import itertools
+from array import array
+from dataclasses import dataclass, field
+from typing import Dict, Iterable, List, Sequence, Set, Tuple
+
+from .archive import archived_anchor_hashes
+from .backends import HttpAnchorBackend, key_bytes, key_hex
+from .storage import Store
+
+# (count, digest_hex) of one range
+Summary = Tuple[int, str]
+
+LEAF_SIZE = 16
+# a 32-byte key has 64 nibbles; past that only keys longer than 32 bytes can share a range
+MAX_DEPTH = 64
+NIBBLES = "0123456789abcdef"
+EMPTY_DIGEST = hashlib.sha256(b"").hexdigest()
+
+
+def _bounds(prefix: str) -> Tuple[bytes, bytes]:
+    """
+    [lo, hi) byte bounds of the keys starting with the hex prefix; hi is b"" when unbounded.
+    """
+    if not prefix:
+        return b"", b""
+    lo = bytes.fromhex(prefix.ljust(64, "0"))
+    n = int(prefix, 16) + 1
+    if n >> (4 * len(prefix)):
+        return lo, b""
+    return lo, bytes.fromhex(format(n, "x").rjust(len(prefix), "0").ljust(64, "0"))
+
+
+class KeySet:
+    """
+    Immutable sorted key set answering range summaries. Keys are packed into one buffer
+    of length-prefixed entries, so a range digest is a single sha256 over a slice.
+    """
+    def __init__(self, keys: Iterable[bytes]):
+        self._keys: List[bytes] = sorted(set(keys))
+        self._offsets = array("Q", [0])
+        parts = []
+        for k in self._keys:
+            parts.append(len(k).to_bytes(2, "big") + k)
+            self._offsets.append(self._offsets[-1] + len(parts[-1]))
+        self._blob = memoryview(b"".join(parts))
+        self._cache: Dict[str, Summary] = {}
+
+    @classmethod
+    def from_hex(cls, hashes: Iterable[str]) -> "KeySet":
+        return cls(key_bytes(h) for h in hashes)
+
+    def __len__(self) -> int:
+        return len(self._keys)
+
+    def __contains__(self, hash_hex: str) -> bool:
+        k = key_bytes(hash_hex)
+        i = bisect.bisect_left(self._keys, k)
+        return i < len(self._keys) and self._keys[i] == k
+
+    def _span(self, prefix: str) -> Tuple[int, int]:
+        lo, hi = _bounds(prefix)
+        i = bisect.bisect_left(self._keys, lo)
+        j = bisect.bisect_left(self._keys, hi) if hi else len(self._keys)
+        return i, j
+
+    def summary(self, prefix: str) -> Summary:
+        s = self._cache.get(prefix)
+        if s is None:
+            i, j = self._span(prefix)
+            digest = hashlib.sha256(self._blob[self._offsets[i]:self._offsets[j]]).hexdigest()
+            s = self._cache[prefix] = (j - i, digest)
+        return s
+
+    def range_summaries(self, prefixes: Sequence[str]) -> Dict[str, Summary]:
+        return {p: self.summary(p) for p in prefixes}
+
+    def range_keys(self, prefixes: Sequence[str]) -> Dict[str, List[str]]:
+        out = {}
+        for p in prefixes:
+            i, j = self._span(p)
+            out[p] = [key_hex(k) for k in self._keys[i:j]]
+        return out
+
+
+def anchor_keys(store: Store) -> KeySet:
+    """
+    The hashes the Store recorded as published (anchors table: commits and batch roots),
+    including those already moved to the archive (read once per segment).
+    """
+    archived = archived_anchor_hashes(store)
+    return KeySet.from_hex(itertools.chain((r["commit_hash"] for r in store.iter_anchors()), archived))
+
+
+def executed_keys(store: Store) -> KeySet:
+    return KeySet.from_hex(store.iter_executed_commit_hashes())
+
+
+@dataclass
+class ReconcileResult:
+    only_local: Set[str] = field(default_factory=set)
+    only_remote: Set[str] = field(default_factory=set)
+    rounds: int = 0
+    summaries: int = 0      # range summaries fetched from the remote side
+    keys: int = 0           # keys fetched from the remote side
+
+    @property
+    def in_sync(self) -> bool:
+        return not self.only_local and not self.only_remote
+
+
+def reconcile(local, remote, leaf_size: int = LEAF_SIZE) -> ReconcileResult:
+    """
+    Top-down comparison of two range sources. Returns the keys (hex) each side has that
+    the other lacks, plus what was fetched from remote.
+    """
+    res = ReconcileResult()
+    frontier = [""]
+    while frontier:
+        res.rounds += 1
+        mine = local.range_summaries(frontier)
+        theirs = remote.range_summaries(frontier)
+        res.summaries += len(frontier)
+
+        ship_local: List[str] = []   # ranges remote lacks entirely: nothing to fetch
+        ship_remote: List[str] = []  # ranges local lacks entirely
+        ship_both: List[str] = []
+        nxt: List[str] = []
+        for p in frontier:
+            (na, da), (nb, db) = tuple(mine[p]), tuple(theirs[p])
+            if na == nb and da == db:
+                continue
+            if nb == 0:
+                ship_local.append(p)
+            elif na == 0:
+                ship_remote.append(p)
+            elif max(na, nb) <= leaf_size or len(p) >= MAX_DEPTH:
+                ship_both.append(p)
+            else:
+                nxt.extend(p + c for c in NIBBLES)
+
+        if ship_local:
+            for keys in local.range_keys(ship_local).values():
+                res.only_local.update(keys)
+        if ship_remote or ship_both:
+            fetched = remote.range_keys(ship_remote + ship_both)
+            res.keys += sum(len(v) for v in fetched.values())
+            for p in ship_remote:
+                res.only_remote.update(fetched[p])
+            if ship_both:
+                ours = local.range_keys(ship_both)
+                for p in ship_both:
+                    a, b = set(ours[p]), set(fetched[p])
+                    res.only_local.update(a - b)
+                    res.only_remote.update(b - a)
+        frontier = nxt
+    return res
+
+
+def main():
+    ap = argparse.ArgumentParser(description="Compare a Store's anchors with another Store or a transparency log")
+    ap.add_argument("db", help="sqlite file whose anchors table is the local side")
+    peer = ap.add_mutually_exclusive_group(required=True)
+    peer.add_argument("--peer-db", help="another tbed sqlite file (its anchors table)")
+    peer.add_argument("--tlog", help="URL of a tlog_server")
+    ap.add_argument("--leaf-size", type=int, default=LEAF_SIZE)
+    args = ap.parse_args()
+
+    store = Store(db_path=args.db)
+    try:
+        local = anchor_keys(store)
+        if args.peer_db:
+            other = Store(db_path=args.peer_db)
+            try:
+                remote = anchor_keys(other)
+            finally:
+                other.close()
+        else:
+            remote = HttpAnchorBackend(args.tlog)
+        res = reconcile(local, remote, leaf_size=args.leaf_size)
+    finally:
+        store.close()
+
+    print(f"local={len(local)} rounds={res.rounds} summaries={res.summaries} keys={res.keys}")
+    for h in sorted(res.only_local):
+        print("only local: ", h)
+    for h in sorted(res.only_remote):
+        print("only remote:", h)
+    if not res.in_sync:
+        raise SystemExit(1)
+
+
+if __name__ == "__main__":
+    main()
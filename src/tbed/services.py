@@ -1,11 +1,39 @@
-import time
-from typing import Any, Dict
+import hashlib
+import json
+import threading
+from collections import OrderedDict
+from concurrent.futures import ProcessPoolExecutor
+from typing import Any, Dict, Iterable, List, Optional, Sequence, Tuple
 
-from .crypto import sha256_hex, canonical_json, get_secret_key, hmac_sha256_hex, random_nonce_hex
-from .models import DecisionReceipt, Decision
+from .clock import Clock, SYSTEM_CLOCK
+from .metrics import METRICS, Metrics, timed
+from .crypto import sha256_hex, canonical_json, get_secret_key, HmacSha256, random_nonce_hex
+from .models import DecisionReceipt, Decision, ExecutionOutcome
 from .storage import Store
 
 
+REASON_OK = "OK"
+REASON_REPLAY = "REPLAY_DETECTED: tx_id already executed"
+REASON_INVALID_RECEIPT = "INVALID_RECEIPT: MAC/commit mismatch"
+REASON_TOCTOU = "TOCTOU_DETECTED: payload_hash mismatch"
+REASON_REJECT = "POLICY_REJECT: decision=REJECT"
+
+NONCE_BYTES = 16
+# decide_many() batches smaller than this stay in-process even when processes > 1
+PARALLEL_MIN_ITEMS = 4096
+
+# canonical_json of the commit binding and of the receipt body, specialised to their fixed
+# keys (written in sorted order). String fields go through json.dumps as in canonical_json;
+# integers and hex digests never need escaping.
+_BINDING_FMT = '{"decided_at":%d,"decision":%s,"nonce":"%s","payload_hash":"%s","policy_version":%s,"tx_id":%s}'
+_BODY_FMT = (
+    '{"commit":"%s","decided_at":%d,"decision":%s,"nonce":"%s","payload_hash":"%s",'
+    '"policy_version":%s,"receipt_version":1,"tx_id":%s}'
+)
+# the encoder json.dumps builds for canonical_json's arguments, built once
+_CANONICAL = json.JSONEncoder(sort_keys=True, separators=(",", ":"))
+
+
 def payload_hash(payload: Dict[str, Any]) -> str:
     """
     Privacy-by-design: payload never goes to anchors; only a hash binds decision to "what was checked".
@@ -32,20 +60,67 @@ def compute_commit(
     return sha256_hex(canonical_json(binding))
 
 
+def _issue(
+    key: bytes,
+    policy_version: str,
+    decided_at: int,
+    items: Sequence[Tuple[str, Dict[str, Any], Decision]],
+    nonces: Sequence[str],
+) -> List[Tuple[str, str, str]]:
+    """
+    (payload_hash, commit, receipt_mac) for each (tx_id, payload, decision), as decide()
+    computes them. Top-level so it can run in a worker process.
+    """
+    mac = HmacSha256(key)
+    encode = _CANONICAL.encode
+    dumps = json.dumps
+    sha256 = hashlib.sha256
+    pv = dumps(policy_version)
+    decisions: Dict[str, str] = {}
+    out = []
+    for (tx_id, payload, decision), nonce in zip(items, nonces):
+        ph = sha256(encode(payload).encode("utf-8")).hexdigest()
+        d = decisions.get(decision)
+        if d is None:
+            d = decisions[decision] = dumps(decision)
+        t = dumps(tx_id)
+        commit = sha256((_BINDING_FMT % (decided_at, d, nonce, ph, pv, t)).encode("utf-8")).hexdigest()
+        out.append((ph, commit, mac.hexdigest((_BODY_FMT % (commit, decided_at, d, nonce, ph, pv, t)).encode("utf-8"))))
+    return out
+
+
 def hmac_compare(a: str, b: str) -> bool:
     import hmac as _h
     return _h.compare_digest(a, b)
 
 
 class DecisionService:
-    def __init__(self, policy_version: str):
+    def __init__(
+        self,
+        policy_version: str,
+        verify_cache_size: int = 4096,
+        clock: Optional[Clock] = None,
+        metrics: Optional[Metrics] = None,
+    ):
         self.policy_version = policy_version
+        self.clock = clock or SYSTEM_CLOCK
+        self.metrics = metrics or METRICS
         self._key = get_secret_key()
+        self._mac = HmacSha256(self._key)
+        # LRU of receipts whose commit and MAC already verified, so retries skip the crypto.
+        # Keys are whole receipts (frozen dataclass: hash/eq cover every field incl. the MAC).
+        self._verified: "OrderedDict[DecisionReceipt, None]" = OrderedDict()
+        self._verify_cache_size = verify_cache_size
+        self._verified_lock = threading.Lock()
+        self._pool: Optional[ProcessPoolExecutor] = None
+        self._pool_size = 0
+        self._pool_lock = threading.Lock()
 
+    @timed("tbed_stage_seconds", stage="decide")
     def decide(self, tx_id: str, payload: Dict[str, Any], decision: Decision) -> DecisionReceipt:
-        now = int(time.time())
+        now = int(self.clock.time())
         ph = payload_hash(payload)
-        nonce = random_nonce_hex(16)
+        nonce = random_nonce_hex(NONCE_BYTES)
         commit = compute_commit(tx_id, decision, now, self.policy_version, ph, nonce)
 
         body = {
@@ -58,7 +133,7 @@ class DecisionService:
             "nonce": nonce,
             "commit": commit,
         }
-        mac = hmac_sha256_hex(self._key, canonical_json(body))
+        mac = self._mac.hexdigest(canonical_json(body))
 
         return DecisionReceipt(
             receipt_version=1,
@@ -72,23 +147,88 @@ class DecisionService:
             receipt_mac=mac,
         )
 
+    @timed("tbed_stage_seconds", stage="decide_many")
+    def decide_many(
+        self, items: Iterable[Tuple[str, Dict[str, Any], Decision]], processes: int = 0
+    ) -> List[DecisionReceipt]:
+        """
+        decide() for a batch of (tx_id, payload, decision) items: one timestamp for the whole
+        batch, one CSPRNG draw for all nonces, and the binding and body serialised by fixed
+        templates instead of canonical_json. Each receipt is byte-identical to the one decide()
+        issues for the same time and nonce. processes > 1 spreads batches of at least
+        PARALLEL_MIN_ITEMS over a process pool, kept until close().
+        """
+        items = list(items)
+        if not items:
+            return []
+        now = int(self.clock.time())
+        raw = random_nonce_hex(NONCE_BYTES * len(items))
+        w = 2 * NONCE_BYTES
+        nonces = [raw[i:i + w] for i in range(0, len(raw), w)]
+
+        if processes > 1 and len(items) >= PARALLEL_MIN_ITEMS:
+            pool = self._process_pool(processes)
+            step = -(-len(items) // processes)
+            futures = [
+                pool.submit(_issue, self._key, self.policy_version, now, items[i:i + step], nonces[i:i + step])
+                for i in range(0, len(items), step)
+            ]
+            issued = [x for f in futures for x in f.result()]
+        else:
+            issued = _issue(self._key, self.policy_version, now, items, nonces)
+
+        pv = self.policy_version
+        return [
+            DecisionReceipt(
+                receipt_version=1,
+                tx_id=tx_id,
+                decision=decision,
+                decided_at=now,
+                policy_version=pv,
+                payload_hash=ph,
+                nonce=nonce,
+                commit=commit,
+                receipt_mac=mac,
+            )
+            for (tx_id, _, decision), nonce, (ph, commit, mac) in zip(items, nonces, issued)
+        ]
+
+    def _process_pool(self, processes: int) -> ProcessPoolExecutor:
+        with self._pool_lock:
+            if self._pool is None or self._pool_size != processes:
+                if self._pool is not None:
+                    self._pool.shutdown(wait=True)
+                self._pool = ProcessPoolExecutor(max_workers=processes)
+                self._pool_size = processes
+            return self._pool
+
+    def close(self) -> None:
+        with self._pool_lock:
+            if self._pool is not None:
+                self._pool.shutdown(wait=True)
+                self._pool = None
+
+    @timed("tbed_stage_seconds", stage="verify_receipt")
     def verify_receipt(self, receipt: DecisionReceipt) -> bool:
-        body = receipt.to_dict()
-        mac = body.pop("receipt_mac")
-
-        expected_commit = compute_commit(
-            tx_id=body["tx_id"],
-            decision=body["decision"],
-            decided_at=body["decided_at"],
-            policy_version=body["policy_version"],
-            payload_hash_hex=body["payload_hash"],
-            nonce=body["nonce"],
-        )
-        if expected_commit != body["commit"]:
+        with self._verified_lock:
+            if receipt in self._verified:
+                self._verified.move_to_end(receipt)
+                self.metrics.inc("tbed_verify_cache_hits_total")
+                return True
+
+        if sha256_hex(receipt.binding_bytes) != receipt.commit:
+            return False
+
+        expected_mac = self._mac.hexdigest(receipt.body_bytes)
+        if not hmac_compare(expected_mac, receipt.receipt_mac):
             return False
 
-        expected_mac = hmac_sha256_hex(self._key, canonical_json(body))
-        return hmac_compare(expected_mac, mac)
+        if self._verify_cache_size > 0:
+            with self._verified_lock:
+                self._verified[receipt] = None
+                if len(self._verified) > self._verify_cache_size:
+                    self._verified.popitem(last=False)
+        return True
 
 
 class ExecutionService:
@@ -96,84 +236,78 @@ class ExecutionService:
     Enforces: decision-before-execution.
     Records execution attempts into the local DB (for set reconciliation).
     """
-    def __init__(self, store: Store, decision_service: DecisionService):
+    def __init__(
+        self,
+        store: Store,
+        decision_service: DecisionService,
+        clock: Optional[Clock] = None,
+        metrics: Optional[Metrics] = None,
+    ):
         self.store = store
         self.decision_service = decision_service
+        self.clock = clock or decision_service.clock
+        self.metrics = metrics or decision_service.metrics
 
-    def execute(self, receipt: DecisionReceipt, payload: Dict[str, Any]) -> None:
-        now = int(time.time())
-
-        # NEW: allow multiple attempts per tx_id, but only one may be EXECUTED.
-        attempt = self.store.next_attempt(receipt.tx_id)
-
-        latest = self.store.get_latest_execution(receipt.tx_id)
-        already_executed = (latest is not None and latest["status"] == "EXECUTED")
-
-        # Replay resistance: once EXECUTED, all further attempts are blocked but logged
-        if already_executed:
-            self.store.insert_execution(
-                tx_id=receipt.tx_id,
-                attempt=attempt,
-                commit_hash=receipt.commit,
-                payload_hash=payload_hash(payload),
-                decided_at=receipt.decided_at,
-                executed_at=now,
-                status="BLOCKED",
-                reason="REPLAY_DETECTED: tx_id already executed",
-            )
-            return
+    def _check(self, receipt: DecisionReceipt, payload: Dict[str, Any]) -> Tuple[str, str, str]:
+        """
+        Everything except replay resistance, in enforcement order.
+        Returns (payload_hash, status, reason).
+        """
+        ph = payload_hash(payload)
 
         # Must present a valid receipt
         if not self.decision_service.verify_receipt(receipt):
-            self.store.insert_execution(
-                tx_id=receipt.tx_id,
-                attempt=attempt,
-                commit_hash=receipt.commit,
-                payload_hash=payload_hash(payload),
-                decided_at=receipt.decided_at,
-                executed_at=now,
-                status="BLOCKED",
-                reason="INVALID_RECEIPT: MAC/commit mismatch",
-            )
-            return
+            return ph, "BLOCKED", REASON_INVALID_RECEIPT
 
         # TOCTOU check
-        ph = payload_hash(payload)
         if ph != receipt.payload_hash:
-            self.store.insert_execution(
-                tx_id=receipt.tx_id,
-                attempt=attempt,
-                commit_hash=receipt.commit,
-                payload_hash=ph,
-                decided_at=receipt.decided_at,
-                executed_at=now,
-                status="BLOCKED",
-                reason="TOCTOU_DETECTED: payload_hash mismatch",
-            )
-            return
+            return ph, "BLOCKED", REASON_TOCTOU
 
         # Decision semantics
         if receipt.decision != "APPROVE":
-            self.store.insert_execution(
-                tx_id=receipt.tx_id,
-                attempt=attempt,
-                commit_hash=receipt.commit,
-                payload_hash=ph,
-                decided_at=receipt.decided_at,
-                executed_at=now,
-                status="BLOCKED",
-                reason="POLICY_REJECT: decision=REJECT",
-            )
-            return
+            return ph, "BLOCKED", REASON_REJECT
 
-        # Execute
-        self.store.insert_execution(
-            tx_id=receipt.tx_id,
-            attempt=attempt,
-            commit_hash=receipt.commit,
-            payload_hash=ph,
-            decided_at=receipt.decided_at,
-            executed_at=now,
-            status="EXECUTED",
-            reason="OK",
-        )
+        return ph, "EXECUTED", REASON_OK
+
+    @timed("tbed_stage_seconds", stage="execute")
+    def execute(self, receipt: DecisionReceipt, payload: Dict[str, Any]) -> ExecutionOutcome:
+        return self._execute_many([(receipt, payload)])[0]
+
+    @timed("tbed_stage_seconds", stage="execute_batch")
+    def execute_batch(
+        self, items: Iterable[Tuple[DecisionReceipt, Dict[str, Any]]]
+    ) -> List[ExecutionOutcome]:
+        """
+        Same per-item semantics as execute(), applied in order, with every outcome
+        written in one transaction.
+        """
+        items = list(items)
+        if not items:
+            return []
+        return self._execute_many(items)
+
+    def _execute_many(self, items: List[Tuple[DecisionReceipt, Dict[str, Any]]]) -> List[ExecutionOutcome]:
+        # Attempt allocation, replay resistance (once EXECUTED, all further attempts for a
+        # tx_id are blocked but logged) and the inserts share one Store.record_attempts()
+        # transaction, so concurrent executors cannot both execute a tx_id.
+        now = int(self.clock.time())
+
+        rows = []
+        for receipt, payload in items:
+            # receipt/TOCTOU/decision checks do not depend on DB state, so they run
+            # before the write lock is taken; record_attempts() overrides replays
+            ph, status, reason = self._check(receipt, payload)
+            rows.append((
+                receipt.tx_id, receipt.commit, ph, receipt.decided_at, now, status, reason,
+                receipt.decision, receipt.policy_version, receipt.nonce,
+            ))
+
+        written = self.store.record_attempts(rows, replay_reason=REASON_REPLAY)
+        outcomes = [
+            ExecutionOutcome(tx_id=tx_id, attempt=attempt, status=status, reason=reason)
+            for tx_id, attempt, _, _, _, _, status, reason in written
+        ]
+        if self.metrics.enabled:
+            for o in outcomes:
+                self.metrics.inc("tbed_executions_total", status=o.status, reason=o.reason)
+        return outcomes
@@ -0,0 +1,244 @@
+"""
+Sharded deployment: tx_id is hashed to one of K SQLite files, each executed by its own
+worker process, so execute throughput scales with cores instead of serializing on one
+writer. Replay resistance only needs per-tx_id state, and every attempt for a tx_id
+lands on the same shard, so per-item semantics are unchanged.
+
+    router = ShardRouter(shard_paths("tbed.sqlite", 4), policy_version="policy-2026-01-24")
+    outcomes = router.execute_many([(receipt, payload), ...])
+    ...
+    ShardedAnchorWorker(shard_paths("tbed.sqlite", 4), AnchorConfig()).run_once()
+    ShardedWatcher(shard_paths("tbed.sqlite", 4), WatcherConfig()).find_missing_anchors()
+"""
+import dataclasses
+import hashlib
+import itertools
+import multiprocessing as mp
+import os
+import queue
+import threading
+import time
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+from .anchor import AnchorConfig, AnchorWorker
+from .clock import Clock
+from .models import DecisionReceipt, ExecutionOutcome
+from .services import DecisionService, ExecutionService
+from .storage import Store
+from .watcher import Watcher, WatcherConfig
+
+Item = Tuple[DecisionReceipt, Dict[str, Any]]
+
+# how often the collector checks that shard workers are still alive while no response arrives
+LIVENESS_INTERVAL = 0.2
+
+
+def shard_for(tx_id: str, num_shards: int) -> int:
+    return int.from_bytes(hashlib.sha256(tx_id.encode("utf-8")).digest()[:8], "big") % num_shards
+
+
+def shard_paths(db_path: str, num_shards: int) -> List[str]:
+    """
+    tbed.sqlite -> [tbed.shard0.sqlite, tbed.shard1.sqlite, ...]
+    """
+    root, ext = os.path.splitext(db_path)
+    return [f"{root}.shard{i}{ext}" for i in range(num_shards)]
+
+
+def _shard_worker(db_path: str, policy_version: str, requests, responses) -> None:
+    store = Store(db_path)
+    exec_svc = ExecutionService(store=store, decision_service=DecisionService(policy_version=policy_version))
+    try:
+        while True:
+            msg = requests.get()
+            if msg is None:
+                return
+            batch_id, items = msg
+            try:
+                responses.put((batch_id, exec_svc.execute_batch(items), None))
+            except Exception as e:  # reported to the caller's future
+                responses.put((batch_id, None, repr(e)))
+    finally:
+        store.close()
+
+
+class ShardRouter:
+    """
+    Routes receipts to per-shard worker processes and gathers their outcomes.
+    Safe to call from several threads; each call's batches are matched by id.
+    If a worker process dies, its pending and later batches fail with RuntimeError
+    instead of waiting forever.
+    """
+    def __init__(self, db_paths: Sequence[str], policy_version: str):
+        self.db_paths = list(db_paths)
+        # create schemas up front so workers never race on it
+        for p in self.db_paths:
+            Store(p).close()
+
+        ctx = mp.get_context()
+        self._responses = ctx.Queue()
+        self._requests = []
+        self._procs = []
+        for p in self.db_paths:
+            q = ctx.Queue()
+            proc = ctx.Process(target=_shard_worker, args=(p, policy_version, q, self._responses), daemon=True)
+            proc.start()
+            self._requests.append(q)
+            self._procs.append(proc)
+
+        self._ids = itertools.count()
+        self._pending: Dict[int, Tuple[int, Future]] = {}  # batch id -> (shard, future)
+        self._dead: Dict[int, str] = {}  # shard -> why its batches fail
+        self._lock = threading.Lock()
+        self._collector = threading.Thread(target=self._collect, name="shard-collector", daemon=True)
+        self._collector.start()
+
+    def _collect(self) -> None:
+        checked = time.monotonic()
+        while True:
+            try:
+                msg = self._responses.get(timeout=LIVENESS_INTERVAL)
+            except queue.Empty:
+                msg = ()
+            # also while other shards keep the queue busy
+            if time.monotonic() - checked >= LIVENESS_INTERVAL:
+                self._fail_dead_shards()
+                checked = time.monotonic()
+            if msg == ():
+                continue
+            if msg is None:
+                return
+            batch_id, outcomes, error = msg
+            with self._lock:
+                entry = self._pending.pop(batch_id, None)
+            if entry is None:
+                continue  # already failed because its worker died
+            fut = entry[1]
+            if error is None:
+                fut.set_result(outcomes)
+            else:
+                fut.set_exception(RuntimeError(f"shard worker failed: {error}"))
+
+    def _fail_dead_shards(self) -> None:
+        failed = []
+        with self._lock:
+            for shard, proc in enumerate(self._procs):
+                if shard in self._dead or proc.is_alive():
+                    continue
+                self._dead[shard] = f"shard worker {shard} exited with code {proc.exitcode}"
+                for batch_id, (s, fut) in list(self._pending.items()):
+                    if s == shard:
+                        del self._pending[batch_id]
+                        failed.append((fut, self._dead[shard]))
+        for fut, why in failed:
+            fut.set_exception(RuntimeError(why))
+
+    def submit(self, shard: int, items: List[Item]) -> "Future[List[ExecutionOutcome]]":
+        fut: Future = Future()
+        batch_id = next(self._ids)
+        with self._lock:
+            why = self._dead.get(shard)
+            if why is None:
+                self._pending[batch_id] = (shard, fut)
+        if why is not None:
+            fut.set_exception(RuntimeError(why))
+            return fut
+        self._requests[shard].put((batch_id, items))
+        return fut
+
+    def execute_many(self, items: Sequence[Item], timeout: Optional[float] = None) -> List[ExecutionOutcome]:
+        """
+        Outcomes in input order. Items for one tx_id keep their relative order.
+        Raises RuntimeError if a shard's worker has died, and concurrent.futures.TimeoutError
+        if the outcomes are not all in after timeout seconds.
+        """
+        k = len(self.db_paths)
+        per_shard: List[List[int]] = [[] for _ in range(k)]
+        for i, (receipt, _) in enumerate(items):
+            per_shard[shard_for(receipt.tx_id, k)].append(i)
+
+        futs = [
+            (idx, self.submit(s, [items[i] for i in idx]))
+            for s, idx in enumerate(per_shard) if idx
+        ]
+        deadline = None if timeout is None else time.monotonic() + timeout
+        out: List[Optional[ExecutionOutcome]] = [None] * len(items)
+        for idx, fut in futs:
+            left = None if deadline is None else max(0.0, deadline - time.monotonic())
+            for i, outcome in zip(idx, fut.result(timeout=left)):
+                out[i] = outcome
+        return out  # type: ignore[return-value]
+
+    def execute(
+        self, receipt: DecisionReceipt, payload: Dict[str, Any], timeout: Optional[float] = None
+    ) -> ExecutionOutcome:
+        return self.execute_many([(receipt, payload)], timeout)[0]
+
+    def close(self) -> None:
+        for q in self._requests:
+            q.put(None)
+        for proc in self._procs:
+            proc.join()
+        self._responses.put(None)
+        self._collector.join()
+
+    def __enter__(self) -> "ShardRouter":
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self.close()
+
+
+class _PerShard:
+    def __init__(self, db_paths: Sequence[str]):
+        self.stores = [Store(p) for p in db_paths]
+        self._pool = ThreadPoolExecutor(max_workers=len(self.stores), thread_name_prefix="shard")
+
+    def _map(self, fn, parts) -> List[Any]:
+        # SQLite releases the GIL, so shards reconcile in parallel from threads
+        return list(self._pool.map(fn, parts))
+
+    def close(self) -> None:
+        self._pool.shutdown(wait=True)
+        for s in self.stores:
+            s.close()
+
+
+class ShardedAnchorWorker(_PerShard):
+    """
+    One AnchorWorker per shard, run in parallel. With a seed, shard i uses seed + i.
+    """
+    def __init__(self, db_paths: Sequence[str], cfg: AnchorConfig, clock: Optional[Clock] = None):
+        super().__init__(db_paths)
+        self.workers = [
+            AnchorWorker(
+                store=s,
+                cfg=cfg if cfg.seed is None else dataclasses.replace(cfg, seed=cfg.seed + i),
+                clock=clock,
+            )
+            for i, s in enumerate(self.stores)
+        ]
+
+    def run_once(self) -> List[str]:
+        return [c for part in self._map(lambda w: w.run_once(), self.workers) for c in part]
+
+    def close(self) -> None:
+        for w in self.workers:
+            w.close()
+        super().close()
+
+
+class ShardedWatcher(_PerShard):
+    """
+    One Watcher per shard, run in parallel; findings carry their shard index.
+    """
+    def __init__(self, db_paths: Sequence[str], cfg: WatcherConfig, clock: Optional[Clock] = None):
+        super().__init__(db_paths)
+        self.watchers = [Watcher(store=s, cfg=cfg, clock=clock) for s in self.stores]
+
+    def find_missing_anchors(self) -> List[Dict[str, Any]]:
+        parts = self._map(lambda w: w.find_missing_anchors(), self.watchers)
+        missing = [dict(f, shard=i) for i, part in enumerate(parts) for f in part]
+        missing.sort(key=lambda f: f["executed_at"])
+        return missing
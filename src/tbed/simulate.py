@@ -8,11 +8,14 @@ Minimal demo:
 import argparse
 import json
 import os
-import time
 
+from .clock import SYSTEM_CLOCK, VirtualClock
+from .metrics import METRICS
 from .storage import Store
 from .services import DecisionService, ExecutionService
 from .anchor import AnchorWorker, AnchorConfig
+from .backends import HttpAnchorBackend, SegmentLogBackend
+from .tlog_server import TransparencyLogServer
 from .watcher import Watcher, WatcherConfig
 
 
@@ -20,11 +23,11 @@ def pretty(obj) -> str:
     return json.dumps(obj, indent=2, sort_keys=True)
 def dump_tables(store: Store):
     print("\n--- EXECUTIONS (audit log) ---")
-    for r in store.dump_executions():
+    for r in store.iter_dump_executions():
         print(dict(r))
 
     print("\n--- ANCHORS (anchor log) ---")
-    for r in store.dump_anchors():
+    for r in store.iter_dump_anchors():
         print(dict(r))
 
 
@@ -34,18 +37,44 @@ def main():
     ap.add_argument("--db", default="tbed.sqlite", help="sqlite file path (created locally)")
     ap.add_argument("--suppression", type=float, default=0.0, help="anchor failure rate 0..1")
     ap.add_argument("--anchor-delay", type=int, default=1, help="seconds per anchor")
+    ap.add_argument("--batch-size", type=int, default=0, help="commits per Merkle-batched anchor (0 = one anchor per commit)")
     ap.add_argument("--deadline", type=int, default=3, help="seconds before watcher flags missing anchors")
+    ap.add_argument("--virtual-clock", action="store_true", help="simulate delays/deadlines instead of sleeping")
+    ap.add_argument("--seed", type=int, default=None, help="seed for anchor suppression")
+    ap.add_argument("--metrics-out", default=None, help="write Prometheus text-format metrics to this file")
+    ap.add_argument("--anchor-backend", choices=["sqlite", "segment", "http"], default="sqlite",
+                    help="where anchors are published (http starts a local stand-in transparency log)")
+    ap.add_argument("--anchor-log", default="tbed-anchors", help="segment log directory for segment/http")
     args = ap.parse_args()
 
+    METRICS.enabled = args.metrics_out is not None
+
+    clock = VirtualClock() if args.virtual_clock else SYSTEM_CLOCK
     store = Store(db_path=args.db)
-    decision_svc = DecisionService(policy_version="policy-2026-01-24")
+    decision_svc = DecisionService(policy_version="policy-2026-01-24", clock=clock)
     exec_svc = ExecutionService(store=store, decision_service=decision_svc)
 
+    backend, tlog = None, None
+    if args.anchor_backend == "segment":
+        backend = SegmentLogBackend(args.anchor_log)
+    elif args.anchor_backend == "http":
+        tlog = TransparencyLogServer(SegmentLogBackend(args.anchor_log)).start()
+        backend = HttpAnchorBackend(tlog.url)
+
     anchor_worker = AnchorWorker(
         store=store,
-        cfg=AnchorConfig(anchor_delay_seconds=args.anchor_delay, failure_rate=args.suppression),
+        cfg=AnchorConfig(
+            anchor_delay_seconds=args.anchor_delay,
+            failure_rate=args.suppression,
+            batch_size=args.batch_size,
+            seed=args.seed,
+        ),
+        clock=clock,
+        backend=backend,
+    )
+    watcher = Watcher(
+        store=store, cfg=WatcherConfig(anchor_deadline_seconds=args.deadline), clock=clock, backend=backend
     )
-    watcher = Watcher(store=store, cfg=WatcherConfig(anchor_deadline_seconds=args.deadline))
 
     print("\n=== Scenario 1: Normal flow ===")
     payload1 = {"amount": 100, "currency": "GBP", "merchant": "demo-shop"}
@@ -80,12 +109,21 @@ def main():
 
     anchor_worker.run_once()
 
-    time.sleep(max(0, args.deadline + 1))
+    clock.sleep(max(0, args.deadline + 1))
     missing = watcher.find_missing_anchors()
     print("Watcher missing:", pretty(missing))
     dump_tables(store)
 
 
+    store.close()
+    if backend is not None:
+        backend.close()
+    if tlog is not None:
+        tlog.stop()
+    if args.metrics_out:
+        METRICS.write_prometheus(args.metrics_out)
+        print(f"(Metrics written to {os.path.abspath(args.metrics_out)})")
+
     print("\nDone.")
     print(f"(DB written to {os.path.abspath(args.db)} and should be git-ignored.)")
 
@@ -1,55 +1,517 @@
 import sqlite3
-from typing import Optional, List
+import threading
+from concurrent.futures import Future
+from typing import Callable, Dict, Iterable, Iterator, List, Optional, Sequence, Set, Tuple
 
+from .anchorindex import AnchoredIndex
+from .groupcommit import GroupCommitter
+from .metrics import METRICS, Metrics, timed
 
+
+SCHEMA_VERSION = 6
+# first version with BLOB hashes and integer codes; older files go through migrate.py
+COMPACT_SCHEMA_VERSION = 2
+
+# Compact layout: hashes are 32-byte BLOBs, status/reason are small integer codes
+# resolved through lookup tables. Store converts back to hex/text at its boundary.
 SCHEMA = """
 PRAGMA journal_mode=WAL;
 
+CREATE TABLE IF NOT EXISTS statuses (
+  code INTEGER PRIMARY KEY,
+  name TEXT NOT NULL UNIQUE
+);
+
+INSERT OR IGNORE INTO statuses (code, name) VALUES (1, 'EXECUTED'), (2, 'BLOCKED');
+
+CREATE TABLE IF NOT EXISTS reasons (
+  code INTEGER PRIMARY KEY,
+  text TEXT NOT NULL UNIQUE
+);
+
 CREATE TABLE IF NOT EXISTS executions (
   id INTEGER PRIMARY KEY AUTOINCREMENT,
   tx_id TEXT NOT NULL,
   attempt INTEGER NOT NULL,
-  commit_hash TEXT NOT NULL,
-  payload_hash TEXT NOT NULL,
+  commit_hash BLOB NOT NULL,
+  payload_hash BLOB NOT NULL,
   decided_at INTEGER NOT NULL,
   executed_at INTEGER NOT NULL,
-  status TEXT NOT NULL,         -- EXECUTED | BLOCKED
-  reason TEXT NOT NULL,         -- why blocked (if blocked)
+  status INTEGER NOT NULL,      -- statuses.code: EXECUTED | BLOCKED
+  reason INTEGER NOT NULL,      -- reasons.code: why blocked (if blocked)
+  -- remaining receipt fields, so an offline audit can recompute the commit (NULL before v4)
+  decision INTEGER,             -- DECISION_CODES
+  policy INTEGER,               -- policies.code
+  nonce BLOB,
   UNIQUE(tx_id, attempt)        -- allow multiple attempts per tx_id for audit logging
 );
 
+CREATE TABLE IF NOT EXISTS policies (
+  code INTEGER PRIMARY KEY,
+  version TEXT NOT NULL UNIQUE
+);
+
+-- one row per tx_id: attempt allocation and replay state, updated in the same transaction as executions
+CREATE TABLE IF NOT EXISTS tx_state (
+  tx_id TEXT PRIMARY KEY,
+  last_attempt INTEGER NOT NULL,
+  executed INTEGER NOT NULL DEFAULT 0,
+  commit_hash BLOB,             -- commit of the EXECUTED attempt, if any
+  archived_upto INTEGER NOT NULL DEFAULT 0  -- attempts 1..archived_upto were moved to the archive
+) WITHOUT ROWID;
+
 CREATE TABLE IF NOT EXISTS anchors (
   id INTEGER PRIMARY KEY AUTOINCREMENT,
-  commit_hash TEXT NOT NULL UNIQUE,
+  commit_hash BLOB NOT NULL UNIQUE,
   anchored_at INTEGER NOT NULL,
   backend TEXT NOT NULL
 );
+
+-- reconciliation: EXECUTED rows by age; anchors.commit_hash is already indexed by UNIQUE
+CREATE INDEX IF NOT EXISTS idx_executions_status_executed_at ON executions(status, executed_at);
+-- anchor listings page by (anchored_at, id)
+CREATE INDEX IF NOT EXISTS idx_anchors_anchored_at ON anchors(anchored_at);
+
+-- incremental watcher: last reconciled executions.id per watcher, plus open findings
+CREATE TABLE IF NOT EXISTS watcher_state (
+  name TEXT PRIMARY KEY,
+  last_execution_id INTEGER NOT NULL,
+  last_executed_at INTEGER NOT NULL
+);
+
+CREATE TABLE IF NOT EXISTS watcher_findings (
+  id INTEGER PRIMARY KEY AUTOINCREMENT,
+  commit_hash BLOB NOT NULL UNIQUE,
+  tx_id TEXT NOT NULL,
+  executed_at INTEGER NOT NULL,
+  detected_at INTEGER NOT NULL,
+  resolved_at INTEGER           -- set once a late anchor shows up
+);
+
+CREATE INDEX IF NOT EXISTS idx_watcher_findings_open ON watcher_findings(resolved_at);
+
+-- Merkle-batched anchoring: only root_hash goes into anchors; each commit keeps its inclusion proof
+CREATE TABLE IF NOT EXISTS anchor_proofs (
+  commit_hash BLOB PRIMARY KEY,
+  root_hash BLOB NOT NULL,
+  leaf_index INTEGER NOT NULL,
+  proof BLOB NOT NULL           -- merkle.encode_proof
+);
+
+CREATE INDEX IF NOT EXISTS idx_anchor_proofs_root ON anchor_proofs(root_hash);
+
+-- AnchorWorker work queue: EXECUTED commits not anchored yet, enqueued in the execution's
+-- transaction and deleted in the anchor's; a claim leases rows until lease_until
+CREATE TABLE IF NOT EXISTS anchor_queue (
+  id INTEGER PRIMARY KEY AUTOINCREMENT,
+  commit_hash BLOB NOT NULL UNIQUE,
+  enqueued_at INTEGER NOT NULL,
+  lease_owner TEXT,
+  lease_until REAL NOT NULL DEFAULT 0,  -- claimable once this has passed
+  claims INTEGER NOT NULL DEFAULT 0
+);
+
+-- cold archive (archive.py): sealed read-only SQLite files of reconciled history, per UTC day
+CREATE TABLE IF NOT EXISTS archive_segments (
+  id INTEGER PRIMARY KEY AUTOINCREMENT,
+  day TEXT NOT NULL,            -- UTC date of the newest executed_at of each archived tx
+  path TEXT NOT NULL UNIQUE,    -- relative to the archive directory
+  executions INTEGER NOT NULL,
+  anchors INTEGER NOT NULL,
+  min_execution_id INTEGER NOT NULL,
+  max_execution_id INTEGER NOT NULL,
+  digest TEXT NOT NULL,         -- archive.segment_digest
+  created_at INTEGER NOT NULL
+);
+
+-- hex/text views of the compact tables, for listings and audits
+CREATE VIEW IF NOT EXISTS executions_v AS
+SELECT e.id, e.tx_id, e.attempt,
+       {e_commit} AS commit_hash, {e_payload} AS payload_hash,
+       e.decided_at, e.executed_at, s.name AS status, r.text AS reason
+FROM executions e
+JOIN statuses s ON s.code = e.status
+JOIN reasons r ON r.code = e.reason;
+
+CREATE VIEW IF NOT EXISTS anchors_v AS
+SELECT a.id, {a_commit} AS commit_hash, a.anchored_at, a.backend
+FROM anchors a;
+"""
+
+
+def hex_sql(col: str) -> str:
+    """
+    SQL expression returning a hash column as lowercase hex (non-BLOB values pass through).
+    """
+    return f"CASE typeof({col}) WHEN 'blob' THEN lower(hex({col})) ELSE {col} END"
+
+
+SCHEMA = SCHEMA.format(
+    e_commit=hex_sql("e.commit_hash"),
+    e_payload=hex_sql("e.payload_hash"),
+    a_commit=hex_sql("a.commit_hash"),
+)
+
+STATUS_CODES = {"EXECUTED": 1, "BLOCKED": 2}
+DECISION_CODES = {"APPROVE": 1, "REJECT": 2}
+
+
+def hash_to_db(h: str):
+    """
+    Canonical 64-char lowercase hex becomes a 32-byte BLOB. Anything else (e.g. the commit
+    of a forged receipt, which is still logged) is stored verbatim so it round-trips exactly.
+    """
+    if len(h) == 64:
+        return hex_to_db(h)
+    return h
+
+
+def hex_to_db(h: str):
+    """
+    Lowercase hex of any length as a BLOB (e.g. receipt nonces); anything else verbatim.
+    """
+    try:
+        b = bytes.fromhex(h)
+    except ValueError:
+        return h
+    return b if b.hex() == h else h
+
+
+# EXECUTED rows without a direct anchor. Rows covered by a batch carry root_hash/proof and
+# root_anchored so the caller can verify the inclusion proof; the rest have NULLs.
+UNANCHORED_EXECUTIONS_SQL = f"""
+SELECT e.id, e.tx_id, {hex_sql("e.commit_hash")} AS commit_hash, e.executed_at,
+       {hex_sql("p.root_hash")} AS root_hash, p.proof, ra.id IS NOT NULL AS root_anchored
+FROM executions e
+LEFT JOIN anchors a ON a.commit_hash = e.commit_hash
+LEFT JOIN anchor_proofs p ON p.commit_hash = e.commit_hash
+LEFT JOIN anchors ra ON ra.commit_hash = p.root_hash
+WHERE e.status = {STATUS_CODES["EXECUTED"]} AND a.id IS NULL
+"""
+
+# Every EXECUTED row with its batch proof (if any), ignoring the local anchors table: used
+# when anchors are reconciled against an external AnchorBackend instead.
+EXECUTED_WITH_PROOFS_SQL = f"""
+SELECT e.id, e.tx_id, {hex_sql("e.commit_hash")} AS commit_hash, e.executed_at,
+       {hex_sql("p.root_hash")} AS root_hash, p.proof
+FROM executions e
+LEFT JOIN anchor_proofs p ON p.commit_hash = e.commit_hash
+WHERE e.status = {STATUS_CODES["EXECUTED"]}
 """
 
 
+# EXECUTED commits of transactions moved to the archive, which only archives anchored ones
+# (idx_tx_state_archived)
+ARCHIVED_COMMITS_SQL = "SELECT commit_hash FROM tx_state WHERE archived_upto > 0 AND commit_hash IS NOT NULL"
+
+# Rows per keyset page for the iter_* methods.
+PAGE_SIZE = 1000
+
+# Stay well below SQLITE_MAX_VARIABLE_NUMBER when expanding IN (...) lists.
+IN_CHUNK = 500
+
+ExecutionRow = Tuple[str, int, str, str, int, int, str, str]
+# (decision, policy_version, nonce) of the receipt an attempt presented
+ReceiptFields = Tuple[str, str, str]
+
+# Applied once per pooled connection (journal_mode=WAL is persistent and lives in SCHEMA).
+CONNECTION_PRAGMAS = (
+    "PRAGMA busy_timeout=5000",
+    "PRAGMA temp_store=MEMORY",
+)
+
+SYNCHRONOUS_MODES = ("OFF", "NORMAL", "FULL", "EXTRA")
+
+# writes that go through group commit and can be queued with Store.submit()
+WRITE_METHODS = ("insert_executions", "record_attempts", "insert_anchor", "insert_anchor_batch")
+
+
 class Store:
-    def __init__(self, db_path: str):
+    """
+    One long-lived connection per thread, so the execution path, AnchorWorker and
+    Watcher can share a single Store without paying sqlite3.connect on every call. The
+    connections of threads that have exited are closed whenever a new thread opens one.
+
+    With anchor_index (the default) is_anchored() is answered from memory: the index is
+    loaded from the anchors table (and the commits of archived transactions) at startup
+    and kept in sync by insert_anchor*. Anchors written by another process or Store become
+    visible after refresh_anchor_index(), or immediately with is_anchored(..., fresh=True).
+    anchor_index_max_exact bounds the index's memory: it then keeps that many keys in an
+    LRU behind a Bloom filter and asks the database about the rest.
+
+    With group_commit_rows > 0, writes (insert_executions, record_attempts, insert_anchor*)
+    are buffered and committed together once that many rows are pending or
+    group_commit_ms has passed; a write with nothing queued behind it commits at once. The
+    write methods still block until their group has
+    committed; submit() returns a Future instead. synchronous picks SQLite's fsync policy
+    (OFF / NORMAL / FULL / EXTRA); None keeps the build default.
+    """
+    def __init__(
+        self,
+        db_path: str,
+        cached_statements: int = 256,
+        metrics: Optional[Metrics] = None,
+        anchor_index: bool = True,
+        anchor_index_max_exact: Optional[int] = None,
+        synchronous: Optional[str] = None,
+        group_commit_rows: int = 0,
+        group_commit_ms: float = 5.0,
+    ):
+        if synchronous is not None and synchronous.upper() not in SYNCHRONOUS_MODES:
+            raise ValueError(f"synchronous must be one of {SYNCHRONOUS_MODES}, got {synchronous!r}")
         self.db_path = db_path
+        self.metrics = metrics or METRICS
+        self.cached_statements = cached_statements
+        self.synchronous = synchronous.upper() if synchronous is not None else None
+        self._local = threading.local()
+        self._lock = threading.Lock()
+        # (owning thread, its connection); entries of exited threads are closed on the next open
+        self._conns: List[Tuple[threading.Thread, sqlite3.Connection]] = []
+        self._closed = False
+        self._listeners: List[object] = []
         self._init_db()
+        self._anchor_index: Optional[AnchoredIndex] = None
+        self._anchor_index_last_id = 0
+        if anchor_index:
+            with self._conn() as conn:
+                n = conn.execute("SELECT COUNT(*) FROM anchors").fetchone()[0]
+            self._anchor_index = AnchoredIndex(expected=max(1 << 16, 2 * n), max_exact=anchor_index_max_exact)
+            with self._conn() as conn:
+                # archived transactions were fully anchored; their anchors left with them
+                self._anchor_index.add_many(r[0] for r in conn.execute(ARCHIVED_COMMITS_SQL))
+            self.refresh_anchor_index()
+        self._committer: Optional[GroupCommitter] = None
+        if group_commit_rows > 0:
+            self._committer = GroupCommitter(
+                self._conn, group_commit_rows, group_commit_ms, self.metrics, on_rollback=self._reason_codes.clear
+            )
 
-    def _conn(self) -> sqlite3.Connection:
-        conn = sqlite3.connect(self.db_path)
+    def _connect(self) -> sqlite3.Connection:
+        # check_same_thread=False only so close() may run from any thread;
+        # each connection is still used by the thread that opened it.
+        conn = sqlite3.connect(
+            self.db_path,
+            check_same_thread=False,
+            cached_statements=self.cached_statements,
+        )
         conn.row_factory = sqlite3.Row
+        for pragma in CONNECTION_PRAGMAS:
+            conn.execute(pragma)
+        if self.synchronous is not None:
+            conn.execute(f"PRAGMA synchronous={self.synchronous}")
+        return conn
+
+    def _conn(self) -> sqlite3.Connection:
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            with self._lock:
+                if self._closed:
+                    raise sqlite3.ProgrammingError("Store is closed")
+                live = [(t, c) for t, c in self._conns if t.is_alive()]
+                dead = [c for t, c in self._conns if not t.is_alive()]
+                conn = self._connect()
+                live.append((threading.current_thread(), conn))
+                self._conns = live
+            for c in dead:
+                c.close()
+            self._local.conn = conn
         return conn
 
+    def add_listener(self, listener: object) -> None:
+        """
+        listener.on_executions(rows) gets ExecutionRow tuples and listener.on_anchors(commit_hashes)
+        gets every commit newly covered by an anchor (batch members included), both right
+        after the write commits. Either method may be omitted.
+        """
+        self._listeners.append(listener)
+
+    def remove_listener(self, listener: object) -> None:
+        self._listeners.remove(listener)
+
+    def _notify(self, event: str, arg) -> None:
+        for listener in self._listeners:
+            fn = getattr(listener, event, None)
+            if fn is not None:
+                fn(arg)
+
+    def _write(self, op, args: tuple, rows: int = 1):
+        """
+        Runs op(conn, *args) -> (result, after) in a write transaction (the next group
+        when group commit is on), then after() once committed.
+        """
+        if self._committer is not None:
+            return self._committer.submit(op, args, rows).result()
+        try:
+            with self._conn() as conn:
+                conn.execute("BEGIN IMMEDIATE")
+                result, after = op(conn, *args)
+        except Exception:
+            # reason codes cached during the rolled-back transaction may not exist
+            self._reason_codes.clear()
+            raise
+        if after is not None:
+            after()
+        return result
+
+    def submit(self, method: str, *args) -> Future:
+        """
+        Queues a write without waiting: submit("insert_anchor", commit, ts, backend).
+        The Future resolves to the method's return value once its group commits.
+        Without group commit the write runs immediately.
+        """
+        if method not in WRITE_METHODS:
+            raise ValueError(f"submit() takes one of {WRITE_METHODS}, got {method!r}")
+        op = getattr(self, "_op_" + method)
+        if method == "insert_anchor_batch":
+            rows = 1 + len(args[3])
+        elif method == "insert_anchor":
+            rows = 1
+        else:
+            rows = len(args[0])
+        if self._committer is not None:
+            return self._committer.submit(op, args, rows)
+        fut: Future = Future()
+        try:
+            fut.set_result(self._write(op, args, rows))
+        except Exception as e:
+            fut.set_exception(e)
+        return fut
+
+    def flush(self) -> None:
+        """
+        Blocks until every buffered write has committed.
+        """
+        if self._committer is not None:
+            self._committer.flush()
+
+    def close(self) -> None:
+        if self._committer is not None:
+            self._committer.close()
+            self._committer = None
+        with self._lock:
+            self._closed = True
+            conns, self._conns = self._conns, []
+        for _, conn in conns:
+            conn.close()
+        self._local = threading.local()
+
+    def __enter__(self) -> "Store":
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self.close()
+
     def _init_db(self) -> None:
         with self._conn() as conn:
+            version = conn.execute("PRAGMA user_version").fetchone()[0]
+            legacy = conn.execute(
+                "SELECT 1 FROM sqlite_master WHERE type='table' AND name='executions'"
+            ).fetchone()
+            if legacy is not None and version < COMPACT_SCHEMA_VERSION:
+                raise RuntimeError(
+                    f"{self.db_path} uses the hex/text schema (v{version}); "
+                    f"convert it with: python -m src.tbed.migrate {self.db_path}"
+                )
             conn.executescript(SCHEMA)
+            if legacy is not None and version < 3:
+                # v2 -> v3: tx_state is derived from the execution log
+                self._backfill_tx_state(conn)
+            if legacy is not None and version < 4:
+                # v3 -> v4: receipt fields for auditing; existing rows stay NULL
+                have = {r[1] for r in conn.execute("PRAGMA table_info(executions)")}
+                for col in ("decision INTEGER", "policy INTEGER", "nonce BLOB"):
+                    if col.split()[0] not in have:
+                        conn.execute(f"ALTER TABLE executions ADD COLUMN {col}")
+            if legacy is not None and version < 5:
+                # v4 -> v5: archive bookkeeping
+                have = {r[1] for r in conn.execute("PRAGMA table_info(tx_state)")}
+                if "archived_upto" not in have:
+                    conn.execute("ALTER TABLE tx_state ADD COLUMN archived_upto INTEGER NOT NULL DEFAULT 0")
+            if legacy is not None and version < 6:
+                # v5 -> v6: queue what is still waiting for an anchor
+                self._backfill_anchor_queue(conn)
+            # needs tx_state.archived_upto, so not part of SCHEMA
+            conn.execute(
+                "CREATE INDEX IF NOT EXISTS idx_tx_state_archived ON tx_state(commit_hash) WHERE archived_upto > 0"
+            )
+            conn.execute(f"PRAGMA user_version={SCHEMA_VERSION}")
+        # (table, text) -> code for the reasons/policies lookup tables
+        self._reason_codes: Dict[Tuple[str, str], int] = {}
+        self._reason_lock = threading.Lock()
+
+    def _lookup_code(self, conn: sqlite3.Connection, table: str, column: str, value: str) -> int:
+        code = self._reason_codes.get((table, value))
+        if code is None:
+            with self._reason_lock:
+                conn.execute(f"INSERT OR IGNORE INTO {table} ({column}) VALUES (?)", (value,))
+                code = int(conn.execute(f"SELECT code FROM {table} WHERE {column} = ?", (value,)).fetchone()[0])
+                self._reason_codes[(table, value)] = code
+        return code
+
+    def _reason_code(self, conn: sqlite3.Connection, reason: str) -> int:
+        return self._lookup_code(conn, "reasons", "text", reason)
+
+    @staticmethod
+    def _backfill_tx_state(conn: sqlite3.Connection) -> None:
+        conn.execute(
+            """
+            INSERT OR REPLACE INTO tx_state (tx_id, last_attempt, executed, commit_hash)
+            SELECT e.tx_id, MAX(e.attempt), MAX(e.status = ?),
+                   (SELECT x.commit_hash FROM executions x
+                    WHERE x.tx_id = e.tx_id AND x.status = ? ORDER BY x.attempt LIMIT 1)
+            FROM executions e
+            GROUP BY e.tx_id
+            """,
+            (STATUS_CODES["EXECUTED"], STATUS_CODES["EXECUTED"]),
+        )
+
+    @staticmethod
+    def _backfill_anchor_queue(conn: sqlite3.Connection) -> None:
+        conn.execute(
+            """
+            INSERT OR IGNORE INTO anchor_queue (commit_hash, enqueued_at)
+            SELECT e.commit_hash, e.executed_at FROM executions e
+            WHERE e.status = ?
+              AND NOT EXISTS (SELECT 1 FROM anchors a WHERE a.commit_hash = e.commit_hash)
+              AND NOT EXISTS (SELECT 1 FROM anchor_proofs p JOIN anchors ra ON ra.commit_hash = p.root_hash
+                              WHERE p.commit_hash = e.commit_hash)
+            ORDER BY e.executed_at, e.id
+            """,
+            (STATUS_CODES["EXECUTED"],),
+        )
+
+    def _execution_params(
+        self, conn: sqlite3.Connection, row: ExecutionRow, receipt: Optional[ReceiptFields] = None
+    ) -> tuple:
+        tx_id, attempt, commit_hash, payload_hash, decided_at, executed_at, status, reason = row
+        decision = policy = nonce = None
+        if receipt is not None:
+            decision = DECISION_CODES.get(receipt[0])
+            policy = self._lookup_code(conn, "policies", "version", receipt[1])
+            nonce = hex_to_db(receipt[2])
+        return (
+            tx_id,
+            attempt,
+            hash_to_db(commit_hash),
+            hash_to_db(payload_hash),
+            decided_at,
+            executed_at,
+            STATUS_CODES[status],
+            self._reason_code(conn, reason),
+            decision,
+            policy,
+            nonce,
+        )
 
     # ---- executions ----
+    @timed("tbed_store_query_seconds", op="next_attempt")
     def next_attempt(self, tx_id: str) -> int:
         with self._conn() as conn:
-            cur = conn.execute(
-                "SELECT COALESCE(MAX(attempt), 0) + 1 AS next_attempt FROM executions WHERE tx_id = ?",
-                (tx_id,),
-            )
-            return int(cur.fetchone()["next_attempt"])
+            cur = conn.execute("SELECT last_attempt FROM tx_state WHERE tx_id = ?", (tx_id,))
+            r = cur.fetchone()
+            return 1 if r is None else int(r["last_attempt"]) + 1
 
+    @timed("tbed_store_query_seconds", op="insert_execution")
     def insert_execution(
         self,
         tx_id: str,
@@ -61,68 +523,660 @@ class Store:
         status: str,
         reason: str,
     ) -> None:
-        with self._conn() as conn:
-            conn.execute(
-                """
-                INSERT INTO executions (tx_id, attempt, commit_hash, payload_hash, decided_at, executed_at, status, reason)
-                VALUES (?, ?, ?, ?, ?, ?, ?, ?)
-                """,
-                (tx_id, attempt, commit_hash, payload_hash, decided_at, executed_at, status, reason),
+        self.insert_executions([
+            (tx_id, attempt, commit_hash, payload_hash, decided_at, executed_at, status, reason)
+        ])
+
+    @staticmethod
+    def _update_tx_state(conn: sqlite3.Connection, params: Sequence[tuple]) -> None:
+        # params are _execution_params() tuples
+        conn.executemany(
+            """
+            INSERT INTO tx_state (tx_id, last_attempt, executed, commit_hash)
+            VALUES (?1, ?2, ?4 = 1, CASE WHEN ?4 = 1 THEN ?3 END)
+            ON CONFLICT(tx_id) DO UPDATE SET
+              last_attempt = MAX(last_attempt, excluded.last_attempt),
+              commit_hash = CASE WHEN executed THEN commit_hash ELSE excluded.commit_hash END,
+              executed = executed OR excluded.executed
+            """,
+            [(p[0], p[1], p[2], p[6]) for p in params],
+        )
+
+    @timed("tbed_store_query_seconds", op="insert_executions")
+    def insert_executions(self, rows: Sequence[ExecutionRow]) -> None:
+        """
+        rows are (tx_id, attempt, commit_hash, payload_hash, decided_at, executed_at, status, reason),
+        written in a single transaction. Callers own attempt numbering and replay checks;
+        ExecutionService goes through record_attempts() instead.
+        """
+        self._write(self._op_insert_executions, (rows,), len(rows))
+
+    def _insert_execution_params(
+        self,
+        conn: sqlite3.Connection,
+        rows: Sequence[ExecutionRow],
+        receipts: Optional[Sequence[Optional[ReceiptFields]]] = None,
+    ) -> None:
+        params = [
+            self._execution_params(conn, r, None if receipts is None else receipts[i])
+            for i, r in enumerate(rows)
+        ]
+        conn.executemany(
+            """
+            INSERT INTO executions (tx_id, attempt, commit_hash, payload_hash, decided_at, executed_at, status, reason,
+                                    decision, policy, nonce)
+            VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+            """,
+            params,
+        )
+        self._update_tx_state(conn, params)
+        executed = STATUS_CODES["EXECUTED"]
+        conn.executemany(
+            "INSERT OR IGNORE INTO anchor_queue (commit_hash, enqueued_at) VALUES (?, ?)",
+            [(p[2], p[5]) for p in params if p[6] == executed],
+        )
+
+    def _after_executions(self, rows: Sequence[ExecutionRow]):
+        if not self._listeners:
+            return None
+        return lambda: self._notify("on_executions", rows)
+
+    def _op_insert_executions(self, conn: sqlite3.Connection, rows: Sequence[ExecutionRow]):
+        self._insert_execution_params(conn, rows)
+        return None, self._after_executions(rows)
+
+    @timed("tbed_store_query_seconds", op="record_attempts")
+    def record_attempts(
+        self,
+        rows: Sequence[tuple],
+        replay_reason: str,
+    ) -> List[ExecutionRow]:
+        """
+        rows are (tx_id, commit_hash, payload_hash, decided_at, executed_at, status, reason),
+        optionally followed by the receipt's (decision, policy_version, nonce) for auditing,
+        with the verdict the attempt gets if its tx_id has not executed yet. Attempt
+        numbers are allocated, replays (including later rows of this batch) are turned
+        into BLOCKED/replay_reason, and everything is written inside one BEGIN IMMEDIATE
+        transaction, so concurrent executors (threads or processes) cannot both execute
+        one tx_id. Returns the ExecutionRow tuples as written.
+        """
+        return self._write(self._op_record_attempts, (rows, replay_reason), len(rows))
+
+    def _op_record_attempts(self, conn: sqlite3.Connection, rows, replay_reason: str):
+        ids = list(dict.fromkeys(r[0] for r in rows))
+        state: Dict[str, List[int]] = {}
+        for i in range(0, len(ids), IN_CHUNK):
+            chunk = ids[i:i + IN_CHUNK]
+            cur = conn.execute(
+                f"SELECT tx_id, last_attempt, executed FROM tx_state WHERE tx_id IN ({','.join('?' * len(chunk))})",
+                chunk,
             )
+            for r in cur:
+                state[r["tx_id"]] = [int(r["last_attempt"]), int(r["executed"])]
+
+        written: List[ExecutionRow] = []
+        receipts: List[Optional[ReceiptFields]] = []
+        for tx_id, commit_hash, payload_hash, decided_at, executed_at, status, reason, *receipt in rows:
+            st = state.setdefault(tx_id, [0, 0])
+            st[0] += 1
+            if st[1]:
+                status, reason = "BLOCKED", replay_reason
+            elif status == "EXECUTED":
+                st[1] = 1
+            written.append((tx_id, st[0], commit_hash, payload_hash, decided_at, executed_at, status, reason))
+            receipts.append(tuple(receipt) if receipt else None)
+
+        self._insert_execution_params(conn, written, receipts)
+        return written, self._after_executions(written)
+
+    @timed("tbed_store_query_seconds", op="next_attempts")
+    def next_attempts(self, tx_ids: Iterable[str]) -> Dict[str, int]:
+        ids = list(dict.fromkeys(tx_ids))
+        out = {tx_id: 1 for tx_id in ids}
+        with self._conn() as conn:
+            for i in range(0, len(ids), IN_CHUNK):
+                chunk = ids[i:i + IN_CHUNK]
+                cur = conn.execute(
+                    f"SELECT tx_id, last_attempt FROM tx_state WHERE tx_id IN ({','.join('?' * len(chunk))})",
+                    chunk,
+                )
+                for r in cur:
+                    out[r["tx_id"]] = int(r["last_attempt"]) + 1
+        return out
 
+    @timed("tbed_store_query_seconds", op="has_executed")
+    def has_executed(self, tx_id: str) -> bool:
+        with self._conn() as conn:
+            cur = conn.execute("SELECT 1 FROM tx_state WHERE tx_id = ? AND executed", (tx_id,))
+            return cur.fetchone() is not None
+
+    @timed("tbed_store_query_seconds", op="executed_tx_ids")
+    def executed_tx_ids(self, tx_ids: Iterable[str]) -> Set[str]:
+        ids = list(dict.fromkeys(tx_ids))
+        out: Set[str] = set()
+        with self._conn() as conn:
+            for i in range(0, len(ids), IN_CHUNK):
+                chunk = ids[i:i + IN_CHUNK]
+                cur = conn.execute(
+                    f"SELECT tx_id FROM tx_state WHERE executed AND tx_id IN ({','.join('?' * len(chunk))})",
+                    chunk,
+                )
+                out.update(r["tx_id"] for r in cur)
+        return out
+
+    @timed("tbed_store_query_seconds", op="get_latest_execution")
     def get_latest_execution(self, tx_id: str) -> Optional[sqlite3.Row]:
         with self._conn() as conn:
             cur = conn.execute(
-                "SELECT * FROM executions WHERE tx_id = ? ORDER BY attempt DESC LIMIT 1",
+                "SELECT * FROM executions_v WHERE tx_id = ? ORDER BY attempt DESC LIMIT 1",
                 (tx_id,),
             )
             return cur.fetchone()
 
+    def _pages(
+        self,
+        op: str,
+        sql: str,
+        params: Sequence,
+        key: Sequence[str],
+        after: str,
+        page_size: int,
+    ) -> Iterator[sqlite3.Row]:
+        """
+        Keyset pagination: sql (which ends in ORDER BY the key columns) runs once per page
+        with after (a "(k1, k2) > (?, ?)" predicate over the key) added from the second
+        page on. Each page is its own short read, so no transaction stays open between
+        pages and memory is bounded by page_size.
+        """
+        last: Optional[tuple] = None
+        while True:
+            with self.metrics.timer("tbed_store_query_seconds", op=op):
+                with self._conn() as conn:
+                    q = sql.replace("{after}", "1" if last is None else after)
+                    rows = conn.execute(q + " LIMIT ?", (*params, *(last or ()), page_size)).fetchall()
+            yield from rows
+            if len(rows) < page_size:
+                return
+            last = tuple(rows[-1][k] for k in key)
+
+    def iter_executions_older_than(self, cutoff_ts: int, page_size: int = PAGE_SIZE) -> Iterator[sqlite3.Row]:
+        """
+        executions_v rows with executed_at <= cutoff_ts, oldest first (ties in id order).
+        """
+        return self._pages(
+            "iter_executions_older_than",
+            "SELECT * FROM executions_v WHERE executed_at <= ? AND {after} ORDER BY executed_at, id",
+            (cutoff_ts,), ("executed_at", "id"), "(executed_at, id) > (?, ?)", page_size,
+        )
+
+    @timed("tbed_store_query_seconds", op="get_executions_older_than")
     def get_executions_older_than(self, cutoff_ts: int):
+        return list(self.iter_executions_older_than(cutoff_ts))
+
+    def iter_unanchored_executions(
+        self, cutoff_ts: int, local_anchors: bool = True, page_size: int = PAGE_SIZE
+    ) -> Iterator[sqlite3.Row]:
+        """
+        Streaming find_unanchored_executions(), paged by (executed_at, id) on the
+        (status, executed_at) index.
+        """
+        sql = UNANCHORED_EXECUTIONS_SQL if local_anchors else EXECUTED_WITH_PROOFS_SQL
+        return self._pages(
+            "iter_unanchored_executions",
+            sql + " AND e.executed_at <= ? AND {after} ORDER BY e.executed_at, e.id",
+            (cutoff_ts,), ("executed_at", "id"), "(e.executed_at, e.id) > (?, ?)", page_size,
+        )
+
+    @timed("tbed_store_query_seconds", op="find_unanchored_executions")
+    def find_unanchored_executions(self, cutoff_ts: int, local_anchors: bool = True) -> List[sqlite3.Row]:
+        """
+        EXECUTED rows with executed_at <= cutoff_ts that have no direct anchor, as one indexed
+        anti-join. See UNANCHORED_EXECUTIONS_SQL for batch-anchored rows.
+        With local_anchors=False every EXECUTED row is returned (EXECUTED_WITH_PROOFS_SQL),
+        for checking against an external backend.
+        """
+        return list(self.iter_unanchored_executions(cutoff_ts, local_anchors))
+
+    # ---- incremental watcher ----
+    @timed("tbed_store_query_seconds", op="get_watermark")
+    def get_watermark(self, name: str) -> Tuple[int, int]:
         with self._conn() as conn:
             cur = conn.execute(
-                "SELECT * FROM executions WHERE executed_at <= ? ORDER BY executed_at ASC",
-                (cutoff_ts,),
+                "SELECT last_execution_id, last_executed_at FROM watcher_state WHERE name = ?",
+                (name,),
             )
-            return list(cur.fetchall())
+            r = cur.fetchone()
+            return (0, 0) if r is None else (int(r[0]), int(r[1]))
 
-    def list_executed_commit_hashes(self) -> List[str]:
+    @timed("tbed_store_query_seconds", op="reconcile_since_watermark")
+    def reconcile_since_watermark(
+        self,
+        name: str,
+        cutoff_ts: int,
+        now: int,
+        is_missing: Callable[[sqlite3.Row], bool] = lambda e: True,
+        local_anchors: bool = True,
+        is_missing_many: Optional[Callable[[List[sqlite3.Row]], List[bool]]] = None,
+    ) -> List[sqlite3.Row]:
+        """
+        One incremental pass:
+        - examine only executions after the watermark that are now past the cutoff,
+        - record unanchored EXECUTED ones as open findings,
+        - resolve open findings whose anchor has since arrived,
+        - advance the watermark.
+        is_missing gets UNANCHORED_EXECUTIONS_SQL rows and decides whether batch proofs hold.
+        With local_anchors=False the local anchors table is ignored: is_missing gets
+        EXECUTED_WITH_PROOFS_SQL rows and alone decides (e.g. by asking an AnchorBackend).
+        is_missing_many, if given, replaces is_missing with one call over all rows (e.g. a
+        single AnchorBackend.contains_many).
+        Candidates are read and judged without holding the write lock; only recording the
+        result is a (short) write transaction, which gives up if another pass of the same
+        watcher advanced the watermark meanwhile.
+        The watermark stops before the first row still inside its deadline, so rows are
+        never skipped even if executed_at is not strictly monotonic in id.
+        Returns the newly opened findings.
+        """
+        conn = self._conn()
+        last_id, last_executed_at = self.get_watermark(name)
+        r = conn.execute(
+            "SELECT MIN(id) FROM executions WHERE id > ? AND executed_at > ?",
+            (last_id, cutoff_ts),
+        ).fetchone()
+        if r[0] is not None:
+            upper = int(r[0]) - 1
+        else:
+            upper = int(conn.execute("SELECT COALESCE(MAX(id), 0) FROM executions").fetchone()[0])
+        if upper > last_id:
+            # upper itself may be gone (compacted into the archive): take the last row still here
+            r = conn.execute(
+                "SELECT executed_at FROM executions WHERE id > ? AND id <= ? ORDER BY id DESC LIMIT 1",
+                (last_id, upper),
+            ).fetchone()
+            if r is not None:
+                last_executed_at = int(r[0])
+
+        candidates_sql = UNANCHORED_EXECUTIONS_SQL if local_anchors else EXECUTED_WITH_PROOFS_SQL
+        candidates = conn.execute(
+            candidates_sql + " AND e.id > ? AND e.id <= ? ORDER BY e.id ASC",
+            (last_id, upper),
+        ).fetchall()
+        late = conn.execute(
+            f"""
+            SELECT f.commit_hash AS commit_blob, {hex_sql("f.commit_hash")} AS commit_hash,
+                   a.id IS NOT NULL AS direct, {hex_sql("p.root_hash")} AS root_hash, p.proof,
+                   ra.id IS NOT NULL AS root_anchored
+            FROM watcher_findings f
+            LEFT JOIN anchors a ON a.commit_hash = f.commit_hash
+            LEFT JOIN anchor_proofs p ON p.commit_hash = f.commit_hash
+            LEFT JOIN anchors ra ON ra.commit_hash = p.root_hash
+            WHERE f.resolved_at IS NULL
+            """ + ("AND (a.id IS NOT NULL OR ra.id IS NOT NULL)" if local_anchors else "")
+        ).fetchall()
+        if local_anchors:
+            resolved_direct = [f for f in late if f["direct"]]
+            late = [f for f in late if not f["direct"]]
+        else:
+            resolved_direct = []
+
+        # judged outside any transaction: is_missing may be a network round trip
+        rows = candidates + late
+        if is_missing_many is not None:
+            flags = is_missing_many(rows) if rows else []
+        else:
+            flags = [is_missing(e) for e in rows]
+        new = [e for e, missing in zip(candidates, flags) if missing]
+        resolved = resolved_direct + [f for f, missing in zip(late, flags[len(candidates):]) if not missing]
+
+        with conn:
+            conn.execute("BEGIN IMMEDIATE")
+            r = conn.execute("SELECT last_execution_id FROM watcher_state WHERE name = ?", (name,)).fetchone()
+            if (0 if r is None else int(r[0])) != last_id:
+                # another pass of this watcher got there first; its results stand
+                return []
+            conn.executemany(
+                """
+                INSERT OR IGNORE INTO watcher_findings (commit_hash, tx_id, executed_at, detected_at)
+                VALUES (?, ?, ?, ?)
+                """,
+                [(hash_to_db(e["commit_hash"]), e["tx_id"], e["executed_at"], now) for e in new],
+            )
+            conn.executemany(
+                "UPDATE watcher_findings SET resolved_at = ? WHERE commit_hash = ? AND resolved_at IS NULL",
+                [(now, f["commit_blob"]) for f in resolved],
+            )
+            conn.execute(
+                """
+                INSERT INTO watcher_state (name, last_execution_id, last_executed_at) VALUES (?, ?, ?)
+                ON CONFLICT(name) DO UPDATE SET
+                  last_execution_id = excluded.last_execution_id,
+                  last_executed_at = excluded.last_executed_at
+                """,
+                (name, max(upper, last_id), last_executed_at),
+            )
+            return new
+
+    @timed("tbed_store_query_seconds", op="list_open_findings")
+    def list_open_findings(self) -> List[sqlite3.Row]:
         with self._conn() as conn:
             cur = conn.execute(
-                "SELECT commit_hash FROM executions WHERE status='EXECUTED' ORDER BY executed_at ASC"
+                f"""
+                SELECT {hex_sql("commit_hash")} AS commit_hash, tx_id, executed_at, detected_at
+                FROM watcher_findings
+                WHERE resolved_at IS NULL ORDER BY id ASC
+                """
             )
-            return [r["commit_hash"] for r in cur.fetchall()]
+            return list(cur.fetchall())
+
+    def iter_executed_commit_hashes(self, page_size: int = PAGE_SIZE) -> Iterator[str]:
+        rows = self._pages(
+            "iter_executed_commit_hashes",
+            f"SELECT id, executed_at, {hex_sql('commit_hash')} AS commit_hash FROM executions "
+            f"WHERE status = ? AND {{after}} ORDER BY executed_at, id",
+            (STATUS_CODES["EXECUTED"],), ("executed_at", "id"), "(executed_at, id) > (?, ?)", page_size,
+        )
+        return (r["commit_hash"] for r in rows)
+
+    @timed("tbed_store_query_seconds", op="list_executed_commit_hashes")
+    def list_executed_commit_hashes(self) -> List[str]:
+        return list(self.iter_executed_commit_hashes())
+
+    # ---- anchor queue ----
+    @timed("tbed_store_query_seconds", op="claim_anchor_work")
+    def claim_anchor_work(
+        self, owner: str, now: float, lease_seconds: float, limit: Optional[int] = None, after_id: int = 0
+    ) -> List[Tuple[int, str]]:
+        """
+        Leases up to limit queued commits with queue id > after_id (oldest first) whose lease
+        has expired or was never taken, to owner until now + lease_seconds. Returns
+        (queue id, commit_hash) pairs. Anchoring a commit removes it from the queue; a commit
+        whose worker dies or stalls becomes claimable again once its lease runs out, so
+        several workers (threads or processes) can share the queue. Holders of long work
+        keep their leases with renew_anchor_leases().
+        """
+        return self._write(self._op_claim_anchor_work, (owner, now, lease_seconds, limit, after_id))
+
+    def _op_claim_anchor_work(
+        self,
+        conn: sqlite3.Connection,
+        owner: str,
+        now: float,
+        lease_seconds: float,
+        limit: Optional[int],
+        after_id: int,
+    ):
+        rows = conn.execute(
+            f"SELECT id, {hex_sql('commit_hash')} AS commit_hash, lease_owner FROM anchor_queue "
+            "WHERE id > ? AND lease_until <= ? ORDER BY id LIMIT ?",
+            (after_id, now, -1 if limit is None else limit),
+        ).fetchall()
+        conn.executemany(
+            "UPDATE anchor_queue SET lease_owner = ?, lease_until = ?, claims = claims + 1 WHERE id = ?",
+            [(owner, now + lease_seconds, r["id"]) for r in rows],
+        )
+        expired = sum(r["lease_owner"] is not None for r in rows)
+        after = (lambda: self.metrics.inc("tbed_anchor_queue_expired_leases_total", expired)) if expired else None
+        return [(r["id"], r["commit_hash"]) for r in rows], after
+
+    @timed("tbed_store_query_seconds", op="renew_anchor_leases")
+    def renew_anchor_leases(self, owner: str, commit_hashes: Sequence[str], until: float) -> None:
+        """
+        Extends owner's leases on commit_hashes to until; leases already taken over are left alone.
+        """
+        self._write(self._op_update_anchor_queue, (
+            "UPDATE anchor_queue SET lease_until = ? WHERE commit_hash = ? AND lease_owner = ?",
+            [(until, hash_to_db(c), owner) for c in commit_hashes],
+        ))
+
+    @timed("tbed_store_query_seconds", op="release_anchor_work")
+    def release_anchor_work(self, owner: str, commit_hashes: Sequence[str]) -> None:
+        """
+        Hands commits leased by owner back to the queue right away (e.g. after a failed call).
+        """
+        self._write(self._op_update_anchor_queue, (
+            "UPDATE anchor_queue SET lease_owner = NULL, lease_until = 0 WHERE commit_hash = ? AND lease_owner = ?",
+            [(hash_to_db(c), owner) for c in commit_hashes],
+        ))
+
+    @timed("tbed_store_query_seconds", op="ack_anchor_work")
+    def ack_anchor_work(self, commit_hashes: Sequence[str]) -> None:
+        """
+        Drops commits from the queue without anchoring them (insert_anchor* does this itself).
+        """
+        self._write(self._op_update_anchor_queue, (
+            "DELETE FROM anchor_queue WHERE commit_hash = ?", [(hash_to_db(c),) for c in commit_hashes],
+        ))
+
+    @staticmethod
+    def _op_update_anchor_queue(conn: sqlite3.Connection, sql: str, params: List[tuple]):
+        conn.executemany(sql, params)
+        return None, None
+
+    @timed("tbed_store_query_seconds", op="anchor_queue_depth")
+    def anchor_queue_depth(self) -> int:
+        with self._conn() as conn:
+            return int(conn.execute("SELECT COUNT(*) FROM anchor_queue").fetchone()[0])
 
     # ---- anchors ----
+    @timed("tbed_store_query_seconds", op="insert_anchor")
     def insert_anchor(self, commit_hash: str, anchored_at: int, backend: str) -> None:
+        self._write(self._op_insert_anchor, (commit_hash, anchored_at, backend))
+
+    def _after_anchors(self, keys: List[bytes], commits: List[str], skipped: int = 0):
+        # metrics are counted here, after commit: a group that rolls back reruns its ops
+        def after() -> None:
+            if skipped:
+                self.metrics.inc("tbed_anchor_duplicates_skipped_total", skipped)
+            if self._anchor_index is not None:
+                self._anchor_index.add_many(keys)
+            if self._listeners and commits:
+                self._notify("on_anchors", commits)
+        return after
+
+    @staticmethod
+    def _already_anchored(conn: sqlite3.Connection, keys: Sequence) -> Set:
+        """
+        The keys that are anchored directly or by an anchored batch root.
+        """
+        out: Set = set()
+        for i in range(0, len(keys), IN_CHUNK):
+            chunk = keys[i:i + IN_CHUNK]
+            marks = ",".join("?" * len(chunk))
+            out.update(r[0] for r in conn.execute(
+                f"""
+                SELECT commit_hash FROM anchors WHERE commit_hash IN ({marks})
+                UNION
+                SELECT p.commit_hash FROM anchor_proofs p JOIN anchors a ON a.commit_hash = p.root_hash
+                WHERE p.commit_hash IN ({marks})
+                """,
+                (*chunk, *chunk),
+            ))
+        return out
+
+    def _op_insert_anchor(self, conn: sqlite3.Connection, commit_hash: str, anchored_at: int, backend: str):
+        # anchored meanwhile by a worker that took over an expired lease: nothing to add
+        c = hash_to_db(commit_hash)
+        if self._already_anchored(conn, [c]):
+            conn.execute("DELETE FROM anchor_queue WHERE commit_hash = ?", (c,))
+            return None, self._after_anchors([], [], skipped=1)
+        conn.execute(
+            "INSERT INTO anchors (commit_hash, anchored_at, backend) VALUES (?, ?, ?)",
+            (c, anchored_at, backend),
+        )
+        conn.execute("DELETE FROM anchor_queue WHERE commit_hash = ?", (c,))
+        return None, self._after_anchors([c], [commit_hash])
+
+    @timed("tbed_store_query_seconds", op="insert_anchor_batch")
+    def insert_anchor_batch(
+        self,
+        root_hash: str,
+        anchored_at: int,
+        backend: str,
+        proofs: Sequence[Tuple[str, int, bytes]],
+    ) -> None:
+        """
+        Anchors a Merkle root and stores (commit_hash, leaf_index, encoded proof) for each
+        covered commit, in one transaction.
+        """
+        self._write(self._op_insert_anchor_batch, (root_hash, anchored_at, backend, proofs), 1 + len(proofs))
+
+    def _op_insert_anchor_batch(self, conn: sqlite3.Connection, root_hash: str, anchored_at: int, backend: str, proofs):
+        root = hash_to_db(root_hash)
+        params = [(hash_to_db(c), root, i, proof) for c, i, proof in proofs]
+        # members anchored meanwhile (lost lease) keep their existing anchor; the root still
+        # proves the rest, and is not recorded at all if it covers nothing new
+        done = self._already_anchored(conn, [p[0] for p in params])
+        if done:
+            conn.executemany("DELETE FROM anchor_queue WHERE commit_hash = ?", [(c,) for c in done])
+            proofs = [pr for pr, p in zip(proofs, params) if p[0] not in done]
+            params = [p for p in params if p[0] not in done]
+            if not params:
+                return None, self._after_anchors([], [], skipped=len(done))
+        conn.execute(
+            "INSERT INTO anchors (commit_hash, anchored_at, backend) VALUES (?, ?, ?)",
+            (root, anchored_at, backend),
+        )
+        conn.executemany(
+            "INSERT INTO anchor_proofs (commit_hash, root_hash, leaf_index, proof) VALUES (?, ?, ?, ?)",
+            params,
+        )
+        conn.executemany("DELETE FROM anchor_queue WHERE commit_hash = ?", [(p[0],) for p in params])
+        return None, self._after_anchors(
+            [root] + [p[0] for p in params], [c for c, _, _ in proofs], skipped=len(done)
+        )
+
+    def refresh_anchor_index(self) -> int:
+        """
+        Adds anchors (and proof-covered commits) written since the last refresh, e.g. by
+        another process. Returns the number of keys added.
+        """
+        if self._anchor_index is None:
+            return 0
         with self._conn() as conn:
-            conn.execute(
-                "INSERT INTO anchors (commit_hash, anchored_at, backend) VALUES (?, ?, ?)",
-                (commit_hash, anchored_at, backend),
-            )
+            last = self._anchor_index_last_id
+            top = conn.execute("SELECT COALESCE(MAX(id), 0) FROM anchors").fetchone()[0]
+            if top <= last:
+                return 0
+            keys = [
+                r[0]
+                for r in conn.execute(
+                    """
+                    SELECT commit_hash FROM anchors WHERE id > ? AND id <= ?
+                    UNION ALL
+                    SELECT p.commit_hash FROM anchor_proofs p JOIN anchors a ON a.commit_hash = p.root_hash
+                    WHERE a.id > ? AND a.id <= ?
+                    """,
+                    (last, top, last, top),
+                )
+            ]
+        self._anchor_index.add_many(keys)
+        self._anchor_index_last_id = top
+        return len(keys)
+
+    @timed("tbed_store_query_seconds", op="is_anchored")
+    def is_anchored(self, commit_hash: str, fresh: bool = False) -> bool:
+        """
+        Anchored directly, or covered by a stored proof whose root is anchored, or the
+        executed commit of an archived transaction. Proofs are not verified here; that is
+        the Watcher's job.
 
-    def is_anchored(self, commit_hash: str) -> bool:
+        Answered from the in-memory index when there is one; fresh=True re-checks the
+        database before reporting a commit as unanchored.
+        """
+        c = hash_to_db(commit_hash)
+        if self._anchor_index is not None:
+            known = self._anchor_index.lookup(c)
+            if known or (known is False and not fresh):
+                return known
         with self._conn() as conn:
             cur = conn.execute(
-                "SELECT 1 FROM anchors WHERE commit_hash = ? LIMIT 1",
-                (commit_hash,),
+                """
+                SELECT 1 FROM anchors WHERE commit_hash = ?
+                UNION ALL
+                SELECT 1 FROM anchor_proofs p JOIN anchors a ON a.commit_hash = p.root_hash
+                WHERE p.commit_hash = ?
+                UNION ALL
+                SELECT 1 FROM tx_state WHERE archived_upto > 0 AND commit_hash = ?
+                LIMIT 1
+                """,
+                (c, c, c),
             )
-            return cur.fetchone() is not None
+            found = cur.fetchone() is not None
+        if found and self._anchor_index is not None:
+            self._anchor_index.add(c)
+        return found
 
-    def list_anchors(self):
+    @timed("tbed_store_query_seconds", op="anchored_at")
+    def anchored_at(self, commit_hash: str) -> Optional[int]:
+        """
+        When the commit's own anchor, or the anchor of the root covering it, was written.
+        """
+        c = hash_to_db(commit_hash)
         with self._conn() as conn:
-            cur = conn.execute("SELECT * FROM anchors ORDER BY anchored_at ASC")
-            return list(cur.fetchall())
-    def dump_executions(self):
+            r = conn.execute(
+                """
+                SELECT anchored_at FROM anchors WHERE commit_hash = ?
+                UNION ALL
+                SELECT a.anchored_at FROM anchor_proofs p JOIN anchors a ON a.commit_hash = p.root_hash
+                WHERE p.commit_hash = ?
+                LIMIT 1
+                """,
+                (c, c),
+            ).fetchone()
+            return None if r is None else int(r[0])
+
+    @timed("tbed_store_query_seconds", op="get_anchor_proof")
+    def get_anchor_proof(self, commit_hash: str) -> Optional[sqlite3.Row]:
         with self._conn() as conn:
             cur = conn.execute(
-                "SELECT tx_id, attempt, status, reason, commit_hash, executed_at FROM executions ORDER BY tx_id, attempt"
+                f"""
+                SELECT {hex_sql("commit_hash")} AS commit_hash, {hex_sql("root_hash")} AS root_hash,
+                       leaf_index, proof
+                FROM anchor_proofs WHERE commit_hash = ?
+                """,
+                (hash_to_db(commit_hash),),
             )
-            return list(cur.fetchall())
+            return cur.fetchone()
+
+    def iter_anchors(self, page_size: int = PAGE_SIZE) -> Iterator[sqlite3.Row]:
+        """
+        anchors_v rows, oldest anchored_at first (ties in id order).
+        """
+        return self._pages(
+            "iter_anchors",
+            "SELECT * FROM anchors_v WHERE {after} ORDER BY anchored_at, id",
+            (), ("anchored_at", "id"), "(anchored_at, id) > (?, ?)", page_size,
+        )
 
+    @timed("tbed_store_query_seconds", op="list_anchors")
+    def list_anchors(self):
+        return list(self.iter_anchors())
+
+    def iter_dump_executions(self, page_size: int = PAGE_SIZE) -> Iterator[sqlite3.Row]:
+        """
+        dump_executions() rows, paged by (tx_id, attempt) on the UNIQUE(tx_id, attempt) index.
+        """
+        return self._pages(
+            "iter_dump_executions",
+            "SELECT tx_id, attempt, status, reason, commit_hash, executed_at FROM executions_v "
+            "WHERE {after} ORDER BY tx_id, attempt",
+            (), ("tx_id", "attempt"), "(tx_id, attempt) > (?, ?)", page_size,
+        )
+
+    @timed("tbed_store_query_seconds", op="dump_executions")
+    def dump_executions(self):
+        return list(self.iter_dump_executions())
+
+    def iter_dump_anchors(self, page_size: int = PAGE_SIZE) -> Iterator[sqlite3.Row]:
+        """
+        dump_anchors() rows (commit_hash, anchored_at, backend), oldest anchored_at first,
+        paged by (anchored_at, commit_hash): commit_hash is UNIQUE, so no id is needed.
+        """
+        return self._pages(
+            "iter_dump_anchors",
+            "SELECT commit_hash, anchored_at, backend FROM anchors_v WHERE {after} ORDER BY anchored_at, commit_hash",
+            (), ("anchored_at", "commit_hash"), "(anchored_at, commit_hash) > (?, ?)", page_size,
+        )
+
+    @timed("tbed_store_query_seconds", op="dump_anchors")
     def dump_anchors(self):
-        with self._conn() as conn:
-            cur = conn.execute(
-                "SELECT commit_hash, anchored_at, backend FROM anchors ORDER BY anchored_at"
-            )
-            return list(cur.fetchall())
+        return list(self.iter_dump_anchors())
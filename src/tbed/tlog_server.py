@@ -0,0 +1,136 @@
+"""
+Stand-in transparency-log server for HttpAnchorBackend, backed by a SegmentLogBackend.
+HTTP/1.1 with keep-alive, one thread per connection.
+
+POST /entries skips hashes the log already holds, so a client that lost the response
+can resend the same batch without anchoring anything twice.
+
+    python -m src.tbed.tlog_server --dir tlog --port 8787
+    AnchorWorker(store, cfg, backend=HttpAnchorBackend("http://127.0.0.1:8787"))
+
+    POST /entries   {"entries": [[hash_hex, anchored_at], ...]} -> {"size": n, "appended": k}
+    GET  /entries/<hash_hex>                                    -> 200 / 404
+    POST /contains  {"hashes": [...]}                           -> {"present": [...]}
+    GET  /size                                                  -> {"size": n}
+    POST /ranges      {"prefixes": [hex_prefix, ...]} -> {"summaries": {prefix: [count, digest]}}
+    POST /ranges/keys {"prefixes": [hex_prefix, ...]} -> {"keys": {prefix: [hash_hex, ...]}}
+"""
+import argparse
+import json
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Any, Dict, Optional, Tuple
+
+from .backends import SegmentLogBackend
+
+
+class _Handler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    server: "TransparencyLogServer"
+
+    def _send(self, status: int, body: Dict[str, Any]) -> None:
+        data = json.dumps(body).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def _body(self) -> Dict[str, Any]:
+        n = int(self.headers.get("Content-Length") or 0)
+        return json.loads(self.rfile.read(n)) if n else {}
+
+    def do_GET(self) -> None:
+        log = self.server.log
+        if self.path == "/size":
+            self._send(200, {"size": len(log)})
+        elif self.path.startswith("/entries/"):
+            h = self.path[len("/entries/"):]
+            self._send(200 if log.contains(h) else 404, {"hash": h})
+        else:
+            self._send(404, {"error": "not found"})
+
+    def do_POST(self) -> None:
+        log = self.server.log
+        try:
+            body = self._body()
+            if self.path == "/entries":
+                entries = [(str(h), int(ts)) for h, ts in body["entries"]]
+                with self.server.append_lock:
+                    seen = log.contains_many([h for h, _ in entries])
+                    fresh = []
+                    for h, ts in entries:
+                        if h not in seen:
+                            seen.add(h)
+                            fresh.append((h, ts))
+                    if fresh:
+                        log.append(fresh)
+                    size = len(log)
+                self._send(200, {"size": size, "appended": len(fresh)})
+            elif self.path == "/contains":
+                self._send(200, {"present": sorted(log.contains_many(body["hashes"]))})
+            elif self.path == "/ranges":
+                self._send(200, {"summaries": log.range_summaries(body["prefixes"])})
+            elif self.path == "/ranges/keys":
+                self._send(200, {"keys": log.range_keys(body["prefixes"])})
+            else:
+                self._send(404, {"error": "not found"})
+        except (KeyError, TypeError, ValueError) as e:
+            self._send(400, {"error": repr(e)})
+
+    def log_message(self, format: str, *args: Any) -> None:
+        pass
+
+
+class TransparencyLogServer(ThreadingHTTPServer):
+    daemon_threads = True
+
+    def __init__(self, log: SegmentLogBackend, address: Tuple[str, int] = ("127.0.0.1", 0)):
+        super().__init__(address, _Handler)
+        self.log = log
+        # dedupe and append as one step, or two connections could both add a hash
+        self.append_lock = threading.Lock()
+        self._thread: Optional[threading.Thread] = None
+
+    @property
+    def url(self) -> str:
+        host, port = self.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def start(self) -> "TransparencyLogServer":
+        """
+        Serves from a background thread (tests, benchmarks, simulate --anchor-backend http).
+        """
+        self._thread = threading.Thread(target=self.serve_forever, name="tlog-server", daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self) -> None:
+        self.shutdown()
+        self.server_close()
+        if self._thread is not None:
+            self._thread.join()
+        self.log.close()
+
+
+def main():
+    ap = argparse.ArgumentParser(description="Run the stand-in transparency log")
+    ap.add_argument("--dir", default="tlog", help="segment log directory")
+    ap.add_argument("--host", default="127.0.0.1")
+    ap.add_argument("--port", type=int, default=8787)
+    ap.add_argument("--sync-every", type=int, default=1, help="fsync every N appends (0 = on shutdown only)")
+    args = ap.parse_args()
+
+    server = TransparencyLogServer(SegmentLogBackend(args.dir, sync_every=args.sync_every), (args.host, args.port))
+    print(f"tlog serving {args.dir} on {server.url}")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+        server.log.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -1,39 +1,272 @@
-import time
+import asyncio
+import heapq
+import threading
 from dataclasses import dataclass
-from typing import List, Dict, Any
+from typing import AsyncIterator, Callable, Dict, Any, Iterator, List, Optional, Sequence, Tuple
 
-from .storage import Store
+from .backends import AnchorBackend, SqliteAnchorBackend
+from .clock import Clock, SYSTEM_CLOCK
+from .metrics import METRICS, Metrics, timed
+from .merkle import decode_proof, verify_proof
+from .reconcile import ReconcileResult, anchor_keys, reconcile
+from .storage import PAGE_SIZE, Store
 
 
 @dataclass
 class WatcherConfig:
     anchor_deadline_seconds: int = 5
+    # incremental: only report newly eligible executions, tracked by a persisted watermark
+    incremental: bool = False
+    name: str = "default"
 
 
 class Watcher:
-    def __init__(self, store: Store, cfg: WatcherConfig):
+    """
+    With an external backend (anything but SqliteAnchorBackend) a commit counts as anchored
+    only if the backend holds it, or holds the root its verified inclusion proof leads to;
+    the local anchors table is not trusted.
+
+    If the backend supports range digests, a full pass reconciles the local anchors table
+    against it (see reconcile.py) and only the hashes that differ cross the boundary;
+    otherwise every EXECUTED commit is looked up in pages.
+    """
+    def __init__(
+        self,
+        store: Store,
+        cfg: WatcherConfig,
+        clock: Optional[Clock] = None,
+        metrics: Optional[Metrics] = None,
+        backend: Optional[AnchorBackend] = None,
+    ):
         self.store = store
         self.cfg = cfg
+        self.clock = clock or SYSTEM_CLOCK
+        self.metrics = metrics or METRICS
+        self.backend = None if isinstance(backend, SqliteAnchorBackend) else backend
+        self.last_reconcile: Optional[ReconcileResult] = None
 
+    @timed("tbed_stage_seconds", stage="watcher_pass")
     def find_missing_anchors(self) -> List[Dict[str, Any]]:
-        now = int(time.time())
+        now = int(self.clock.time())
         cutoff = now - self.cfg.anchor_deadline_seconds
 
-        old_execs = self.store.get_executions_older_than(cutoff)
+        if self.backend is not None:
+            rows = self._missing_in_backend(cutoff, now)
+        elif self.cfg.incremental:
+            rows = self.store.reconcile_since_watermark(self.cfg.name, cutoff, now, self._proof_missing)
+        else:
+            rows = [e for e in self.store.iter_unanchored_executions(cutoff) if self._proof_missing(e)]
+        self.metrics.inc("tbed_watcher_findings_total", len(rows))
+        return [self._finding(e, now) for e in rows]
+
+    def _missing_in_backend(self, cutoff: int, now: int) -> List[Any]:
+        if self.cfg.incremental:
+            return self.store.reconcile_since_watermark(
+                self.cfg.name, cutoff, now, local_anchors=False, is_missing_many=self._rows_missing,
+            )
+        if self.backend.supports_ranges:
+            return self._missing_by_ranges(cutoff)
         missing = []
-        for e in old_execs:
-            if e["status"] != "EXECUTED":
+        page: List[Any] = []
+        # one batched lookup per page (a single round trip for HttpAnchorBackend)
+        for e in self.store.iter_unanchored_executions(cutoff, local_anchors=False):
+            page.append(e)
+            if len(page) >= PAGE_SIZE:
+                missing.extend(self._page_missing(page))
+                page = []
+        missing.extend(self._page_missing(page))
+        return missing
+
+    def _page_missing(self, rows: List[Any]) -> List[Any]:
+        return [e for e, missing in zip(rows, self._rows_missing(rows)) if missing]
+
+    def _rows_missing(self, rows: List[Any]) -> List[bool]:
+        if not rows:
+            return []
+        # one batched lookup (a single round trip for HttpAnchorBackend)
+        present = self.backend.contains_many(
+            {e["commit_hash"] for e in rows} | {e["root_hash"] for e in rows if e["root_hash"]}
+        )
+        return [self._backend_missing(e, present.__contains__) for e in rows]
+
+    def _missing_by_ranges(self, cutoff: int) -> List[Any]:
+        # backend contents = local anchors table - only_local + only_remote
+        local = anchor_keys(self.store)
+        res = reconcile(local, self.backend)
+        self.last_reconcile = res
+        self.metrics.inc("tbed_reconcile_summaries_total", res.summaries)
+        self.metrics.inc("tbed_reconcile_keys_total", res.keys)
+
+        def has(h: str) -> bool:
+            return h in res.only_remote or (h in local and h not in res.only_local)
+
+        return [e for e in self.store.iter_unanchored_executions(cutoff, local_anchors=False)
+                if self._backend_missing(e, has)]
+
+    def _backend_missing(self, e, has: Callable[[str], bool]) -> bool:
+        if has(e["commit_hash"]):
+            return False
+        if e["root_hash"] is None:
+            return True
+        if not verify_proof(e["commit_hash"], decode_proof(e["proof"]), e["root_hash"]):
+            return True
+        return not has(e["root_hash"])
+
+    @staticmethod
+    def _proof_missing(e) -> bool:
+        """
+        For a commit without a direct anchor: anchored only if its inclusion proof
+        verifies against a root that is itself anchored.
+        """
+        if not e["root_anchored"]:
+            return True
+        return not verify_proof(e["commit_hash"], decode_proof(e["proof"]), e["root_hash"])
+
+    def open_findings(self) -> List[Dict[str, Any]]:
+        """
+        Findings recorded by incremental passes that no late anchor has resolved yet.
+        """
+        now = int(self.clock.time())
+        return [self._finding(e, now) for e in self.store.list_open_findings()]
+
+    @staticmethod
+    def _finding(e, now: int) -> Dict[str, Any]:
+        return {
+            "tx_id": e["tx_id"],
+            "commit_hash": e["commit_hash"],
+            "executed_at": e["executed_at"],
+            "age_seconds": now - e["executed_at"],
+            "problem": "MISSING_ANCHOR_AFTER_DEADLINE",
+        }
+
+
+class DeadlineWatcher:
+    """
+    Event-driven watcher. Every EXECUTED commit is registered in a deadline heap when it is
+    written, cancelled when its anchor is inserted, and reported as
+    MISSING_ANCHOR_AFTER_DEADLINE as soon as its deadline expires, instead of rescanning
+    history on a polling interval.
+
+    It subscribes to the Store's write hooks, so only writes through that Store instance are
+    seen live; on startup it loads every still-unanchored EXECUTED commit from the database.
+    Each expiry is confirmed against the Store (and batch proofs verified) before it is
+    reported, so an anchor written elsewhere is never misreported.
+
+    poll() does not wait for deadlines (use it with a VirtualClock/EventScheduler) but does
+    query the Store; stream() and astream() block until the next deadline on the system
+    clock, astream() running poll() in a worker thread.
+    """
+    def __init__(
+        self,
+        store: Store,
+        cfg: WatcherConfig,
+        clock: Optional[Clock] = None,
+        metrics: Optional[Metrics] = None,
+    ):
+        self.store = store
+        self.cfg = cfg
+        self.clock = clock or SYSTEM_CLOCK
+        self.metrics = metrics or METRICS
+        # (due, commit_hash); cancelled entries stay in the heap until they surface
+        self._heap: List[Tuple[float, str]] = []
+        self._live: Dict[str, Tuple[str, int]] = {}  # commit_hash -> (tx_id, executed_at)
+        self._cond = threading.Condition()
+
+        store.add_listener(self)
+        for e in store.iter_unanchored_executions(2 ** 62):
+            if Watcher._proof_missing(e):
+                self.register(e["tx_id"], e["commit_hash"], e["executed_at"])
+
+    def close(self) -> None:
+        self.store.remove_listener(self)
+
+    def __len__(self) -> int:
+        return len(self._live)
+
+    # ---- Store hooks ----
+    def on_executions(self, rows: Sequence[tuple]) -> None:
+        for tx_id, _attempt, commit_hash, _ph, _decided_at, executed_at, status, _reason in rows:
+            if status == "EXECUTED":
+                self.register(tx_id, commit_hash, executed_at)
+
+    def on_anchors(self, commit_hashes: Sequence[str]) -> None:
+        for c in commit_hashes:
+            self.cancel(c)
+
+    # ---- registry ----
+    def register(self, tx_id: str, commit_hash: str, executed_at: int) -> None:
+        with self._cond:
+            self._live[commit_hash] = (tx_id, executed_at)
+            heapq.heappush(self._heap, (executed_at + self.cfg.anchor_deadline_seconds, commit_hash))
+            self._cond.notify_all()
+
+    def cancel(self, commit_hash: str) -> None:
+        with self._cond:
+            self._live.pop(commit_hash, None)
+
+    def next_deadline(self) -> Optional[float]:
+        with self._cond:
+            while self._heap and self._heap[0][1] not in self._live:
+                heapq.heappop(self._heap)
+            return self._heap[0][0] if self._heap else None
+
+    def _still_missing(self, commit_hash: str) -> bool:
+        # a finding is reported from here, so never trust a negative from the memory index
+        if not self.store.is_anchored(commit_hash, fresh=True):
+            return True
+        p = self.store.get_anchor_proof(commit_hash)
+        if p is None:
+            return False
+        return not verify_proof(commit_hash, decode_proof(p["proof"]), p["root_hash"])
+
+    def poll(self) -> List[Dict[str, Any]]:
+        """
+        Findings whose deadline has passed, each reported once.
+        """
+        now = self.clock.time()
+        expired = []
+        with self._cond:
+            while self._heap and self._heap[0][0] <= now:
+                due, c = heapq.heappop(self._heap)
+                entry = self._live.pop(c, None)
+                if entry is not None:
+                    expired.append((due, c, entry))
+
+        findings = []
+        for due, c, (tx_id, executed_at) in expired:
+            if not self._still_missing(c):
                 continue
+            self.metrics.observe("tbed_deadline_detection_lag_seconds", max(0.0, now - due))
+            findings.append(Watcher._finding(
+                {"tx_id": tx_id, "commit_hash": c, "executed_at": executed_at}, int(now)
+            ))
+        if findings:
+            self.metrics.inc("tbed_watcher_findings_total", len(findings))
+        return findings
 
-            ch = e["commit_hash"]
-            if not self.store.is_anchored(ch):
-                missing.append(
-                    {
-                        "tx_id": e["tx_id"],
-                        "commit_hash": ch,
-                        "executed_at": e["executed_at"],
-                        "age_seconds": now - e["executed_at"],
-                        "problem": "MISSING_ANCHOR_AFTER_DEADLINE",
-                    }
-                )
-        return missing
+    def _idle_wait(self) -> float:
+        # a commit registered from now on cannot fall due sooner than one deadline away
+        due = self.next_deadline()
+        cap = max(0.001, float(self.cfg.anchor_deadline_seconds))
+        if due is None:
+            return cap
+        return min(cap, max(0.0, due - self.clock.time()))
+
+    def stream(self, stop: Optional[threading.Event] = None) -> Iterator[Dict[str, Any]]:
+        """
+        Blocking generator of findings, yielded as their deadlines expire.
+        """
+        while stop is None or not stop.is_set():
+            yield from self.poll()
+            with self._cond:
+                self._cond.wait(timeout=self._idle_wait())
+
+    async def astream(self, stop: Optional[asyncio.Event] = None) -> AsyncIterator[Dict[str, Any]]:
+        """
+        asyncio variant of stream().
+        """
+        while stop is None or not stop.is_set():
+            # poll() confirms each expiry against SQLite, so it stays off the event loop
+            for f in await asyncio.to_thread(self.poll):
+                yield f
+            await asyncio.sleep(self._idle_wait())
@@ -0,0 +1,54 @@
+import pytest
+
+from src.tbed.clock import VirtualClock
+from src.tbed.metrics import Metrics
+from src.tbed.services import DecisionService, ExecutionService
+from src.tbed.storage import Store
+
+T0 = 1_700_000_000
+
+
+@pytest.fixture
+def db_path(tmp_path):
+    return str(tmp_path / "tbed.sqlite")
+
+
+@pytest.fixture
+def clock():
+    return VirtualClock(start=T0)
+
+
+@pytest.fixture
+def metrics():
+    return Metrics(enabled=True)
+
+
+@pytest.fixture
+def store(db_path, metrics):
+    s = Store(db_path, metrics=metrics)
+    yield s
+    s.close()
+
+
+@pytest.fixture
+def decisions(clock):
+    ds = DecisionService(policy_version="policy-test", clock=clock)
+    yield ds
+    ds.close()
+
+
+@pytest.fixture
+def executions(store, decisions):
+    return ExecutionService(store=store, decision_service=decisions)
+
+
+@pytest.fixture
+def run_tx(decisions, executions):
+    """
+    run_tx("tx-1") decides and executes one transaction; returns (receipt, payload, outcome).
+    """
+    def run(tx_id, decision="APPROVE", payload=None):
+        payload = payload if payload is not None else {"tx": tx_id}
+        r = decisions.decide(tx_id=tx_id, payload=payload, decision=decision)
+        return r, payload, executions.execute(r, payload)
+    return run
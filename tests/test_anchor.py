@@ -0,0 +1,164 @@
+import threading
+import time
+from typing import Optional
+
+import pytest
+
+from src.tbed.anchor import AnchorConfig, AnchorWorker
+from src.tbed.backends import AnchorBackend
+
+
+class RecordingBackend(AnchorBackend):
+    """
+    Records calls and their peak concurrency; optionally slow, failing, or held at a gate.
+    """
+    name = "recording"
+
+    def __init__(self, delay: float = 0.0, fail: bool = False, gate: Optional[threading.Event] = None):
+        self.delay = delay
+        self.fail = fail
+        self.gate = gate
+        self.calls = []
+        self.active = 0
+        self.peak = 0
+        self._lock = threading.Lock()
+
+    def append(self, entries):
+        with self._lock:
+            self.calls.append(list(entries))
+            self.active += 1
+            self.peak = max(self.peak, self.active)
+        try:
+            if self.gate is not None:
+                self.gate.wait(5)
+            time.sleep(self.delay)
+            if self.fail:
+                raise RuntimeError("backend unavailable")
+        finally:
+            with self._lock:
+                self.active -= 1
+
+    def contains(self, hash_hex):
+        return any(h == hash_hex for call in self.calls for h, _ in call)
+
+
+def _executed(run_tx, n, prefix="tx"):
+    return [run_tx(f"{prefix}-{i}")[0].commit for i in range(n)]
+
+
+def test_concurrent_worker_anchors_everything_in_parallel(store, run_tx):
+    commits = _executed(run_tx, 12)
+    backend = RecordingBackend(delay=0.05)
+    worker = AnchorWorker(store, AnchorConfig(anchor_delay_seconds=0, max_in_flight=4), backend=backend)
+    try:
+        assert sorted(worker.run_once()) == sorted(commits)
+    finally:
+        worker.close()
+    assert 1 < backend.peak <= 4
+    assert len(backend.calls) == 12
+    assert store.anchor_queue_depth() == 0
+    assert all(store.is_anchored(c) for c in commits)
+
+
+def test_concurrent_worker_raises_backend_errors_and_keeps_the_work(store, run_tx):
+    commits = _executed(run_tx, 6)
+    backend = RecordingBackend(fail=True)
+    worker = AnchorWorker(store, AnchorConfig(anchor_delay_seconds=0, max_in_flight=3), backend=backend)
+    try:
+        with pytest.raises(RuntimeError, match="backend unavailable"):
+            worker.run_once()
+        assert store.anchor_queue_depth() == 6
+        # everything was handed back, so the next round can take it at once
+        backend.fail = False
+        assert sorted(worker.run_once()) == sorted(commits)
+    finally:
+        worker.close()
+
+
+def test_timed_out_call_is_abandoned_not_resubmitted(store, run_tx, metrics):
+    (commit,) = _executed(run_tx, 1)
+    gate = threading.Event()
+    backend = RecordingBackend(gate=gate)
+    cfg = AnchorConfig(anchor_delay_seconds=0, anchor_timeout_seconds=0.1, max_in_flight=2)
+    worker = AnchorWorker(store, cfg, backend=backend, metrics=metrics)
+    try:
+        started = time.monotonic()
+        assert worker.run_once() == []
+        assert time.monotonic() - started < 2
+        assert worker.run_once() == []  # still running: not submitted a second time
+        assert len(backend.calls) == 1
+        assert metrics.snapshot()["counters"]["tbed_anchor_timeouts_total"][0]["value"] == 1
+    finally:
+        gate.set()
+        worker.close()
+    # the abandoned call finished after its round, so the Store holds its anchor
+    assert store.is_anchored(commit)
+    assert store.anchor_queue_depth() == 0
+
+
+def test_queue_holds_executed_commits_and_leases_them_to_one_owner(store, clock, run_tx, metrics):
+    commits = _executed(run_tx, 3)
+    run_tx("rejected", decision="REJECT")
+    assert store.anchor_queue_depth() == 3
+
+    now = clock.time()
+    assert [c for _, c in store.claim_anchor_work("a", now, 30)] == commits
+    assert store.claim_anchor_work("b", now + 29, 30) == []
+    store.release_anchor_work("a", commits[:1])
+    assert [c for _, c in store.claim_anchor_work("b", now + 29, 30)] == commits[:1]
+    # a's remaining leases ran out: b takes them over
+    assert [c for _, c in store.claim_anchor_work("b", now + 31, 30)] == commits[1:]
+    assert metrics.snapshot()["counters"]["tbed_anchor_queue_expired_leases_total"][0]["value"] == 2
+
+
+def test_anchor_from_a_stalled_worker_is_skipped_after_takeover(store, clock, run_tx, metrics):
+    a, b = _executed(run_tx, 2)
+    now = int(clock.time())
+    store.claim_anchor_work("slow", now, 10)
+    store.claim_anchor_work("fast", now + 11, 10)
+    store.insert_anchor(commit_hash=a, anchored_at=now + 11, backend="fast")
+    # the stalled worker comes back with the same commit, alone and in a batch
+    store.insert_anchor(commit_hash=a, anchored_at=now + 12, backend="slow")
+    store.insert_anchor_batch(root_hash=b, anchored_at=now + 12, backend="slow", proofs=[(a, 0, b"")])
+    assert store.anchored_at(a) == now + 11
+    assert metrics.snapshot()["counters"]["tbed_anchor_duplicates_skipped_total"][0]["value"] == 2
+    assert store.anchor_queue_depth() == 1 and not store.is_anchored(b)
+
+
+class ClockAdvancingBackend(RecordingBackend):
+    """
+    Each call takes `seconds` of virtual time; meanwhile a rival worker tries to claim.
+    """
+    def __init__(self, store, clock, seconds):
+        super().__init__()
+        self.store, self.clock, self.seconds = store, clock, seconds
+        self.stolen = []
+
+    def append(self, entries):
+        super().append(entries)
+        self.clock.advance(self.seconds)
+        self.stolen += self.store.claim_anchor_work("rival", self.clock.time(), 10)
+
+
+def test_long_round_renews_its_leases(store, clock, run_tx, metrics):
+    commits = _executed(run_tx, 6)
+    backend = ClockAdvancingBackend(store, clock, seconds=4)
+    cfg = AnchorConfig(anchor_delay_seconds=0, lease_seconds=10)
+    worker = AnchorWorker(store, cfg, clock=clock, metrics=metrics, backend=backend)
+    try:
+        assert worker.run_once() == commits
+    finally:
+        worker.close()
+    assert backend.stolen == []
+    assert metrics.snapshot()["counters"]["tbed_anchor_lease_renewals_total"][0]["value"] >= 2
+
+
+def test_suppression_is_durable_across_workers(store, clock, run_tx):
+    commits = _executed(run_tx, 4)
+    suppressing = AnchorWorker(store, AnchorConfig(anchor_delay_seconds=0, failure_rate=1.0), clock=clock)
+    assert suppressing.run_once() == []
+    assert store.anchor_queue_depth() == 0
+
+    healthy = AnchorWorker(store, AnchorConfig(anchor_delay_seconds=0), clock=clock)
+    assert healthy.run_once() == []
+    assert not any(store.is_anchored(c) for c in commits)
@@ -0,0 +1,72 @@
+import hashlib
+
+from src.tbed.anchorindex import AnchoredIndex, BloomFilter
+from src.tbed.storage import Store
+
+
+def _keys(n, salt="k"):
+    return [hashlib.sha256(f"{salt}{i}".encode()).digest() for i in range(n)]
+
+
+def test_bloom_filter_has_no_false_negatives_and_few_false_positives():
+    bf = BloomFilter(capacity=1000, error_rate=0.01)
+    keys = _keys(1000)
+    for k in keys:
+        bf.add(k)
+    assert all(k in bf for k in keys)
+    false_positives = sum(k in bf for k in _keys(10000, salt="other"))
+    assert false_positives < 300
+
+
+def test_unbounded_index_answers_exactly():
+    idx = AnchoredIndex()
+    idx.add_many(_keys(100))
+    assert all(idx.lookup(k) is True for k in _keys(100))
+    assert all(idx.lookup(k) is False for k in _keys(100, salt="other"))
+
+
+def test_bounded_index_defers_to_the_database_for_evicted_keys():
+    idx = AnchoredIndex(expected=1000, max_exact=10)
+    keys = _keys(100)
+    idx.add_many(keys)
+    assert len(idx) == 10
+    assert idx.lookup(keys[-1]) is True
+    assert idx.lookup(keys[0]) is None  # evicted from the LRU, still in the filter
+    assert sum(idx.lookup(k) is False for k in _keys(1000, salt="other")) > 950
+
+
+def test_bounded_index_filter_grows_instead_of_saturating():
+    idx = AnchoredIndex(expected=100, max_exact=10)
+    keys = _keys(5000)
+    idx.add_many(keys)
+    idx.add_many(keys[:50])  # evicted keys coming back are not counted twice
+    assert len(idx) == 10
+    assert sum(b.count for b in idx._blooms) <= 5000
+    assert all(idx.lookup(k) is not False for k in keys)
+    # a single filter sized for 100 keys would answer "maybe" for nearly everything
+    false_positives = sum(idx.lookup(k) is not False for k in _keys(10000, salt="other"))
+    assert false_positives < 300
+
+
+def test_store_sees_anchors_from_another_store_after_refresh(db_path, store, run_tx):
+    r = run_tx("tx")[0]
+    assert not store.is_anchored(r.commit)
+    other = Store(db_path)
+    try:
+        other.insert_anchor(commit_hash=r.commit, anchored_at=1, backend="test")
+    finally:
+        other.close()
+    assert store.is_anchored(r.commit, fresh=True)
+    assert store.refresh_anchor_index() == 1
+    assert store.is_anchored(r.commit)
+
+
+def test_bounded_store_index_matches_the_database(db_path, run_tx):
+    s = Store(db_path, anchor_index_max_exact=4)
+    try:
+        commits = [run_tx(f"tx-{i}")[0].commit for i in range(20)]
+        for c in commits[:10]:
+            s.insert_anchor(commit_hash=c, anchored_at=1, backend="test")
+        assert [s.is_anchored(c) for c in commits] == [True] * 10 + [False] * 10
+    finally:
+        s.close()
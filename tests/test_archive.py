@@ -0,0 +1,144 @@
+import os
+import sqlite3
+import stat
+import time
+
+import pytest
+
+from src.tbed import archive
+from src.tbed.anchor import AnchorConfig, AnchorWorker
+from src.tbed.audit import run_audit
+from src.tbed.reconcile import anchor_keys
+from src.tbed.services import REASON_REPLAY
+from src.tbed.storage import Store
+from src.tbed.watcher import Watcher, WatcherConfig
+
+DAY = 86400
+
+
+@pytest.fixture
+def history(store, clock, run_tx):
+    """
+    Three days of anchored transactions (one rejected per day) and one executed commit
+    that never got its anchor. Returns (anchored receipts with payloads, unanchored receipt).
+    """
+    worker = AnchorWorker(store, AnchorConfig(anchor_delay_seconds=0, batch_size=2), clock=clock)
+    done = []
+    stray = None
+    for day in range(3):
+        for i in range(5):
+            r, payload, _ = run_tx(f"d{day}-{i}", decision="REJECT" if i == 4 else "APPROVE")
+            done.append((r, payload))
+        if day == 0:
+            stray = run_tx("stray")[0]
+            store.ack_anchor_work([stray.commit])  # suppressed: never anchored
+        worker.run_once()
+        clock.advance(DAY)
+    worker.close()
+    return done, stray
+
+
+def _compact(store, clock):
+    return archive.compact(store, int(clock.time()) - DAY)
+
+
+def test_compact_moves_reconciled_days_into_sealed_segments(store, clock, executions, history):
+    done, stray = history
+    segments = _compact(store, clock)
+    assert [s["executions"] for s in segments] == [5, 5]  # the last day is still inside the cutoff
+
+    for path in archive.segment_paths(store):
+        assert stat.S_IMODE(os.stat(path).st_mode) == 0o444
+    with store._conn() as conn:
+        live = {r[0] for r in conn.execute("SELECT tx_id FROM executions_v")}
+    assert live == {"stray"} | {f"d2-{i}" for i in range(5)}
+
+    rows = list(archive.iter_archive(store, "SELECT tx_id, status FROM executions_v WHERE tx_id = ?", ("d0-1",)))
+    assert [tuple(r) for r in rows] == [("d0-1", "EXECUTED")]
+    assert archive.verify_segments(store) == []
+
+    # tx_state stays live: an archived transaction still cannot run twice
+    r, payload = done[1]
+    assert executions.execute(r, payload).reason == REASON_REPLAY
+    assert store.is_anchored(r.commit)
+    assert not store.is_anchored(stray.commit)
+
+
+def test_archived_commits_stay_anchored_and_reconcilable(store, clock, history):
+    done, _ = history
+    before = anchor_keys(store).range_keys([""])[""]
+    _compact(store, clock)
+    assert anchor_keys(store).range_keys([""])[""] == before
+
+    fresh = Store(store.db_path)
+    try:
+        assert all(fresh.is_anchored(r.commit) for r, _ in done if r.decision == "APPROVE")
+    finally:
+        fresh.close()
+
+
+def test_audit_accounts_for_archived_attempts(tmp_path, store, clock, history):
+    _compact(store, clock)
+    store.flush()
+    report = run_audit(store.db_path, str(tmp_path / "audit"), workers=1, archive=True)
+    assert report["ok"], report["violations"]
+
+
+def test_tampered_segment_is_detected(store, clock, history):
+    _compact(store, clock)
+    path = archive.segment_paths(store)[0]
+    os.chmod(path, 0o644)
+    conn = sqlite3.connect(path)
+    conn.execute("UPDATE executions SET executed_at = 1 WHERE id = (SELECT min(id) FROM executions)")
+    conn.commit()
+    conn.close()
+    assert [b["problem"] for b in archive.verify_segments(store)] == ["digest mismatch"]
+
+    os.chmod(path, 0o644)
+    os.remove(path)
+    assert [b["problem"] for b in archive.verify_segments(store)] == ["missing"]
+
+
+def test_next_compaction_finishes_interrupted_renames_and_drops_orphans(store, clock, history):
+    (first, _) = _compact(store, clock)
+    archive_dir = archive.default_archive_dir(store.db_path)
+    final = os.path.join(archive_dir, first["path"])
+    # crash after the live delete committed but before the rename
+    os.replace(final, final + archive.TMP_SUFFIX)
+    # crash before the live delete: a sealed segment nobody registered
+    orphan = os.path.join(archive_dir, "1970-01-01-000000000001.sqlite")
+    open(orphan + archive.TMP_SUFFIX, "wb").close()
+    open(orphan, "wb").close()
+    # too young to be swept: another compactor may still be writing them
+    assert _compact(store, clock) == []
+    assert os.path.exists(orphan) and os.path.exists(final + archive.TMP_SUFFIX)
+
+    stale = time.time() - archive.SWEEP_GRACE_SECONDS - 1
+    for entry in os.listdir(archive_dir):
+        os.utime(os.path.join(archive_dir, entry), (stale, stale))
+    assert _compact(store, clock) == []
+    assert sorted(os.listdir(archive_dir)) == sorted(os.path.basename(p) for p in archive.segment_paths(store))
+    assert archive.verify_segments(store) == []
+
+
+def test_archived_anchor_hashes_read_each_segment_once(store, clock, history, monkeypatch):
+    _compact(store, clock)
+    first = list(archive.archived_anchor_hashes(store))
+    assert first
+
+    def no_open(path):
+        raise AssertionError(f"segment {path} re-read")
+
+    monkeypatch.setattr(archive, "_open_segment", no_open)
+    assert list(archive.archived_anchor_hashes(store)) == first
+
+
+def test_incremental_watcher_runs_over_compacted_history(store, clock, run_tx, history):
+    _, stray = history
+    archive.compact(store, int(clock.time()))  # every anchored day, so the newest ids are gone
+    fresh = run_tx("fresh")[0]  # inside its deadline: the watermark stops on a compacted id
+
+    w = Watcher(store, WatcherConfig(anchor_deadline_seconds=5, incremental=True), clock=clock)
+    assert [f["commit_hash"] for f in w.find_missing_anchors()] == [stray.commit]
+    clock.advance(10)
+    assert [f["commit_hash"] for f in w.find_missing_anchors()] == [fresh.commit]
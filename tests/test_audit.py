@@ -0,0 +1,82 @@
+import json
+import os
+import sqlite3
+
+import pytest
+
+from src.tbed import audit
+from src.tbed.anchor import AnchorConfig, AnchorWorker
+from src.tbed.services import REASON_REPLAY
+
+
+def _history(store, clock, run_tx):
+    for i in range(12):
+        _, _, outcome = run_tx(f"tx-{i}", decision="REJECT" if i % 4 == 0 else "APPROVE")
+        if i % 3 == 0 and outcome.status == "EXECUTED":
+            run_tx(f"tx-{i}")
+    worker = AnchorWorker(store, AnchorConfig(anchor_delay_seconds=0, batch_size=3), clock=clock)
+    worker.run_once()
+    worker.close()
+    run_tx("unanchored")
+
+
+def test_clean_log_passes(tmp_path, store, clock, run_tx):
+    _history(store, clock, run_tx)
+    report = audit.run_audit(store.db_path, str(tmp_path / "out"), workers=1, chunk=4)
+    assert report["ok"], report["violations"]
+    c = report["counts"]
+    assert c["rows"] == len(store.dump_executions())
+    # every execution and policy reject carries the receipt fields that reproduce its commit
+    replays = sum(r["reason"] == REASON_REPLAY for r in store.dump_executions())
+    assert c["verified"] == c["rows"] - replays and c["unverifiable"] == 0
+    assert c["unanchored"] == 1
+
+
+def test_parallel_audit_matches_sequential(tmp_path, store, clock, run_tx):
+    _history(store, clock, run_tx)
+    seq = audit.run_audit(store.db_path, str(tmp_path / "seq"), workers=1, chunk=3)
+    par = audit.run_audit(store.db_path, str(tmp_path / "par"), workers=2, chunk=3)
+    assert par["counts"] == seq["counts"] and par["violations"] == seq["violations"]
+
+
+def test_tampering_is_reported(tmp_path, store, clock, run_tx):
+    _history(store, clock, run_tx)
+    conn = sqlite3.connect(store.db_path)
+    conn.execute("UPDATE executions SET payload_hash = zeroblob(32) WHERE tx_id = 'tx-1'")
+    conn.execute("DELETE FROM executions WHERE tx_id = 'tx-3' AND attempt = 1")
+    conn.commit()
+    conn.close()
+
+    out = str(tmp_path / "out")
+    report = audit.run_audit(store.db_path, out, workers=1)
+    assert not report["ok"]
+    assert report["violations"]["commit_mismatch"] == 1
+    assert report["violations"]["attempt_gap"] == 1
+    with open(os.path.join(out, "violations.jsonl"), encoding="utf-8") as f:
+        lines = [json.loads(line) for line in f]
+    assert {v["tx_id"] for v in lines} >= {"tx-1", "tx-3"}
+
+
+def test_interrupted_audit_resumes_without_double_counting(tmp_path, store, clock, run_tx, monkeypatch):
+    _history(store, clock, run_tx)
+    expected = audit.run_audit(store.db_path, str(tmp_path / "full"), workers=1, chunk=3)
+
+    calls = []
+    original = audit.audit_executions
+
+    def crash_after_two(db_path, lo, hi):
+        if len(calls) == 2:
+            raise KeyboardInterrupt
+        calls.append(lo)
+        return original(db_path, lo, hi)
+
+    out = str(tmp_path / "resumed")
+    monkeypatch.setattr(audit, "audit_executions", crash_after_two)
+    with pytest.raises(KeyboardInterrupt):
+        audit.run_audit(store.db_path, out, workers=1, chunk=3)
+    monkeypatch.setattr(audit, "audit_executions", original)
+
+    resumed = audit.run_audit(store.db_path, out, workers=1, chunk=100)  # chunk comes from the checkpoint
+    assert resumed["counts"] == expected["counts"]
+    with pytest.raises(ValueError):
+        audit.run_audit(str(tmp_path / "other.sqlite"), out, workers=1)
@@ -0,0 +1,138 @@
+import hashlib
+import os
+import sqlite3
+
+import pytest
+
+from src.tbed import tlog_server
+from src.tbed.anchor import AnchorConfig, AnchorWorker
+from src.tbed.backends import HttpAnchorBackend, SegmentLogBackend
+from src.tbed.tlog_server import TransparencyLogServer
+from src.tbed.watcher import Watcher, WatcherConfig
+
+
+def _h(i):
+    return hashlib.sha256(str(i).encode()).hexdigest()
+
+
+def test_segment_log_rolls_over_and_survives_reopen(tmp_path):
+    path = str(tmp_path / "log")
+    log = SegmentLogBackend(path, segment_bytes=512, index_interval=4)
+    for i in range(0, 40, 5):
+        log.append([(_h(j), 1000 + j) for j in range(i, i + 5)])
+    log.close()
+    assert len(os.listdir(path)) > 1
+
+    log = SegmentLogBackend(path, segment_bytes=512, index_interval=4)
+    try:
+        assert len(log) == 40
+        assert log.read(0) == (_h(0), 1000) and log.read(37) == (_h(37), 1037)
+        assert [seq for seq, _, _ in log.iter_records(30)] == list(range(30, 40))
+        assert log.contains(_h(12)) and not log.contains(_h(99))
+        with pytest.raises(KeyError):
+            log.read(40)
+    finally:
+        log.close()
+
+
+def test_segment_log_truncates_a_torn_tail(tmp_path):
+    path = str(tmp_path / "log")
+    log = SegmentLogBackend(path)
+    log.append([(_h(0), 1), (_h(1), 2)])
+    log.close()
+    (seg,) = os.listdir(path)
+    with open(os.path.join(path, seg), "ab") as f:
+        f.write(b"\x00\x00\x00\x30partial")  # crash mid-record
+
+    log = SegmentLogBackend(path)
+    try:
+        assert len(log) == 2
+        log.append([(_h(2), 3)])
+        assert log.read(2) == (_h(2), 3)
+    finally:
+        log.close()
+
+
+def test_http_backend_round_trip(tmp_path):
+    server = TransparencyLogServer(SegmentLogBackend(str(tmp_path / "tlog"))).start()
+    client = HttpAnchorBackend(server.url)
+    try:
+        client.append([(_h(i), i) for i in range(5)])
+        assert client.contains(_h(3)) and not client.contains(_h(7))
+        assert client.contains_many([_h(1), _h(7), _h(4)]) == {_h(1), _h(4)}
+        assert client.range_summaries([""])[""][0] == 5
+    finally:
+        client.close()
+        server.stop()
+
+
+def test_http_append_requires_success_and_is_safe_to_resend(tmp_path, monkeypatch):
+    server = TransparencyLogServer(SegmentLogBackend(str(tmp_path / "tlog"))).start()
+    client = HttpAnchorBackend(server.url)
+    wrong = HttpAnchorBackend(server.url + "/nowhere")
+    send = tlog_server._Handler._send
+    dropped = []
+
+    def drop_first_append_response(self, status, body):
+        if self.path == "/entries" and not dropped:
+            dropped.append(body)
+            self.close_connection = True  # appended, but the client never hears about it
+            return
+        send(self, status, body)
+
+    try:
+        with pytest.raises(RuntimeError):
+            wrong.append([(_h(0), 0)])  # 404 is not a successful append
+
+        monkeypatch.setattr(tlog_server._Handler, "_send", drop_first_append_response)
+        client.append([(_h(i), i) for i in range(3)] + [(_h(1), 1)])
+        assert dropped == [{"size": 3, "appended": 3}]
+        assert client.size() == 3  # the retried batch appended nothing again
+    finally:
+        wrong.close()
+        client.close()
+        server.stop()
+
+
+class CountingLog(SegmentLogBackend):
+    """
+    Counts batched lookups and checks that none runs while the Store holds its write lock.
+    """
+    def __init__(self, path, db_path):
+        super().__init__(path)
+        self.db_path = db_path
+        self.lookups = 0
+
+    def contains_many(self, hashes):
+        self.lookups += 1
+        conn = sqlite3.connect(self.db_path, timeout=0)
+        try:
+            conn.execute("BEGIN IMMEDIATE")  # raises "database is locked" inside a write
+            conn.rollback()
+        finally:
+            conn.close()
+        return super().contains_many(hashes)
+
+
+@pytest.mark.parametrize("incremental", [False, True])
+def test_watcher_trusts_the_backend_not_the_local_table(store, clock, run_tx, tmp_path, incremental):
+    log = CountingLog(str(tmp_path / "log"), store.db_path)
+    try:
+        published = [run_tx(f"pub-{i}")[0].commit for i in range(3)]
+        worker = AnchorWorker(store, AnchorConfig(anchor_delay_seconds=0, batch_size=2), clock=clock, backend=log)
+        worker.run_once()
+        worker.close()
+        # in the local anchors table only: never reached the backend
+        local_only = run_tx("local-only")[0].commit
+        store.insert_anchor(commit_hash=local_only, anchored_at=int(clock.time()), backend="forged")
+        clock.advance(10)
+
+        cfg = WatcherConfig(anchor_deadline_seconds=5, incremental=incremental)
+        w = Watcher(store, cfg, clock=clock, backend=log)
+        findings = w.find_missing_anchors()
+        assert [f["commit_hash"] for f in findings] == [local_only]
+        assert all(c not in {f["commit_hash"] for f in findings} for c in published)
+        if incremental:
+            assert log.lookups == 1  # one batched lookup for the whole pass
+    finally:
+        log.close()
@@ -0,0 +1,55 @@
+import pytest
+
+from src.tbed.clock import EventScheduler, VirtualClock
+
+
+def test_virtual_clock_only_moves_forward():
+    c = VirtualClock(start=100)
+    c.sleep(5)
+    c.advance_to(50)
+    assert c.time() == 105
+    with pytest.raises(ValueError):
+        c.advance(-1)
+
+
+def test_events_run_in_time_order_and_advance_the_clock():
+    c = VirtualClock(start=0)
+    s = EventScheduler(c)
+    seen = []
+
+    def tick(name):
+        seen.append((name, c.time()))
+        if name == "a":
+            s.call_later(10, tick, "c")
+
+    s.call_at(5, tick, "b")
+    s.call_at(1, tick, "a")
+    s.run()
+    assert seen == [("a", 1), ("b", 5), ("c", 11)]
+    assert len(s) == 0
+
+
+def test_run_until_leaves_later_events_queued():
+    c = VirtualClock(start=0)
+    s = EventScheduler(c)
+    s.call_at(3, lambda: None)
+    s.call_at(30, lambda: None)
+    s.run(until=10)
+    assert c.time() == 10
+    assert len(s) == 1
+
+
+def test_cancel_is_idempotent_and_ignores_events_that_ran():
+    c = VirtualClock(start=0)
+    s = EventScheduler(c)
+    ran = []
+    first = s.call_at(1, ran.append, "first")
+    second = s.call_at(2, ran.append, "second")
+    assert s.step()
+    s.cancel(first)  # already ran
+    assert len(s) == 1
+    s.cancel(second)
+    s.cancel(second)
+    assert len(s) == 0
+    assert not s.step()
+    assert ran == ["first"]
@@ -0,0 +1,105 @@
+import argparse
+import json
+import random
+
+import pytest
+
+from experiments import bench_experiments as bench
+from experiments import loadgen
+
+
+def test_percentile_is_nearest_rank():
+    samples = [float(i) for i in range(1, 101)]
+    assert bench.percentile(samples, 50) == 50.0
+    assert bench.percentile(samples, 99) == 99.0
+    assert bench.percentile([], 95) == 0.0
+    assert bench.summarize([0.001, 0.002])["max_ms"] == 2.0
+
+
+def test_runs_in_the_same_second_get_distinct_files(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    assert bench.main(["--n", "20", "--suppression", "0.3", "--save-baseline"]) == 0
+    assert bench.main(["--n", "20", "--suppression", "0.3", "--baseline", str(bench.BASELINE_PATH),
+                       "--tolerance", "1000"]) == 0
+
+    runs = sorted((tmp_path / "results").glob("bench-*.json"))
+    assert len(runs) == 2
+    assert len(list((tmp_path / "results").glob("*.sqlite"))) == 0
+    (result,) = json.loads(runs[0].read_text())["results"]
+    assert sum(result["outcomes"].values()) == 20
+    assert set(result["latency"]) == set(bench.STAGES)
+
+
+def test_reserve_run_path_never_reuses_a_name(tmp_path, monkeypatch):
+    monkeypatch.setattr(bench, "RESULTS_DIR", tmp_path)
+    paths = [bench.reserve_run_path("20260101-000000") for _ in range(3)]
+    assert [p.name for p in paths] == [
+        "bench-20260101-000000.json", "bench-20260101-000000-2.json", "bench-20260101-000000-3.json",
+    ]
+
+
+def test_compare_flags_throughput_and_latency_regressions():
+    params = dict(zip(bench.PARAMS, (10, 1.0, 0.0, 2.0, 0, 1)))
+    lat = {stage: {"p95_ms": 1.0} for stage in bench.STAGES}
+    base = {"results": [{"params": params, "throughput_tx_s": 100.0, "latency": lat}]}
+    slower = dict(lat, execute={"p95_ms": 2.0})
+    regressions = bench.compare([{"params": params, "throughput_tx_s": 50.0, "latency": slower}], base, 0.2)
+    assert len(regressions) == 2
+    assert bench.compare([{"params": params, "throughput_tx_s": 95.0, "latency": lat}], base, 0.2) == []
+
+
+def test_parse_mix_rejects_unknown_traffic():
+    assert loadgen.parse_mix("normal=0.9,replay=0.1") == {"normal": 0.9, "replay": 0.1}
+    with pytest.raises(argparse.ArgumentTypeError):
+        loadgen.parse_mix("normal=1,bogus=1")
+    with pytest.raises(argparse.ArgumentTypeError):
+        loadgen.parse_mix("normal=0")
+
+
+def test_arrivals_are_open_loop_at_the_offered_rate():
+    steady = loadgen.arrival_times(1000, 2.0, random.Random(1))
+    assert steady == sorted(steady) and steady[-1] < 2.0
+    assert 1800 < len(steady) < 2200
+
+    bursty = loadgen.arrival_times(1000, 2.0, random.Random(1), burst_duty=0.25, burst_period=0.5)
+    assert 1800 < len(bursty) < 2200
+    # everything lands in the first quarter of each half-second period
+    assert all(t % 0.5 < 0.125 + 1e-9 for t in bursty)
+
+
+def test_load_run_gets_the_expected_outcome_per_traffic_type(decisions, executions):
+    schedule = [(i * 0.001, kind) for i, kind in enumerate(loadgen.TRAFFIC * 20)]
+    run = loadgen.LoadRun(executions, decisions, schedule, workers=4, seed=7)
+    run.run()
+    assert run.errors == 0
+    assert sum(len(s) for s in run.samples.values()) == len(schedule)
+    assert all(n == 0 for n in run.unexpected.values())
+    for latency, queueing, service in run.samples["normal"]:
+        # latency is charged from the scheduled arrival
+        assert latency >= service and abs(latency - queueing - service) < 1e-6
+
+
+def test_replay_outcomes_are_not_mixed_up_with_first_executions(decisions, executions):
+    # nothing has executed yet: the replay runs as a first execution and is reported as such
+    run = loadgen.LoadRun(executions, decisions, [(0.0, "replay")], workers=1, seed=7)
+    run.run()
+    assert [len(run.samples[k]) for k in ("replay", loadgen.REPLAY_FALLBACK)] == [0, 1]
+    assert run.unexpected[loadgen.REPLAY_FALLBACK] == 0
+
+    # a "replay" that executes is a mismatch, not an expected outcome
+    fresh = decisions.decide(tx_id="never-executed", payload={"amount": 1}, decision="APPROVE")
+    run = loadgen.LoadRun(executions, decisions, [(0.0, "replay")], workers=1, seed=7)
+    run._pool.append((fresh, {"amount": 1}))
+    run.run()
+    assert run.unexpected["replay"] == 1
+
+
+def test_loadgen_runs_in_the_same_second_get_distinct_files(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    argv = ["--rate", "50", "--duration", "0.2", "--workers", "2"]
+    assert loadgen.main(argv) == 0
+    assert loadgen.main(argv) == 0
+    runs = sorted((tmp_path / "results").glob("loadgen-*.json"))
+    assert len(runs) == 2
+    assert len(list((tmp_path / "results").glob("*.sqlite*"))) == 0
+    assert all(r["errors"] == 0 for p in runs for r in json.loads(p.read_text())["results"])
@@ -0,0 +1,134 @@
+import sqlite3
+import threading
+import time
+
+import pytest
+
+from src.tbed.groupcommit import GroupCommitter
+from src.tbed.storage import Store
+
+
+def _counter(metrics, name):
+    series = metrics.snapshot()["counters"].get(name, [])
+    return sum(s["value"] for s in series)
+
+
+def test_lone_writer_does_not_wait_for_the_group_delay(db_path, metrics):
+    s = Store(db_path, group_commit_rows=512, group_commit_ms=2000, metrics=metrics)
+    try:
+        started = time.monotonic()
+        for i in range(3):
+            s.insert_anchor(commit_hash=f"{i:064x}", anchored_at=1, backend="test")
+        assert time.monotonic() - started < 1.0
+        assert s.is_anchored(f"{2:064x}", fresh=True)
+    finally:
+        s.close()
+
+
+def test_concurrent_writers_share_commits(db_path, metrics):
+    s = Store(db_path, group_commit_rows=512, group_commit_ms=20, metrics=metrics)
+    try:
+        def write(k):
+            for i in range(10):
+                s.insert_anchor(commit_hash=f"{k * 100 + i:064x}", anchored_at=1, backend="test")
+
+        threads = [threading.Thread(target=write, args=(k,)) for k in range(8)]
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+        assert len(list(s.iter_anchors())) == 80
+    finally:
+        s.close()
+    assert _counter(metrics, "tbed_group_commit_ops_total") == 80
+    assert _counter(metrics, "tbed_group_commit_flushes_total") < 80
+
+
+def test_a_failing_write_fails_only_its_own_future(tmp_path, metrics):
+    path = str(tmp_path / "g.sqlite")
+    conn = sqlite3.connect(path)
+    conn.execute("CREATE TABLE t (x INTEGER UNIQUE)")
+    conn.close()
+
+    def insert(conn, x):
+        conn.execute("INSERT INTO t (x) VALUES (?)", (x,))
+        return x, None
+
+    gate = threading.Event()
+
+    def hold(conn):
+        gate.wait(5)
+        return None, None
+
+    local = threading.local()
+
+    def connect():
+        if not hasattr(local, "conn"):
+            local.conn = sqlite3.connect(path)
+        return local.conn
+
+    gc = GroupCommitter(connect, max_rows=100, max_delay_ms=50, metrics=metrics)
+    try:
+        first = gc.submit(hold, ())
+        # queued while the first group commits, so they form the next group together
+        futs = [gc.submit(insert, (x,)) for x in (1, 2, 1, 3)]
+        gate.set()
+        first.result(5)
+        assert futs[0].result(5) == 1 and futs[1].result(5) == 2 and futs[3].result(5) == 3
+        with pytest.raises(sqlite3.IntegrityError):
+            futs[2].result(5)
+        gc.flush()
+    finally:
+        gc.close()
+    conn = sqlite3.connect(path)
+    assert sorted(r[0] for r in conn.execute("SELECT x FROM t")) == [1, 2, 3]
+    conn.close()
+
+
+def test_a_rolled_back_group_counts_metrics_once(db_path, metrics, run_tx):
+    s = Store(db_path, group_commit_rows=512, group_commit_ms=50, metrics=metrics)
+    try:
+        dup, fresh, root = (run_tx(f"tx-{i}")[0].commit for i in range(3))
+        s.insert_anchor(dup, 1, "test")
+        s.insert_anchor(root, 1, "test")
+        gate = threading.Event()
+        first = s._committer.submit(lambda conn: (gate.wait(5), None), ())
+        # one group: a skipped duplicate, then a batch whose root is taken, which rolls it back
+        skipped = s.submit("insert_anchor", dup, 2, "test")
+        failing = s.submit("insert_anchor_batch", root, 2, "test", [(fresh, 0, b"")])
+        gate.set()
+        first.result(5)
+        skipped.result(5)
+        with pytest.raises(sqlite3.IntegrityError):
+            failing.result(5)
+    finally:
+        s.close()
+    assert _counter(metrics, "tbed_anchor_duplicates_skipped_total") == 1
+
+
+def test_synchronous_mode_is_validated_and_applied(db_path):
+    with pytest.raises(ValueError):
+        Store(db_path, synchronous="sometimes")
+    s = Store(db_path, synchronous="normal")
+    try:
+        with s._conn() as conn:
+            assert conn.execute("PRAGMA synchronous").fetchone()[0] == 1
+    finally:
+        s.close()
+
+
+def test_submit_returns_a_future_and_flush_commits_it(db_path):
+    s = Store(db_path, group_commit_rows=512, group_commit_ms=50)
+    try:
+        fut = s.submit("insert_anchor", "ab" * 32, 1, "test")
+        s.flush()
+        assert fut.done() and fut.result() is None
+        other = Store(db_path)
+        try:
+            assert other.is_anchored("ab" * 32)
+        finally:
+            other.close()
+        with pytest.raises(ValueError):
+            s.submit("claim_anchor_work", "owner", 0, 1)
+    finally:
+        s.close()
@@ -0,0 +1,55 @@
+import hashlib
+
+import pytest
+
+from src.tbed.anchor import AnchorConfig, AnchorWorker
+from src.tbed.merkle import build_proofs, decode_proof, encode_proof, leaf_hash, merkle_root, verify_proof
+
+
+def _commits(n):
+    return [hashlib.sha256(str(i).encode()).hexdigest() for i in range(n)]
+
+
+@pytest.mark.parametrize("n", [1, 2, 3, 5, 8, 13])
+def test_every_proof_verifies_against_the_root(n):
+    commits = _commits(n)
+    root, proofs = build_proofs(commits)
+    assert root == merkle_root(commits)
+    for c, p in zip(commits, proofs):
+        assert verify_proof(c, p, root)
+        assert decode_proof(encode_proof(p)) == p
+    assert len(proofs[0]) <= max(1, (n - 1).bit_length())
+
+
+def test_proof_does_not_verify_for_another_commit_or_root():
+    commits = _commits(4)
+    root, proofs = build_proofs(commits)
+    assert not verify_proof(commits[1], proofs[0], root)
+    assert not verify_proof(commits[0], proofs[0], merkle_root(commits[:3]))
+
+
+def test_a_leaf_is_not_an_inner_node():
+    # domain separation: the root of a single commit is its leaf hash, not the commit
+    (c,) = _commits(1)
+    assert merkle_root([c]) == leaf_hash(c).hex() != c
+
+
+def test_empty_batch_is_rejected():
+    with pytest.raises(ValueError):
+        build_proofs([])
+
+
+def test_batched_worker_stores_one_root_per_window(store, run_tx):
+    commits = [run_tx(f"tx-{i}")[0].commit for i in range(10)]
+    worker = AnchorWorker(store, AnchorConfig(anchor_delay_seconds=0, batch_size=4))
+    assert sorted(worker.run_once()) == sorted(commits)
+    worker.close()
+
+    anchors = list(store.iter_anchors())
+    assert len(anchors) == 3  # windows of 4, 4 and 2
+    roots = {a["commit_hash"] for a in anchors}
+    for c in commits:
+        p = store.get_anchor_proof(c)
+        assert p["root_hash"] in roots
+        assert verify_proof(c, decode_proof(p["proof"]), p["root_hash"])
+        assert store.is_anchored(c)
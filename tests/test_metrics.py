@@ -0,0 +1,55 @@
+from src.tbed.metrics import Histogram, Metrics
+from src.tbed.services import DecisionService, ExecutionService
+
+
+def test_disabled_registry_records_nothing():
+    m = Metrics(enabled=False)
+    m.inc("c")
+    m.observe("h", 0.1)
+    with m.timer("t"):
+        pass
+    assert m.snapshot() == {"counters": {}, "histograms": {}}
+
+
+def test_counters_are_kept_per_label_set():
+    m = Metrics(enabled=True)
+    m.inc("requests_total", status="ok")
+    m.inc("requests_total", 2, status="ok")
+    m.inc("requests_total", status="err")
+    series = {tuple(s["labels"].items()): s["value"] for s in m.snapshot()["counters"]["requests_total"]}
+    assert series == {(("status", "ok"),): 3, (("status", "err"),): 1}
+
+
+def test_histogram_quantiles_are_bucket_upper_bounds():
+    h = Histogram(buckets=(0.1, 1.0))
+    for v in (0.05, 0.05, 0.5, 5.0):
+        h.observe(v)
+    assert h.quantile(0.5) == 0.1
+    assert h.quantile(0.75) == 1.0
+    assert h.quantile(1.0) == float("inf")
+
+
+def test_prometheus_export_has_cumulative_buckets():
+    m = Metrics(enabled=True, buckets=(0.1, 1.0))
+    m.inc("tbed_x_total", reason='a "b"')
+    m.observe("tbed_lat_seconds", 0.05)
+    m.observe("tbed_lat_seconds", 0.5)
+    text = m.to_prometheus()
+    assert '# TYPE tbed_x_total counter\ntbed_x_total{reason="a \\"b\\""} 1\n' in text
+    assert 'tbed_lat_seconds_bucket{le="0.1"} 1\n' in text
+    assert 'tbed_lat_seconds_bucket{le="1"} 2\n' in text
+    assert 'tbed_lat_seconds_bucket{le="+Inf"} 2\n' in text
+    assert "tbed_lat_seconds_count 2\n" in text
+
+
+def test_services_report_stage_latency_and_outcomes(store, clock, metrics):
+    ds = DecisionService(policy_version="p", clock=clock, metrics=metrics)
+    es = ExecutionService(store=store, decision_service=ds)
+    r = ds.decide(tx_id="t", payload={}, decision="APPROVE")
+    es.execute(r, {})
+    es.execute(r, {})
+    snap = metrics.snapshot()
+    stages = {s["labels"]["stage"]: s["count"] for s in snap["histograms"]["tbed_stage_seconds"]}
+    assert stages["decide"] == 1 and stages["execute"] == 2
+    outcomes = {s["labels"]["status"]: s["value"] for s in snap["counters"]["tbed_executions_total"]}
+    assert outcomes == {"EXECUTED": 1, "BLOCKED": 1}
@@ -0,0 +1,233 @@
+import hashlib
+import json
+import sqlite3
+
+import pytest
+
+from src.tbed import archive
+from src.tbed.audit import run_audit
+from src.tbed.merkle import build_proofs, decode_proof, encode_proof, verify_proof
+from src.tbed.migrate import migrate
+from src.tbed.services import REASON_REPLAY, ExecutionService
+from src.tbed.storage import SCHEMA_VERSION, Store
+
+
+def _h(s):
+    return hashlib.sha256(s.encode()).hexdigest()
+
+
+LEGACY_SCHEMA = """
+CREATE TABLE executions (
+  id INTEGER PRIMARY KEY AUTOINCREMENT, tx_id TEXT NOT NULL, attempt INTEGER NOT NULL,
+  commit_hash TEXT NOT NULL, payload_hash TEXT NOT NULL, decided_at INTEGER NOT NULL,
+  executed_at INTEGER NOT NULL, status TEXT NOT NULL, reason TEXT NOT NULL, UNIQUE(tx_id, attempt)
+);
+CREATE TABLE anchors (
+  id INTEGER PRIMARY KEY AUTOINCREMENT, commit_hash TEXT NOT NULL UNIQUE,
+  anchored_at INTEGER NOT NULL, backend TEXT NOT NULL
+);
+CREATE TABLE anchor_proofs (
+  commit_hash TEXT PRIMARY KEY, root_hash TEXT NOT NULL, leaf_index INTEGER NOT NULL, proof TEXT NOT NULL
+);
+"""
+
+
+def _legacy_db(path):
+    """
+    A hex/text (pre-compact) database: one anchored tx, one replay, one batch of two,
+    one unanchored tx and one forged commit that is not hex.
+    """
+    conn = sqlite3.connect(path)
+    conn.executescript(LEGACY_SCHEMA)
+    rows = [
+        ("a", 1, _h("a"), "EXECUTED", "OK"),
+        ("a", 2, _h("a"), "BLOCKED", "REPLAY_DETECTED: tx_id already executed"),
+        ("b", 1, _h("b"), "EXECUTED", "OK"),
+        ("c", 1, _h("c"), "EXECUTED", "OK"),
+        ("d", 1, _h("d"), "EXECUTED", "OK"),
+        ("f", 1, "not-a-hash", "BLOCKED", "INVALID_RECEIPT: MAC/commit mismatch"),
+    ]
+    conn.executemany(
+        "INSERT INTO executions (tx_id, attempt, commit_hash, payload_hash, decided_at, executed_at, status, reason) "
+        "VALUES (?, ?, ?, ?, 100, 101, ?, ?)",
+        [(tx, att, c, _h("payload"), status, reason) for tx, att, c, status, reason in rows],
+    )
+    root, proofs = build_proofs([_h("b"), _h("c")])
+    conn.executemany(
+        "INSERT INTO anchors (commit_hash, anchored_at, backend) VALUES (?, 102, 'local_log')",
+        [(_h("a"),), (root,)],
+    )
+    conn.executemany(
+        "INSERT INTO anchor_proofs (commit_hash, root_hash, leaf_index, proof) VALUES (?, ?, ?, ?)",
+        [(c, root, i, json.dumps(p)) for i, (c, p) in enumerate(zip([_h("b"), _h("c")], proofs))],
+    )
+    conn.commit()
+    conn.close()
+    return root
+
+
+def test_hashes_are_stored_as_blobs_and_read_back_as_hex(store, run_tx):
+    r = run_tx("tx")[0]
+    conn = sqlite3.connect(store.db_path)
+    try:
+        commit, payload = conn.execute("SELECT commit_hash, payload_hash FROM executions").fetchone()
+    finally:
+        conn.close()
+    assert commit == bytes.fromhex(r.commit) and len(payload) == 32
+    (row,) = store.iter_dump_executions()
+    assert row["commit_hash"] == r.commit and row["status"] == "EXECUTED"
+
+
+def test_store_refuses_the_legacy_schema(tmp_path):
+    path = str(tmp_path / "old.sqlite")
+    _legacy_db(path)
+    with pytest.raises(RuntimeError, match="migrate"):
+        Store(path)
+
+
+def test_migrate_converts_the_legacy_schema_in_place(tmp_path):
+    path = str(tmp_path / "old.sqlite")
+    root = _legacy_db(path)
+    assert migrate(path) == path
+    assert (tmp_path / "old.sqlite.bak").exists()
+
+    s = Store(path)
+    try:
+        with s._conn() as conn:
+            rows = [tuple(r) for r in conn.execute(
+                "SELECT id, tx_id, attempt, commit_hash, status FROM executions_v ORDER BY id"
+            )]
+        assert rows[:2] == [(1, "a", 1, _h("a"), "EXECUTED"), (2, "a", 2, _h("a"), "BLOCKED")]
+        assert rows[-1] == (6, "f", 1, "not-a-hash", "BLOCKED")
+        assert s.has_executed("a") and s.next_attempt("a") == 3
+        assert all(s.is_anchored(_h(x)) for x in "abc") and not s.is_anchored(_h("d"))
+        p = s.get_anchor_proof(_h("c"))
+        assert p["root_hash"] == root and verify_proof(_h("c"), decode_proof(p["proof"]), root)
+    finally:
+        s.close()
+    with pytest.raises(ValueError):
+        migrate(path, str(tmp_path / "again.sqlite"))
+
+
+def _downgrade_to_v2(path):
+    """
+    Rewinds a current database to the v2 (first compact) layout: no tx_state, no receipt
+    columns on executions, no anchor_queue.
+    """
+    conn = sqlite3.connect(path)
+    conn.executescript(
+        """
+        DROP TABLE tx_state;
+        DROP TABLE anchor_queue;
+        DROP TABLE archive_segments;
+        ALTER TABLE executions DROP COLUMN decision;
+        ALTER TABLE executions DROP COLUMN policy;
+        ALTER TABLE executions DROP COLUMN nonce;
+        DROP TABLE policies;
+        PRAGMA user_version = 2;
+        """
+    )
+    conn.close()
+
+
+def _columns(conn, table):
+    return {r[1] for r in conn.execute(f"PRAGMA table_info({table})")}
+
+
+def test_v2_to_v3_derives_tx_state_from_the_log(db_path, decisions):
+    s = Store(db_path)
+    es = ExecutionService(store=s, decision_service=decisions)
+    done = decisions.decide(tx_id="done", payload={}, decision="APPROVE")
+    es.execute(done, {})
+    es.execute(done, {})
+    blocked = decisions.decide(tx_id="blocked", payload={}, decision="REJECT")
+    es.execute(blocked, {})
+    s.close()
+    _downgrade_to_v2(db_path)
+
+    s = Store(db_path)
+    try:
+        assert s.has_executed("done") and not s.has_executed("blocked")
+        assert s.next_attempts(["done", "blocked", "new"]) == {"done": 3, "blocked": 2, "new": 1}
+        es = ExecutionService(store=s, decision_service=decisions)
+        assert es.execute(done, {}).reason == REASON_REPLAY
+    finally:
+        s.close()
+
+
+def test_v3_to_v4_adds_receipt_columns_and_old_rows_stay_unverifiable(tmp_path, db_path, decisions):
+    s = Store(db_path)
+    es = ExecutionService(store=s, decision_service=decisions)
+    old = decisions.decide(tx_id="old", payload={}, decision="APPROVE")
+    es.execute(old, {})
+    s.close()
+    _downgrade_to_v2(db_path)
+
+    s = Store(db_path)
+    try:
+        with s._conn() as conn:
+            assert {"decision", "policy", "nonce"} <= _columns(conn, "executions")
+            assert conn.execute("SELECT nonce FROM executions WHERE tx_id = 'old'").fetchone()[0] is None
+        es = ExecutionService(store=s, decision_service=decisions)
+        new = decisions.decide(tx_id="new", payload={}, decision="APPROVE")
+        es.execute(new, {})
+    finally:
+        s.close()
+    report = run_audit(db_path, str(tmp_path / "audit"), workers=1)
+    assert report["ok"], report["violations"]
+    assert report["counts"]["verified"] == 1 and report["counts"]["unverifiable"] == 1
+
+
+def test_v4_to_v5_adds_archive_bookkeeping(db_path, clock, run_tx, store):
+    r = run_tx("old")[0]
+    store.insert_anchor(commit_hash=r.commit, anchored_at=int(clock.time()), backend="test")
+    store.close()
+    conn = sqlite3.connect(db_path)
+    conn.executescript(
+        """
+        DROP INDEX idx_tx_state_archived;
+        CREATE TABLE tx_state_v4 (
+          tx_id TEXT PRIMARY KEY, last_attempt INTEGER NOT NULL,
+          executed INTEGER NOT NULL DEFAULT 0, commit_hash BLOB
+        ) WITHOUT ROWID;
+        INSERT INTO tx_state_v4 SELECT tx_id, last_attempt, executed, commit_hash FROM tx_state;
+        DROP TABLE tx_state;
+        ALTER TABLE tx_state_v4 RENAME TO tx_state;
+        DROP TABLE archive_segments;
+        DROP TABLE anchor_queue;
+        PRAGMA user_version = 4;
+        """
+    )
+    conn.close()
+
+    s = Store(db_path)
+    try:
+        with s._conn() as conn:
+            assert "archived_upto" in _columns(conn, "tx_state")
+            assert [r[0] for r in conn.execute("SELECT archived_upto FROM tx_state")] == [0]
+            assert conn.execute("PRAGMA user_version").fetchone()[0] == SCHEMA_VERSION
+        clock.advance(2 * 86400)
+        (segment,) = archive.compact(s, int(clock.time()) - 86400)
+        assert segment["executions"] == 1
+        assert s.is_anchored(r.commit) and s.has_executed("old")
+    finally:
+        s.close()
+
+
+def test_v5_to_v6_queues_only_unanchored_executed_commits(db_path, clock, run_tx, store):
+    direct, batched, pending = (run_tx(t)[0].commit for t in ("direct", "batched", "pending"))
+    run_tx("rejected", decision="REJECT")
+    store.insert_anchor(commit_hash=direct, anchored_at=int(clock.time()), backend="test")
+    root, proofs = build_proofs([batched])
+    store.insert_anchor_batch(root_hash=root, anchored_at=int(clock.time()), backend="test",
+                              proofs=[(batched, 0, encode_proof(proofs[0]))])
+    store.close()
+    _downgrade_to_v2(db_path)
+
+    s = Store(db_path)
+    try:
+        with s._conn() as conn:
+            assert conn.execute("PRAGMA user_version").fetchone()[0] == SCHEMA_VERSION == 6
+        assert [c for _, c in s.claim_anchor_work("w", clock.time(), 60)] == [pending]
+    finally:
+        s.close()
@@ -0,0 +1,150 @@
+import asyncio
+import threading
+import time
+
+from src.tbed.anchor import AnchorConfig, AnchorWorker
+from src.tbed.pipeline import Pipeline, PipelineConfig
+from src.tbed.services import DecisionService, ExecutionService
+from src.tbed.watcher import DeadlineWatcher, WatcherConfig
+
+from .test_anchor import RecordingBackend
+
+
+class FlakyBackend(RecordingBackend):
+    """
+    Fails its first `failures` calls.
+    """
+    def __init__(self, failures: int):
+        super().__init__()
+        self.failures = failures
+
+    def append(self, entries):
+        self.fail = len(self.calls) < self.failures
+        super().append(entries)
+
+
+class OverlapCheckingWorker(AnchorWorker):
+    """
+    Records whether two run_once() calls ever overlapped.
+    """
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.active = 0
+        self.overlapped = False
+        self.rounds = 0
+        self._guard = threading.Lock()
+
+    def run_once(self):
+        with self._guard:
+            self.active += 1
+            self.overlapped |= self.active > 1
+        try:
+            time.sleep(0.02)
+            return super().run_once()
+        finally:
+            with self._guard:
+                self.active -= 1
+                self.rounds += 1
+
+
+def _services(store):
+    ds = DecisionService(policy_version="policy-test")
+    return ds, ExecutionService(store=store, decision_service=ds)
+
+
+async def _submit_all(pipeline, n):
+    futs = [await pipeline.submit(f"tx-{i}", {"i": i}, "APPROVE") for i in range(n)]
+    return await asyncio.gather(*futs)
+
+
+def test_pipeline_executes_and_anchors_everything(store):
+    ds, es = _services(store)
+    worker = OverlapCheckingWorker(store, AnchorConfig(anchor_delay_seconds=0))
+    cfg = PipelineConfig(queue_size=8, execute_batch_size=4, anchor_interval_seconds=0.001)
+
+    async def main():
+        async with Pipeline(ds, es, worker, cfg=cfg) as p:
+            outcomes = await _submit_all(p, 50)
+        return outcomes
+
+    outcomes = asyncio.run(main())
+    worker.close()
+    assert [o.status for o in outcomes] == ["EXECUTED"] * 50
+    assert store.anchor_queue_depth() == 0
+    assert worker.rounds >= 1
+    # drain() waits for a running anchor round instead of overlapping it
+    assert not worker.overlapped
+
+
+def test_anchor_errors_are_counted_and_retried(store):
+    ds, es = _services(store)
+    backend = FlakyBackend(failures=2)
+    worker = AnchorWorker(store, AnchorConfig(anchor_delay_seconds=0), backend=backend)
+    cfg = PipelineConfig(anchor_interval_seconds=0.001)
+
+    async def main():
+        p = Pipeline(ds, es, worker, cfg=cfg)
+        await p.start()
+        try:
+            await _submit_all(p, 3)
+            for _ in range(500):
+                if store.anchor_queue_depth() == 0:
+                    break
+                await asyncio.sleep(0.01)
+            return p.anchor_errors, p.last_anchor_error
+        finally:
+            await p.close()
+
+    errors, last = asyncio.run(main())
+    worker.close()
+    assert errors == 2 and isinstance(last, RuntimeError)
+    assert store.anchor_queue_depth() == 0
+
+
+def test_findings_queue_is_bounded(store):
+    ds, es = _services(store)
+    worker = AnchorWorker(store, AnchorConfig(anchor_delay_seconds=0, failure_rate=1.0))
+    watcher = DeadlineWatcher(store, WatcherConfig(anchor_deadline_seconds=0))
+    cfg = PipelineConfig(anchor_interval_seconds=0.001, findings_queue_size=2)
+
+    async def main():
+        p = Pipeline(ds, es, worker, watcher, cfg=cfg)
+        await p.start()
+        try:
+            await _submit_all(p, 5)
+            await p.drain()
+            await asyncio.sleep(0.2)
+            assert p.findings.qsize() == 2  # the watch stage waits for a consumer
+            seen = []
+            while len(seen) < 5:
+                seen.append((await asyncio.wait_for(p.findings.get(), 5))["tx_id"])
+            return seen
+        finally:
+            await p.close()
+
+    seen = asyncio.run(main())
+    watcher.close()
+    worker.close()
+    assert sorted(seen) == [f"tx-{i}" for i in range(5)]
+
+
+def test_a_cancelled_request_does_not_stop_the_decide_stage(store):
+    ds, es = _services(store)
+    worker = AnchorWorker(store, AnchorConfig(anchor_delay_seconds=0))
+
+    async def main():
+        p = Pipeline(ds, es, worker)
+        # queued before the stages start, so the first is cancelled before it is decided
+        bad = await p.submit("bad", {"x": object()}, "APPROVE")  # decide() cannot hash it
+        bad.cancel()
+        good = await p.submit("good", {"x": 1}, "APPROVE")
+        await p.start()
+        try:
+            return await asyncio.wait_for(good, 5)
+        finally:
+            await p.close()
+
+    outcome = asyncio.run(main())
+    worker.close()
+    assert outcome.status == "EXECUTED"
+    assert not store.has_executed("bad")
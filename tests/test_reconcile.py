@@ -0,0 +1,74 @@
+import hashlib
+
+from src.tbed.anchor import AnchorConfig, AnchorWorker
+from src.tbed.backends import SegmentLogBackend
+from src.tbed.reconcile import KeySet, anchor_keys, reconcile
+from src.tbed.watcher import Watcher, WatcherConfig
+
+
+def _h(i):
+    return hashlib.sha256(str(i).encode()).hexdigest()
+
+
+def test_identical_sets_settle_in_one_summary():
+    keys = [_h(i) for i in range(2000)]
+    res = reconcile(KeySet.from_hex(keys), KeySet.from_hex(reversed(keys)))
+    assert res.in_sync
+    assert (res.rounds, res.summaries, res.keys) == (1, 1, 0)
+
+
+def test_finds_exact_differences_without_shipping_every_key():
+    common = [_h(i) for i in range(5000)]
+    mine, theirs = [_h("local-1"), _h("local-2")], [_h("remote-1")]
+    res = reconcile(KeySet.from_hex(common + mine), KeySet.from_hex(common + theirs))
+    assert res.only_local == set(mine)
+    assert res.only_remote == set(theirs)
+    assert not res.in_sync
+    assert res.keys < 100
+    assert res.summaries < 500
+
+
+def test_one_empty_side_ships_the_other_in_one_round():
+    keys = [_h(i) for i in range(300)]
+    res = reconcile(KeySet([]), KeySet.from_hex(keys))
+    assert res.only_remote == set(keys) and not res.only_local
+    assert res.rounds == 1 and res.keys == len(keys)
+
+    res = reconcile(KeySet.from_hex(keys), KeySet([]))
+    assert res.only_local == set(keys) and res.keys == 0
+
+
+def test_keyset_membership_and_summary_cover_the_prefix():
+    keys = [_h(i) for i in range(200)]
+    ks = KeySet.from_hex(keys)
+    assert len(ks) == 200
+    assert keys[7] in ks and _h("absent") not in ks
+    n, _ = ks.summary("a")
+    assert n == sum(1 for k in keys if k.startswith("a"))
+    assert ks.range_keys(["a"])["a"] == sorted(k for k in keys if k.startswith("a"))
+
+
+def test_store_anchors_against_a_segment_log(store, clock, run_tx, tmp_path):
+    log = SegmentLogBackend(str(tmp_path / "log"))
+    try:
+        for i in range(40):
+            run_tx(f"tx-{i}")
+        worker = AnchorWorker(store, AnchorConfig(anchor_delay_seconds=0), clock=clock, backend=log)
+        worker.run_once()
+        worker.close()
+        # published to the log only, and recorded locally only
+        log.append([(_h("remote-only"), int(clock.time()))])
+        forged = run_tx("forged")[0].commit
+        store.insert_anchor(commit_hash=forged, anchored_at=int(clock.time()), backend="forged")
+
+        res = reconcile(anchor_keys(store), log)
+        assert res.only_local == {forged}
+        assert res.only_remote == {_h("remote-only")}
+
+        # the range-reconciling Watcher reports the same divergence as a missing anchor
+        clock.advance(10)
+        w = Watcher(store, WatcherConfig(anchor_deadline_seconds=5), clock=clock, backend=log)
+        assert [f["commit_hash"] for f in w.find_missing_anchors()] == [forged]
+        assert w.last_reconcile.only_local == {forged}
+    finally:
+        log.close()
@@ -0,0 +1,113 @@
+import dataclasses
+import threading
+
+from src.tbed import services
+from src.tbed.services import DecisionService, ExecutionService, REASON_OK, REASON_REJECT, REASON_REPLAY, REASON_TOCTOU
+from src.tbed.storage import Store
+
+
+def test_execute_batch_matches_execute_semantics(decisions, executions, store):
+    a = decisions.decide(tx_id="a", payload={"v": 1}, decision="APPROVE")
+    b = decisions.decide(tx_id="b", payload={"v": 2}, decision="REJECT")
+    c = decisions.decide(tx_id="c", payload={"v": 3}, decision="APPROVE")
+
+    outcomes = executions.execute_batch([
+        (a, {"v": 1}),
+        (a, {"v": 1}),        # replay inside the same batch
+        (b, {"v": 2}),
+        (c, {"v": 4}),        # payload changed after the decision
+    ])
+
+    assert [(o.tx_id, o.attempt, o.status, o.reason) for o in outcomes] == [
+        ("a", 1, "EXECUTED", REASON_OK),
+        ("a", 2, "BLOCKED", REASON_REPLAY),
+        ("b", 1, "BLOCKED", REASON_REJECT),
+        ("c", 1, "BLOCKED", REASON_TOCTOU),
+    ]
+    assert len(list(store.iter_dump_executions())) == 4
+    assert store.has_executed("a") and not store.has_executed("c")
+
+
+def test_execute_batch_empty(executions):
+    assert executions.execute_batch([]) == []
+
+
+def test_replay_across_batches_is_blocked(decisions, executions):
+    r = decisions.decide(tx_id="x", payload={}, decision="APPROVE")
+    assert executions.execute_batch([(r, {})])[0].status == "EXECUTED"
+    again = executions.execute_batch([(r, {})])[0]
+    assert (again.attempt, again.status, again.reason) == (2, "BLOCKED", REASON_REPLAY)
+
+
+def test_verified_receipts_are_cached_and_tampering_still_fails(clock, metrics):
+    ds = DecisionService(policy_version="p", clock=clock, metrics=metrics, verify_cache_size=2)
+    r = ds.decide(tx_id="t", payload={"a": 1}, decision="APPROVE")
+    assert ds.verify_receipt(r)
+    assert ds.verify_receipt(r)
+    hits = metrics.snapshot()["counters"]["tbed_verify_cache_hits_total"][0]["value"]
+    assert hits == 1
+
+    assert not ds.verify_receipt(dataclasses.replace(r, decision="REJECT"))
+    assert not ds.verify_receipt(dataclasses.replace(r, receipt_mac="0" * 64))
+
+    # the cache is an LRU of verify_cache_size receipts
+    others = [ds.decide(tx_id=f"o{i}", payload={}, decision="APPROVE") for i in range(2)]
+    for o in others:
+        assert ds.verify_receipt(o)
+    assert ds.verify_receipt(r)
+    assert metrics.snapshot()["counters"]["tbed_verify_cache_hits_total"][0]["value"] == hits
+
+
+def test_concurrent_executors_execute_a_tx_id_once(db_path, decisions):
+    r = decisions.decide(tx_id="race", payload={}, decision="APPROVE")
+    stores = [Store(db_path) for _ in range(8)]
+    barrier = threading.Barrier(len(stores))
+    outcomes = []
+
+    def attempt(store):
+        es = ExecutionService(store=store, decision_service=decisions)
+        barrier.wait()
+        outcomes.append(es.execute(r, {}))
+
+    threads = [threading.Thread(target=attempt, args=(s,)) for s in stores]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    for s in stores:
+        s.close()
+    assert sorted(o.attempt for o in outcomes) == list(range(1, 9))
+    assert [o.status for o in outcomes].count("EXECUTED") == 1
+
+
+def test_decide_many_issues_the_receipts_decide_would(decisions, executions, monkeypatch):
+    items = [(f"m{i}", {"i": i}, "REJECT" if i % 3 == 0 else "APPROVE") for i in range(10)]
+    batch = decisions.decide_many(items)
+    assert [r.tx_id for r in batch] == [t for t, _, _ in items]
+    assert len({r.decided_at for r in batch}) == 1
+    assert len({r.nonce for r in batch}) == len(items)
+    assert all(decisions.verify_receipt(r) for r in batch)
+
+    # same time and nonce: byte-identical to decide()
+    for r, (tx_id, payload, decision) in zip(batch, items):
+        monkeypatch.setattr(services, "random_nonce_hex", lambda n, nonce=r.nonce: nonce)
+        assert decisions.decide(tx_id=tx_id, payload=payload, decision=decision) == r
+    monkeypatch.undo()
+
+    outcomes = executions.execute_batch([(r, p) for r, (_, p, _) in zip(batch, items)])
+    assert [o.reason for o in outcomes] == [REASON_REJECT if d == "REJECT" else REASON_OK for _, _, d in items]
+    assert decisions.decide_many([]) == []
+
+
+def test_decide_many_across_processes(clock):
+    ds = DecisionService(policy_version="p", clock=clock)
+    try:
+        items = [(f"p{i}", {"i": i}, "APPROVE") for i in range(services.PARALLEL_MIN_ITEMS)]
+        batch = ds.decide_many(items, processes=2)
+        assert [r.tx_id for r in batch] == [t for t, _, _ in items]
+        assert len({r.nonce for r in batch}) == len(items)
+        assert all(ds.verify_receipt(r) for r in batch[::512] + batch[-1:])
+        assert ds._pool is not None
+    finally:
+        ds.close()
+    assert ds._pool is None
@@ -0,0 +1,57 @@
+import time
+
+import pytest
+
+from src.tbed.anchor import AnchorConfig
+from src.tbed.services import REASON_OK, REASON_REPLAY
+from src.tbed.sharding import ShardRouter, ShardedAnchorWorker, ShardedWatcher, shard_for, shard_paths
+from src.tbed.watcher import WatcherConfig
+
+
+def test_shard_layout():
+    assert shard_paths("data/tbed.sqlite", 2) == ["data/tbed.shard0.sqlite", "data/tbed.shard1.sqlite"]
+    assert {shard_for(f"tx-{i}", 4) for i in range(100)} == {0, 1, 2, 3}
+    assert shard_for("tx-1", 4) == shard_for("tx-1", 4)
+
+
+def test_router_keeps_per_item_semantics_across_shards(tmp_path, decisions):
+    paths = shard_paths(str(tmp_path / "tbed.sqlite"), 3)
+    items = []
+    for i in range(12):
+        r = decisions.decide(tx_id=f"tx-{i}", payload={"i": i}, decision="APPROVE")
+        items.append((r, {"i": i}))
+    items.append(items[0])  # replay lands on the same shard
+
+    with ShardRouter(paths, policy_version="policy-test") as router:
+        outcomes = router.execute_many(items, timeout=30)
+    assert [o.tx_id for o in outcomes] == [r.tx_id for r, _ in items]
+    assert [o.reason for o in outcomes] == [REASON_OK] * 12 + [REASON_REPLAY]
+
+    anchorer = ShardedAnchorWorker(paths, AnchorConfig(anchor_delay_seconds=0, failure_rate=1.0, seed=1))
+    anchorer.run_once()
+    anchorer.close()
+    watcher = ShardedWatcher(paths, WatcherConfig(anchor_deadline_seconds=0))
+    try:
+        findings = watcher.find_missing_anchors()
+    finally:
+        watcher.close()
+    assert sorted(f["tx_id"] for f in findings) == sorted(f"tx-{i}" for i in range(12))
+    assert all(f["shard"] == shard_for(f["tx_id"], 3) for f in findings)
+
+
+def test_dead_shard_fails_its_batches_instead_of_hanging(tmp_path, decisions):
+    paths = shard_paths(str(tmp_path / "tbed.sqlite"), 2)
+    router = ShardRouter(paths, policy_version="policy-test")
+    try:
+        router._procs[0].kill()
+        router._procs[0].join()
+        r = next(
+            decisions.decide(tx_id=f"tx-{i}", payload={}, decision="APPROVE")
+            for i in range(100) if shard_for(f"tx-{i}", 2) == 0
+        )
+        started = time.monotonic()
+        with pytest.raises(RuntimeError, match="shard worker 0"):
+            router.execute(r, {}, timeout=10)
+        assert time.monotonic() - started < 5
+    finally:
+        router.close()
@@ -0,0 +1,79 @@
+import sqlite3
+import threading
+
+import pytest
+
+from src.tbed.storage import Store
+
+
+def _touch(store):
+    store.has_executed("tx")
+
+
+def test_one_connection_per_thread(store):
+    for _ in range(20):
+        _touch(store)
+    assert len(store._conns) == 1
+
+
+def test_connections_of_exited_threads_are_closed(store):
+    opened = []
+    for _ in range(10):
+        t = threading.Thread(target=lambda: opened.append(store._conn()) or _touch(store))
+        t.start()
+        t.join()
+    _touch(store)
+    # the caller's connection plus at most the one opened by the last thread before it exited
+    assert len(store._conns) <= 2
+    with pytest.raises(sqlite3.ProgrammingError):
+        opened[0].execute("SELECT 1")
+
+
+def test_closed_store_refuses_new_connections(db_path):
+    s = Store(db_path)
+    s.close()
+    with pytest.raises(sqlite3.ProgrammingError):
+        s.has_executed("tx")
+
+
+def test_paged_iterators_match_the_full_listings(store, clock, run_tx):
+    for i in range(10):
+        run_tx(f"tx-{i:02d}")
+        clock.advance(1)
+    run_tx("tx-00")  # replay: second attempt of tx-00
+    assert [tuple(x) for x in store.iter_dump_executions(page_size=3)] == [tuple(x) for x in store.dump_executions()]
+    assert [(x["tx_id"], x["attempt"]) for x in store.iter_dump_executions(page_size=4)][:2] == [
+        ("tx-00", 1), ("tx-00", 2),
+    ]
+    unanchored = [x["tx_id"] for x in store.iter_unanchored_executions(int(clock.time()), page_size=3)]
+    assert unanchored == [f"tx-{i:02d}" for i in range(10)]
+    assert len(list(store.iter_executed_commit_hashes(page_size=2))) == 10
+    older = list(store.iter_executions_older_than(int(clock.time()) - 5, page_size=2))
+    assert [x["tx_id"] for x in older] == [f"tx-{i:02d}" for i in range(6)]
+
+
+def test_listings_keep_time_order_across_pages(store, run_tx):
+    commits = [run_tx(f"tx-{i}")[0].commit for i in range(5)]
+    # inserted newest first: id order is the reverse of time order
+    for i, c in enumerate(commits):
+        store.insert_anchor(commit_hash=c, anchored_at=100 - i, backend="test")
+    with store._conn() as conn:
+        conn.execute("UPDATE executions SET executed_at = 50 - id")
+    oldest_first = commits[::-1]
+    assert [x["commit_hash"] for x in store.iter_anchors(page_size=2)] == oldest_first
+    assert [x["commit_hash"] for x in store.list_anchors()] == oldest_first
+    dumped = list(store.iter_dump_anchors(page_size=2))
+    assert [x["commit_hash"] for x in dumped] == oldest_first
+    assert dumped[0].keys() == ["commit_hash", "anchored_at", "backend"]
+    assert [x["tx_id"] for x in store.iter_executions_older_than(100, page_size=2)] == [f"tx-{i}" for i in range(5)][::-1]
+
+
+def test_rows_written_mid_iteration_are_seen_once(store, run_tx):
+    for i in range(4):
+        run_tx(f"a-{i}")
+    it = store.iter_dump_executions(page_size=2)
+    first = [next(it)["tx_id"] for _ in range(2)]
+    run_tx("z-late")  # sorts after the cursor
+    run_tx("0-early")  # sorts before it
+    rest = [x["tx_id"] for x in it]
+    assert first + rest == ["a-0", "a-1", "a-2", "a-3", "z-late"]
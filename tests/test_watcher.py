@@ -0,0 +1,135 @@
+import threading
+
+from src.tbed.merkle import build_proofs, encode_proof
+from src.tbed.storage import Store
+from src.tbed.watcher import DeadlineWatcher, Watcher, WatcherConfig
+
+
+def _anchor_batch(store, commits, at):
+    root, proofs = build_proofs(commits)
+    store.insert_anchor_batch(
+        root_hash=root, anchored_at=at, backend="test",
+        proofs=[(c, i, encode_proof(p)) for i, (c, p) in enumerate(zip(commits, proofs))],
+    )
+
+
+def test_reports_only_unanchored_executions_past_the_deadline(store, clock, run_tx):
+    direct = run_tx("direct")[0]
+    batched = [run_tx(f"batched-{i}")[0] for i in range(3)]
+    missing = run_tx("missing")[0]
+    run_tx("rejected", decision="REJECT")
+    store.insert_anchor(commit_hash=direct.commit, anchored_at=int(clock.time()), backend="test")
+    _anchor_batch(store, [r.commit for r in batched], int(clock.time()))
+
+    w = Watcher(store, WatcherConfig(anchor_deadline_seconds=5), clock=clock)
+    assert w.find_missing_anchors() == []  # nothing is due yet
+
+    clock.advance(6)
+    late = run_tx("late")[0]  # executed now, not due for another 5 seconds
+    findings = w.find_missing_anchors()
+    assert [(f["tx_id"], f["commit_hash"]) for f in findings] == [("missing", missing.commit)]
+    assert findings[0]["problem"] == "MISSING_ANCHOR_AFTER_DEADLINE"
+    assert findings[0]["age_seconds"] == 6
+    assert late.commit not in {f["commit_hash"] for f in findings}
+
+
+def test_batch_member_with_a_bad_proof_is_missing(store, clock, run_tx):
+    good, bad = run_tx("good")[0], run_tx("bad")[0]
+    root, proofs = build_proofs([good.commit, "00" * 32])
+    store.insert_anchor_batch(
+        root_hash=root, anchored_at=int(clock.time()), backend="test",
+        proofs=[(good.commit, 0, encode_proof(proofs[0])), (bad.commit, 1, encode_proof(proofs[1]))],
+    )
+    clock.advance(10)
+    w = Watcher(store, WatcherConfig(anchor_deadline_seconds=5), clock=clock)
+    assert [f["tx_id"] for f in w.find_missing_anchors()] == ["bad"]
+
+
+def test_incremental_watcher_reports_once_and_persists_progress(db_path, store, clock, run_tx):
+    first = run_tx("first")[0]
+    cfg = WatcherConfig(anchor_deadline_seconds=5, incremental=True, name="w")
+    w = Watcher(store, cfg, clock=clock)
+    clock.advance(6)
+    assert [f["tx_id"] for f in w.find_missing_anchors()] == ["first"]
+    assert w.find_missing_anchors() == []  # already reported
+    watermark = store.get_watermark("w")
+    assert watermark[0] == 1
+
+    run_tx("second")
+    clock.advance(6)
+    # a fresh Store on the same file resumes from the persisted watermark
+    other = Store(db_path)
+    try:
+        w2 = Watcher(other, cfg, clock=clock)
+        assert [f["tx_id"] for f in w2.find_missing_anchors()] == ["second"]
+        assert {f["tx_id"] for f in w2.open_findings()} == {"first", "second"}
+
+        # a late anchor resolves the open finding on the next pass
+        other.insert_anchor(commit_hash=first.commit, anchored_at=int(clock.time()), backend="test")
+        assert w2.find_missing_anchors() == []
+        assert [f["tx_id"] for f in w2.open_findings()] == ["second"]
+    finally:
+        other.close()
+
+
+def test_incremental_watermark_waits_for_rows_inside_the_deadline(store, clock, run_tx):
+    cfg = WatcherConfig(anchor_deadline_seconds=5, incremental=True)
+    w = Watcher(store, cfg, clock=clock)
+    run_tx("early")
+    clock.advance(3)
+    run_tx("later")
+    clock.advance(3)
+    assert [f["tx_id"] for f in w.find_missing_anchors()] == ["early"]
+    clock.advance(3)
+    assert [f["tx_id"] for f in w.find_missing_anchors()] == ["later"]
+
+
+def test_deadline_watcher_reports_expiries_once(db_path, store, clock, run_tx):
+    dw = DeadlineWatcher(store, WatcherConfig(anchor_deadline_seconds=5), clock=clock)
+    try:
+        anchored = run_tx("anchored")[0]
+        run_tx("missing")
+        run_tx("rejected", decision="REJECT")
+        store.insert_anchor(commit_hash=anchored.commit, anchored_at=int(clock.time()), backend="test")
+        assert len(dw) == 1
+        assert dw.next_deadline() == clock.time() + 5
+
+        clock.advance(4)
+        assert dw.poll() == []
+        clock.advance(1)
+        assert [f["tx_id"] for f in dw.poll()] == ["missing"]
+        assert dw.poll() == []
+        assert dw.next_deadline() is None
+    finally:
+        dw.close()
+
+
+def test_deadline_watcher_confirms_against_the_database(db_path, store, clock, run_tx):
+    early = run_tx("early")[0]
+    # loaded from the database on startup
+    dw = DeadlineWatcher(store, WatcherConfig(anchor_deadline_seconds=5), clock=clock)
+    try:
+        late = run_tx("late")[0]
+        other = Store(db_path)  # writes the hooks of `store` never see
+        try:
+            other.insert_anchor(commit_hash=late.commit, anchored_at=int(clock.time()), backend="test")
+        finally:
+            other.close()
+        clock.advance(5)
+        assert [f["commit_hash"] for f in dw.poll()] == [early.commit]
+    finally:
+        dw.close()
+
+
+def test_deadline_watcher_stream_yields_findings(store, clock, run_tx):
+    dw = DeadlineWatcher(store, WatcherConfig(anchor_deadline_seconds=1), clock=clock)
+    try:
+        run_tx("missing")
+        clock.advance(1)
+        stop = threading.Event()
+        stream = dw.stream(stop)
+        assert next(stream)["tx_id"] == "missing"
+        stop.set()
+        assert list(stream) == []
+    finally:
+        dw.close()